@@ -0,0 +1,43 @@
+"""Helpers for the 2015 US flight delay analysis in ``flightprediction.py``.
+
+The names below are imported from their modules on first access, so
+``import flightdelay`` stays cheap and a job only pays for the modules it
+uses. sklearn, joblib, pyarrow and matplotlib are imported inside the
+functions that need them; seaborn is not needed at all.
+"""
+import importlib
+
+_EXPORTS = {
+    'io': ['FLIGHT_COLUMNS', 'FLIGHT_DTYPES', 'load_airlines', 'load_airports', 'load_flights'],
+    'clean': ['clean_flights', 'read_clean', 'stream_clean'],
+    'cube': ['DelayCube'],
+    'corr': ['CorrelationCache'],
+    'state': ['EDAState'],
+    'encoding': ['CategoryEncoder', 'TargetEncoder'],
+    'eda': ['airport_airline_matrix', 'airport_airline_stats'],
+    'preview': ['box_stats', 'histogram', 'stratified_sample'],
+    'stats': ['GroupedStats', 'TDigest', 'grouped_stats'],
+    'models': ['ModelBundle', 'ModelRegistry', 'fit_zoo', 'fit_zoo_parallel', 'make_models',
+               'model_data', 'regression_report', 'run_timings'],
+    'report': ['eda_figures', 'render_report'],
+    'scoring': ['score_schedule'],
+    'store': ['DatasetStore'],
+    'inference': ['compile_model'],
+    'incremental': ['LinearMoments', 'stream_fit', 'stream_report'],
+}
+_MODULES = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = sorted(_MODULES)
+
+
+def __getattr__(name):
+    module = _MODULES.get(name)
+    if module is None:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+    value = getattr(importlib.import_module('.' + module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
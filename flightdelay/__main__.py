@@ -0,0 +1,39 @@
+"""Command line entry point: ``python -m flightdelay <command> [options]``.
+
+Each command is the ``main`` of one module and is imported only when run,
+so e.g. ``clean`` never loads sklearn or matplotlib.
+"""
+import importlib
+import sys
+
+COMMANDS = {
+    'clean': ('clean', 'clean flights into Parquet part files'),
+    'ingest': ('state', 'fold a batch of flights into an EDA state directory'),
+    'store': ('store', 'write cleaned, encoded flights to a memory-mapped store'),
+    'train': ('models', 'train the model zoo into the model registry'),
+    'score': ('scoring', 'score a schedule file or directory into Parquet'),
+    'serve': ('serve', 'serve a model bundle over HTTP'),
+    'report': ('report', 'render the EDA report headlessly'),
+    'bench': ('bench', 'benchmark the pipeline stages'),
+    'synth': ('synth', 'write synthetic flights'),
+}
+
+
+def usage():
+    lines = ['usage: python -m flightdelay <command> [options]', '', 'commands:']
+    lines += ['  {:<8} {}'.format(name, text) for name, (_, text) in COMMANDS.items()]
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] not in COMMANDS:
+        print(usage(), file=sys.stderr)
+        return 0 if argv[:1] in (['-h'], ['--help']) else 2
+    module = importlib.import_module('.' + COMMANDS[argv[0]][0], __package__)
+    sys.argv[0] = 'python -m flightdelay ' + argv[0]
+    return module.main(argv[1:])
+
+
+if __name__ == '__main__':
+    sys.exit(main())
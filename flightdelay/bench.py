@@ -0,0 +1,183 @@
+"""Benchmarks of the pipeline stages on synthetic flights.
+
+Runs load, cleaning, EDA aggregation, encoding, scaling and model fitting on
+synthetic data of several sizes and records wall time, peak RSS and
+throughput per stage. Results are appended to a JSON file together with the
+git revision, so the numbers of successive changes can be compared::
+
+    python -m flightdelay.bench --sizes 100k,1M,6M,30M --out bench_results.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from .profiling import PeakRSS
+
+DEFAULT_SIZES = (100_000, 1_000_000, 6_000_000, 30_000_000)
+# RandomForest takes hours at the larger sizes; pass it via --models if wanted.
+DEFAULT_MODELS = ('Lasso', 'Linear Regression', 'Ridge', 'Decision Tree Regressor')
+
+
+def parse_size(text):
+    """'100k' -> 100000, '1M' -> 1000000, '30m' -> 30000000."""
+    text = text.strip().lower()
+    factor = {'k': 10 ** 3, 'm': 10 ** 6, 'g': 10 ** 9}.get(text[-1:], 1)
+    return int(float(text[:-1] if factor > 1 else text) * factor)
+
+
+def _git_revision():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                             text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+@contextmanager
+def _stage(results, name, rows=None):
+    """Measure the block; the caller may fill in ``rows`` inside it."""
+    info = {'rows': rows}
+    with PeakRSS() as m:
+        yield info
+    rows = int(info['rows'])
+    results[name] = {
+        'rows': rows,
+        'seconds': round(m.seconds, 4),
+        'peak_rss_mb': round(m.peak / 2 ** 20, 1),
+        'rss_growth_mb': round((m.peak - m.start_rss) / 2 ** 20, 1),
+        'rows_per_second': round(rows / m.seconds) if m.seconds else None,
+    }
+
+
+def run_pipeline(csv_path, models=DEFAULT_MODELS, workdir=None):
+    """Time every stage on ``csv_path``; return ``{stage: measurements}``."""
+    # Imported up front so the first stage using sklearn does not pay for it.
+    import sklearn.model_selection  # noqa: F401
+    import sklearn.preprocessing  # noqa: F401
+
+    from .clean import clean_flights
+    from .cube import DelayCube
+    from .eda import airport_airline_matrix
+    from .encoding import CategoryEncoder, TargetEncoder
+    from .features import feature_matrix, split_order, standardize, time_features
+    from .io import load_flights
+    from .models import MODEL_COLUMNS, ModelRegistry, fit_zoo, make_models
+    from .stats import grouped_stats
+
+    workdir = workdir or os.path.dirname(os.path.abspath(csv_path))
+    stages = {}
+
+    with _stage(stages, 'load') as s:
+        flights = load_flights(csv_path, cache=False)
+        s['rows'] = len(flights)
+    cache_dir = os.path.join(workdir, '.cache')
+    load_flights(csv_path, cache_dir=cache_dir)
+    del flights
+    with _stage(stages, 'load_cached') as s:
+        flights = load_flights(csv_path, cache_dir=cache_dir)
+        s['rows'] = len(flights)
+
+    with _stage(stages, 'clean', len(flights)):
+        flights = clean_flights(flights)
+
+    with _stage(stages, 'eda', len(flights)):
+        DelayCube.build(flights)
+        airport_airline_matrix(flights)
+        grouped_stats(flights, 'DEPARTURE_DELAY', 'AIRLINE')
+
+    with _stage(stages, 'time', len(flights)):
+        time_features(flights)
+
+    flights = flights[MODEL_COLUMNS].copy()
+    with _stage(stages, 'encode', len(flights)):
+        encoder = CategoryEncoder.from_frame(flights)
+        flights = encoder.transform(flights)
+
+    with _stage(stages, 'stats', len(flights)):
+        TargetEncoder(encoder).fit_transform(flights, flights['ARRIVAL_DELAY'].to_numpy())
+
+    with _stage(stages, 'scale', len(flights)):
+        order, n_train = split_order(len(flights), test_size=0.3, random_state=2)
+        X, y, _ = feature_matrix(flights, 'ARRIVAL_DELAY', order=order)
+        standardize(X, n_train)
+        X_train_sc, X_test_sc, y_train = X[:n_train], X[n_train:], y[:n_train]
+
+    if models:
+        with tempfile.TemporaryDirectory(dir=workdir) as model_dir:
+            with _stage(stages, 'fit', len(X_train_sc)):
+                runs = fit_zoo(make_models(models), X_train_sc, y_train, X_test_sc,
+                               'ARRIVAL_DELAY', ModelRegistry(model_dir))
+        stages['fit']['models'] = {name: round(run.fit_seconds, 4) for name, run in runs.items()}
+    return stages
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, models=DEFAULT_MODELS, seed=0, workdir=None):
+    """Benchmark every size in ``sizes``; return the result record."""
+    from .synth import write_synthetic
+
+    record = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'cpus': os.cpu_count(),
+        'sizes': {},
+    }
+    for n in sizes:
+        with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+            csv_path = os.path.join(tmp, 'flights.csv')
+            # Streamed chunk by chunk, so the input of 30M rows is never in memory.
+            write_synthetic(csv_path, n, seed=seed)
+            record['sizes'][str(n)] = run_pipeline(csv_path, models, tmp)
+    return record
+
+
+def append_results(record, path):
+    """Append ``record`` to the JSON list stored at ``path``."""
+    history = []
+    if os.path.exists(path):
+        with open(path) as f:
+            history = json.load(f)
+    history.append(record)
+    with open(path, 'w') as f:
+        json.dump(history, f, indent=1)
+
+
+def format_record(record):
+    lines = ['revision {} ({} cpus)'.format(record['revision'], record['cpus'])]
+    for n, stages in record['sizes'].items():
+        lines.append('{:>12} rows'.format(int(n)))
+        for name, m in stages.items():
+            lines.append('    {:<12} {:>9.3f} s {:>9.1f} MB {:>14} rows/s'.format(
+                name, m['seconds'], m['peak_rss_mb'], m['rows_per_second'] or '-'))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='comma separated row counts, e.g. 100k,1M')
+    parser.add_argument('--models', default=','.join(DEFAULT_MODELS),
+                        help='comma separated model names, empty to skip fitting')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', default=None, help='where the synthetic files are written')
+    parser.add_argument('--out', default='bench_results.json')
+    args = parser.parse_args(argv)
+
+    sizes = [parse_size(s) for s in args.sizes.split(',') if s.strip()]
+    models = [m.strip() for m in args.models.split(',') if m.strip()]
+    record = run_benchmarks(sizes, models, args.seed, args.workdir)
+    append_results(record, args.out)
+    print(format_record(record))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""Cleaning steps of the analysis (In[17]-In[24]).
+
+``clean_flights`` runs them on a DataFrame that is already in memory.
+``stream_clean`` gives the same result for inputs that do not fit in RAM
+(several years of BTS data): the source is read in chunks, every chunk is
+filtered as it arrives and the surviving rows are spilled to a directory of
+Parquet part files.
+"""
+import argparse
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+from .io import FLIGHT_COLUMNS, FLIGHT_DTYPES, read_flights_csv
+
+# kaldırılacak_sutunlar in In[17]
+DROP_COLUMNS = ['TAXI_OUT', 'TAXI_IN', 'WHEELS_ON', 'WHEELS_OFF', 'YEAR',
+                'AIR_SYSTEM_DELAY', 'SECURITY_DELAY', 'AIRLINE_DELAY', 'LATE_AIRCRAFT_DELAY',
+                'WEATHER_DELAY', 'DIVERTED', 'CANCELLED', 'CANCELLATION_REASON',
+                'FLIGHT_NUMBER', 'TAIL_NUMBER', 'AIR_TIME']
+# Columns with at least this fraction of missing values are dropped (In[18]).
+MISSING_THRESHOLD = 0.25
+# FAA counts a flight as delayed from 15 minutes on (In[21]).
+MIN_DELAY = 15
+
+
+def sparse_columns(null_counts, n_rows, threshold=MISSING_THRESHOLD):
+    """Return the columns whose missing fraction is ``>= threshold``."""
+    if n_rows == 0:
+        return []
+    return list(null_counts.index[null_counts / n_rows >= threshold])
+
+
+def clean_flights(flights, threshold=MISSING_THRESHOLD, min_delay=MIN_DELAY):
+    """Apply the cleaning cells to an in-memory frame and return a new frame."""
+    flights = flights.drop(DROP_COLUMNS, axis=1, errors='ignore')
+    flights = flights.drop(sparse_columns(flights.isna().sum(), len(flights), threshold), axis=1)
+    flights = flights[flights.DEPARTURE_DELAY >= min_delay]
+    return flights.dropna()
+
+
+def _iter_file(path, columns, chunksize):
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from read_flights_csv(path, columns, chunksize=chunksize)
+
+
+def iter_chunks(source, columns=None, chunksize=1_000_000):
+    """Yield DataFrame chunks of ``source``.
+
+    ``source`` is a CSV or Parquet file, a list of them (e.g. one file per
+    month), or a directory holding such files.
+    """
+    columns = FLIGHT_COLUMNS if columns is None else list(columns)
+    if isinstance(source, (str, os.PathLike)):
+        source = os.fspath(source)
+        if os.path.isdir(source):
+            source = sorted(glob.glob(os.path.join(source, '*.csv'))
+                            + glob.glob(os.path.join(source, '*.parquet')))
+        else:
+            source = [source]
+    for path in source:
+        yield from _iter_file(os.fspath(path), columns, chunksize)
+
+
+def count_nulls(source, columns=None, chunksize=1_000_000):
+    """First pass over ``source``: return ``(n_rows, null counts per column)``."""
+    n_rows = 0
+    nulls = None
+    for chunk in iter_chunks(source, columns, chunksize):
+        chunk = chunk.drop(DROP_COLUMNS, axis=1, errors='ignore')
+        n_rows += len(chunk)
+        counts = chunk.isna().sum()
+        nulls = counts if nulls is None else nulls.add(counts, fill_value=0)
+    if nulls is None:
+        nulls = pd.Series(dtype=np.int64)
+    return n_rows, nulls.astype(np.int64)
+
+
+def stream_clean(source, out_dir, columns=None, chunksize=1_000_000,
+                 threshold=MISSING_THRESHOLD, min_delay=MIN_DELAY):
+    """Clean ``source`` chunk by chunk into Parquet part files in ``out_dir``.
+
+    The source is read twice. The first pass only counts missing values per
+    column so the >=25% decision is taken on the whole data set, exactly as
+    ``clean_flights`` does; the second pass filters and spills. Memory use is
+    bounded by ``chunksize``. Returns a dict with the row counts and the
+    dropped columns.
+    """
+    n_rows, nulls = count_nulls(source, columns, chunksize)
+    sparse = sparse_columns(nulls, n_rows, threshold)
+
+    os.makedirs(out_dir, exist_ok=True)
+    for old in glob.glob(os.path.join(out_dir, 'part-*.parquet')):
+        os.remove(old)
+
+    n_kept = 0
+    n_parts = 0
+    for chunk in iter_chunks(source, columns, chunksize):
+        chunk = chunk.drop(DROP_COLUMNS + sparse, axis=1, errors='ignore')
+        chunk = chunk[chunk.DEPARTURE_DELAY >= min_delay].dropna()
+        if chunk.empty:
+            continue
+        # Category dictionaries differ from chunk to chunk; store the codes as
+        # plain strings (Parquet dictionary-encodes them anyway) and restore
+        # the category dtype in read_clean.
+        for col in chunk.select_dtypes('category'):
+            chunk[col] = chunk[col].astype(str)
+        chunk.to_parquet(os.path.join(out_dir, 'part-{:05d}.parquet'.format(n_parts)), index=False)
+        n_kept += len(chunk)
+        n_parts += 1
+
+    return {'rows_in': n_rows, 'rows_out': n_kept, 'parts': n_parts,
+            'dropped_columns': sparse}
+
+
+def read_clean(out_dir, columns=None):
+    """Read the output of ``stream_clean`` back into one DataFrame."""
+    parts = sorted(glob.glob(os.path.join(out_dir, 'part-*.parquet')))
+    if not parts:
+        raise FileNotFoundError('no cleaned parts in {}'.format(out_dir))
+    flights = pd.concat([pd.read_parquet(p, columns=columns) for p in parts], ignore_index=True)
+    for col in flights.columns:
+        if FLIGHT_DTYPES.get(col) == 'category':
+            flights[col] = flights[col].astype('category')
+    return flights
+
+
+def main(argv=None):
+    from .bench import parse_size
+
+    parser = argparse.ArgumentParser(description='Clean flights into Parquet part files.')
+    parser.add_argument('source', help='CSV/Parquet file or a directory of them')
+    parser.add_argument('out_dir')
+    parser.add_argument('--chunksize', default='1M')
+    args = parser.parse_args(argv)
+
+    result = stream_clean(args.source, args.out_dir, chunksize=parse_size(args.chunksize))
+    print('{rows_in} rows read, {rows_out} kept in {parts} parts; dropped: {dropped}'.format(
+        dropped=', '.join(result['dropped_columns']) or '-', **result))
+
+
+if __name__ == '__main__':
+    main()
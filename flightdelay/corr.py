@@ -0,0 +1,114 @@
+"""Pearson correlations from streaming sufficient statistics.
+
+The notebook called ``flights.corr()`` over the full frame five times and
+took further sub-correlations in between. ``CorrelationCache`` accumulates
+n, the column sums and the cross-product matrix once, with float32 BLAS
+``X.T @ X`` products over row blocks, and serves the full matrix, any
+sub-matrix or a single target column from them. New months of data are
+folded in with ``update`` without revisiting the old ones.
+"""
+import numpy as np
+import pandas as pd
+
+BLOCK_ROWS = 1 << 16
+
+
+class CorrelationCache:
+    """Running n, sum(x) and sum(x x^T) of a set of numeric columns.
+
+    The sums are taken around a fixed shift (the means of the first block)
+    so that the float32 block products do not lose the small covariances of
+    columns with large means, such as the HHMM times; the block results are
+    accumulated in float64. Rows with a missing value in any of the columns
+    are skipped, which equals ``DataFrame.corr()`` on the cleaned frame
+    since it has no missing values.
+    """
+
+    def __init__(self, columns, n=0, shift=None, sums=None, cross=None):
+        self.columns = list(columns)
+        k = len(self.columns)
+        self.n = int(n)
+        self.shift = None if shift is None else np.asarray(shift, dtype=np.float64)
+        self.sums = np.zeros(k) if sums is None else np.asarray(sums, dtype=np.float64)
+        self.cross = np.zeros((k, k)) if cross is None else np.asarray(cross, dtype=np.float64)
+
+    @classmethod
+    def from_frame(cls, df, columns=None):
+        """Statistics of the numeric columns (or ``columns``) of ``df``."""
+        if columns is None:
+            columns = df.select_dtypes('number').columns
+        cache = cls(columns)
+        cache.update(df)
+        return cache
+
+    def update(self, df):
+        """Fold the rows of ``df`` into the statistics; returns ``self``."""
+        for start in range(0, len(df), BLOCK_ROWS):
+            # Only one block is converted to float at a time.
+            X = df.iloc[start:start + BLOCK_ROWS][self.columns].to_numpy(dtype=np.float64)
+            X = X[~np.isnan(X).any(axis=1)]
+            if not len(X):
+                continue
+            if self.shift is None:
+                self.shift = X.mean(axis=0)
+            block = X.astype(np.float32) - self.shift.astype(np.float32)
+            self.sums += block.sum(axis=0, dtype=np.float64)
+            self.cross += (block.T @ block).astype(np.float64)
+            self.n += len(X)
+        return self
+
+    def _reshifted(self, shift):
+        # sum(x - s2) and sum((x - s2)(x - s2)^T) from the sums around s1.
+        d = shift - self.shift
+        sums = self.sums - self.n * d
+        cross = (self.cross - np.outer(d, self.sums) - np.outer(self.sums, d)
+                 + self.n * np.outer(d, d))
+        return sums, cross
+
+    def merge(self, other):
+        """Return the statistics of both data sets together."""
+        if self.columns != other.columns:
+            raise ValueError('cannot merge correlations of different columns')
+        if other.shift is None:
+            return CorrelationCache(self.columns, self.n, self.shift, self.sums, self.cross)
+        if self.shift is None:
+            return CorrelationCache(other.columns, other.n, other.shift, other.sums, other.cross)
+        sums, cross = other._reshifted(self.shift)
+        return CorrelationCache(self.columns, self.n + other.n, self.shift,
+                                self.sums + sums, self.cross + cross)
+
+    def covariance(self):
+        """Sample covariance matrix (ddof=1) as a DataFrame."""
+        mean = self.sums / self.n
+        cov = (self.cross - self.n * np.outer(mean, mean)) / (self.n - 1)
+        return pd.DataFrame(cov, index=self.columns, columns=self.columns)
+
+    def corr(self, columns=None):
+        """Pearson correlation matrix, of ``columns`` only if given."""
+        cov = self.covariance().to_numpy()
+        std = np.sqrt(np.clip(np.diag(cov), 0, None))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = cov / np.outer(std, std)
+        corr = np.clip(corr, -1, 1)
+        np.fill_diagonal(corr, np.where(std > 0, 1.0, np.nan))
+        corr = pd.DataFrame(corr, index=self.columns, columns=self.columns)
+        if columns is not None:
+            columns = list(columns)
+            corr = corr.loc[columns, columns]
+        return corr
+
+    def target(self, column, ascending=False):
+        """Correlation of every column with ``column``, sorted, as a one column frame."""
+        return self.corr()[[column]].sort_values(by=column, ascending=ascending)
+
+    def save(self, path):
+        np.savez(path, columns=np.array(self.columns), n=self.n,
+                 shift=np.full(len(self.columns), np.nan) if self.shift is None else self.shift,
+                 sums=self.sums, cross=self.cross)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            shift = data['shift']
+            return cls(list(data['columns']), int(data['n']),
+                       None if np.isnan(shift).all() else shift, data['sums'], data['cross'])
@@ -0,0 +1,191 @@
+"""Pre-aggregated delay cube behind the EDA charts.
+
+Every EDA cell used to run its own groupby / value_counts over the full
+``flights`` frame. ``DelayCube.build`` scans the frame once and keeps, for
+every non-empty combination of the cube dimensions, the count, sum, sum of
+squares, min and max of each delay column. Any breakdown over a subset of
+the dimensions (the heatmaps, the per-month/day/airline bars and countplots,
+the per-airline statistics) is then a rollup of that much smaller table.
+The airports are only ever broken down on their own, so each of them gets
+its own one-dimensional margin table instead of a cube dimension.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from .features import DELAY_TYPE_COLUMNS, delay_type
+
+CUBE_DIMS = ('MONTH', 'DAY', 'DAY_OF_WEEK', 'AIRLINE', 'DELAY_TYPE', 'ARRIVAL_DELAY_TYPE')
+# Crossed with the dimensions above, the hundreds of airports would leave
+# about one cell per flight and make every rollup slower than a groupby.
+MARGIN_DIMS = ('ORIGIN_AIRPORT', 'DESTINATION_AIRPORT')
+CUBE_MEASURES = ('DEPARTURE_DELAY', 'ARRIVAL_DELAY')
+STATS = ('count', 'sum', 'sumsq', 'min', 'max')
+# How each stored statistic combines when cells are merged.
+_COMBINE = {'count': 'sum', 'sum': 'sum', 'sumsq': 'sum', 'min': 'min', 'max': 'max'}
+
+
+def _column(measure, stat):
+    return '{}_{}'.format(measure, stat)
+
+
+def _concat(frames, dims):
+    """Stack cell tables, keeping categorical dimensions categorical."""
+    cells = pd.concat(frames, ignore_index=True)
+    for dim in dims:
+        if isinstance(frames[0][dim].dtype, pd.CategoricalDtype):
+            cells[dim] = cells[dim].astype('category')
+    return cells
+
+
+class DelayCube:
+    """Sparse count/sum/sum-of-squares/min/max cube over the EDA dimensions.
+
+    ``cells`` holds one row per non-empty cell: the dimension columns, the
+    number of flights ``n`` and ``<measure>_<stat>`` for every measure.
+    ``margins`` maps each margin dimension to a table of the same layout
+    over that dimension alone.
+    """
+
+    def __init__(self, cells, dims=CUBE_DIMS, measures=CUBE_MEASURES, margins=None):
+        self.cells = cells
+        self.dims = tuple(dims)
+        self.measures = tuple(measures)
+        self.margins = dict(margins or {})
+
+    @classmethod
+    def build(cls, flights, dims=CUBE_DIMS, measures=CUBE_MEASURES, margin_dims=MARGIN_DIMS):
+        """Aggregate ``flights`` into the cube cells and the margin tables.
+
+        Missing delay type dimensions are derived on the cube's own copy of
+        the data; ``flights`` itself is left untouched.
+        """
+        dims = tuple(dims)
+        measures = tuple(measures)
+        keys = dims + tuple(margin_dims)
+        data = flights[[d for d in keys if d in flights.columns]].copy()
+        for delay_col, type_col in DELAY_TYPE_COLUMNS.items():
+            if type_col in keys and type_col not in data.columns:
+                data[type_col] = delay_type(flights[delay_col])
+        data['n'] = np.int64(1)
+        agg = {'n': ('n', 'sum')}
+        for m in measures:
+            values = flights[m].to_numpy(dtype=np.float64)
+            data[m] = values
+            data[m + '__sq'] = values * values
+            agg[_column(m, 'count')] = (m, 'count')
+            agg[_column(m, 'sum')] = (m, 'sum')
+            agg[_column(m, 'sumsq')] = (m + '__sq', 'sum')
+            agg[_column(m, 'min')] = (m, 'min')
+            agg[_column(m, 'max')] = (m, 'max')
+
+        def aggregate(by):
+            return data.groupby(list(by), observed=True, sort=False).agg(**agg).reset_index()
+
+        margins = {dim: aggregate([dim]) for dim in margin_dims}
+        return cls(aggregate(dims), dims, measures, margins)
+
+    def _combine(self, cells, by):
+        agg = {'n': 'sum'}
+        for m in self.measures:
+            for stat in STATS:
+                agg[_column(m, stat)] = _COMBINE[stat]
+        return cells.groupby(list(by), observed=True).agg(agg)
+
+    def _table(self, by):
+        """The cells or margin table that ``by`` can be rolled up from."""
+        if set(by) <= set(self.dims):
+            return self.cells
+        if len(by) == 1 and by[0] in self.margins:
+            return self.margins[by[0]]
+        unknown = set(by) - set(self.dims) - set(self.margins)
+        if unknown:
+            raise KeyError('not a cube dimension: {}'.format(', '.join(sorted(unknown))))
+        raise KeyError('margin dimensions cannot be combined with others: {}'
+                       .format(', '.join(by)))
+
+    @classmethod
+    def concat(cls, cubes):
+        """Cube holding the cells of all ``cubes`` side by side.
+
+        Cells sharing a key are left as they are; the rollups combine them.
+        """
+        first = cubes[0]
+        for cube in cubes[1:]:
+            if (cube.dims != first.dims or cube.measures != first.measures
+                    or set(cube.margins) != set(first.margins)):
+                raise ValueError('cannot merge cubes with different dimensions or measures')
+        cells = _concat([c.cells for c in cubes], first.dims)
+        margins = {dim: _concat([c.margins[dim] for c in cubes], [dim]) for dim in first.margins}
+        return cls(cells, first.dims, first.measures, margins)
+
+    def merge(self, other):
+        """Return the cube of the union of both underlying data sets."""
+        both = DelayCube.concat([self, other])
+        cells = self._combine(both.cells, self.dims).reset_index()
+        margins = {dim: self._combine(table, [dim]).reset_index()
+                   for dim, table in both.margins.items()}
+        return DelayCube(cells, self.dims, self.measures, margins)
+
+    def rollup(self, by, measure='DEPARTURE_DELAY', stats=('count', 'mean')):
+        """Statistics of ``measure`` grouped by the dimensions in ``by``.
+
+        ``stats`` may contain count, sum, mean, std (ddof=1, like pandas),
+        var, min and max. The result is indexed by ``by``.
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        if not by:
+            raise ValueError('rollup needs at least one dimension')
+        table = self._table(by)
+        if measure not in self.measures:
+            raise KeyError('not a cube measure: {}'.format(measure))
+
+        cells = self._combine(table, by)
+        count = cells[_column(measure, 'count')]
+        total = cells[_column(measure, 'sum')]
+        out = pd.DataFrame(index=cells.index)
+        for stat in stats:
+            if stat == 'count':
+                out[stat] = count
+            elif stat in ('sum', 'min', 'max'):
+                out[stat] = cells[_column(measure, stat)]
+            elif stat == 'mean':
+                out[stat] = total / count
+            elif stat in ('var', 'std'):
+                var = (cells[_column(measure, 'sumsq')] - total * total / count) / (count - 1)
+                var = var.clip(lower=0).where(count > 1)
+                out[stat] = np.sqrt(var) if stat == 'std' else var
+            else:
+                raise ValueError('unknown statistic: {}'.format(stat))
+        return out
+
+    def counts(self, by):
+        """Number of flights per value of ``by``, like ``flights.value_counts(by)``."""
+        table = self._table([by] if isinstance(by, str) else list(by))
+        counts = table.groupby(by, observed=True)['n'].sum()
+        return counts.sort_values(ascending=False).rename('count')
+
+    def pivot(self, index, columns, measure=None, stat='count'):
+        """``index`` x ``columns`` matrix of one statistic, ready for a heatmap.
+
+        Without a ``measure`` the matrix holds the number of flights.
+        """
+        if measure is None:
+            table = self._table([index, columns])
+            return table.groupby([index, columns], observed=True)['n'].sum().unstack(columns)
+        return self.rollup([index, columns], measure, (stat,))[stat].unstack(columns)
+
+    def save(self, path):
+        """Write the cells and margin tables as Parquet files in directory ``path``."""
+        os.makedirs(path, exist_ok=True)
+        self.cells.to_parquet(os.path.join(path, 'cells.parquet'), index=False)
+        for dim, table in self.margins.items():
+            table.to_parquet(os.path.join(path, dim + '.parquet'), index=False)
+
+    @classmethod
+    def load(cls, path, dims=CUBE_DIMS, measures=CUBE_MEASURES, margin_dims=MARGIN_DIMS):
+        cells = pd.read_parquet(os.path.join(path, 'cells.parquet'))
+        margins = {dim: pd.read_parquet(os.path.join(path, dim + '.parquet'))
+                   for dim in margin_dims}
+        return cls(cells, dims, measures, margins)
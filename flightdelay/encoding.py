@@ -0,0 +1,299 @@
+"""Integer codes of the categorical flight columns.
+
+In[87] and In[97] re-fitted one ``LabelEncoder`` on every column in turn,
+so no mapping survived for scoring, and the codes depended on which codes
+happened to be in the frame. ``CategoryEncoder`` builds the dictionaries
+once from the reference tables (``airlines.csv``, ``airports.csv``), stores
+the codes as the smallest integer type that fits (int8 for the 14 airlines,
+int16 for the 322 airports) and maps every value missing from the table to
+the reserved code ``UNSEEN`` -- e.g. the numeric airport ids of the
+October 2015 BTS files. Categorical columns are encoded through a lookup
+array indexed by ``Series.cat.codes``, i.e. one small ``get_indexer`` over
+the categories and one take over the rows.
+
+The EDA (In[65], In[72]) shows that delays depend heavily on the airport
+and the carrier, which the codes alone hide from the linear models.
+``TargetEncoder`` turns the codes into out-of-fold mean and quantile
+delays per airline, airport and route, kept as lookup arrays for scoring.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+UNSEEN = 0
+CATEGORY_COLUMNS = ('AIRLINE', 'ORIGIN_AIRPORT', 'DESTINATION_AIRPORT')
+# Origin and destination share one vocabulary, so an airport has one code.
+_VOCABULARY = {'AIRLINE': 'AIRLINE', 'ORIGIN_AIRPORT': 'AIRPORT',
+               'DESTINATION_AIRPORT': 'AIRPORT'}
+
+
+def code_dtype(n_values):
+    """Smallest signed integer dtype holding ``n_values`` codes plus ``UNSEEN``."""
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_values + 1 <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+class CategoryEncoder:
+    """Fixed ``value -> code`` dictionaries; code ``i + 1`` for the i-th value.
+
+    ``vocabularies`` maps a vocabulary name to its sorted values and
+    ``columns`` maps a column to its vocabulary name.
+    """
+
+    def __init__(self, vocabularies, columns=None):
+        self.vocabularies = {name: pd.Index(sorted(set(map(str, values))))
+                             for name, values in vocabularies.items()}
+        self.columns = dict(_VOCABULARY if columns is None else columns)
+        self._dicts = {}
+
+    @classmethod
+    def from_reference(cls, airlines, airports):
+        """Dictionaries of the IATA codes in the airlines and airports tables."""
+        return cls({'AIRLINE': airlines['IATA_CODE'].dropna().unique(),
+                    'AIRPORT': airports['IATA_CODE'].dropna().unique()})
+
+    @classmethod
+    def from_files(cls, airlines_path='airlines.csv', airports_path='airports.csv'):
+        from .io import load_airlines, load_airports
+        return cls.from_reference(load_airlines(airlines_path), load_airports(airports_path))
+
+    @classmethod
+    def from_frame(cls, flights, columns=CATEGORY_COLUMNS):
+        """Dictionaries of the values present in ``flights``, for data without tables."""
+        return cls.from_chunks([flights], columns)
+
+    @classmethod
+    def from_chunks(cls, chunks, columns=CATEGORY_COLUMNS):
+        """Like ``from_frame`` over an iterable of DataFrame chunks."""
+        values = {}
+        for chunk in chunks:
+            for col in columns:
+                name = _VOCABULARY.get(col, col)
+                values.setdefault(name, set()).update(chunk[col].dropna().astype(str).unique())
+        return cls(values, {col: _VOCABULARY.get(col, col) for col in columns})
+
+    def vocabulary(self, column):
+        return self.vocabularies[self.columns[column]]
+
+    def dtype(self, column):
+        return code_dtype(len(self.vocabulary(column)))
+
+    def code(self, column, value):
+        """Code of one value; ``UNSEEN`` if it is not in the dictionary."""
+        mapping = self._dicts.get(column)
+        if mapping is None:
+            mapping = {v: i + 1 for i, v in enumerate(self.vocabulary(column))}
+            self._dicts[column] = mapping
+        return mapping.get(str(value), UNSEEN)
+
+    def encode(self, values, column):
+        """Codes of ``values`` (a Series or array) in the column's dtype."""
+        vocabulary = self.vocabulary(column)
+        dtype = self.dtype(column)
+        values = pd.Series(values) if not isinstance(values, pd.Series) else values
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            categories = values.cat.categories.astype(str)
+            # One extra slot at the end: cat.codes is -1 for missing values.
+            lookup = np.empty(len(categories) + 1, dtype=dtype)
+            lookup[:-1] = vocabulary.get_indexer(categories) + 1
+            lookup[-1] = UNSEEN
+            return lookup[values.cat.codes.to_numpy()]
+        codes = vocabulary.get_indexer(values.astype(str)) + 1
+        return codes.astype(dtype)
+
+    def decode(self, codes, column):
+        """Values of ``codes``; ``UNSEEN`` decodes to None."""
+        values = np.asarray(self.vocabulary(column), dtype=object)
+        values = np.concatenate([[None], values])
+        return values[np.asarray(codes, dtype=np.int64)]
+
+    def transform(self, flights, columns=None):
+        """Copy of ``flights`` with the categorical columns replaced by codes."""
+        columns = [c for c in self.columns if c in flights] if columns is None else columns
+        return flights.assign(**{col: self.encode(flights[col], col) for col in columns})
+
+    def to_dict(self):
+        return {'vocabularies': {k: list(v) for k, v in self.vocabularies.items()},
+                'columns': self.columns}
+
+    @classmethod
+    def from_dict(cls, state):
+        return cls(state['vocabularies'], state['columns'])
+
+    def save(self, path):
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+# Keys of the target statistics; ROUTE is the (origin, destination) pair.
+TARGET_KEYS = ('AIRLINE', 'ORIGIN_AIRPORT', 'DESTINATION_AIRPORT', 'ROUTE')
+TARGET_QUANTILES = (0.5, 0.9)
+# Prior weight (in rows) of the overall statistic in every key's statistic.
+SMOOTHING = 20
+N_FOLDS = 5
+
+
+def _group_stats(codes, y, n_codes, quantiles, prior, smoothing):
+    # Smoothed mean and quantiles of ``y`` per code; ``codes``/``y`` sorted by
+    # (code, y), so the quantiles are read off each group's slice with the
+    # 'linear' interpolation of np.quantile. Codes without rows get ``prior``.
+    counts = np.bincount(codes, minlength=n_codes)
+    sums = np.bincount(codes, weights=y, minlength=n_codes)
+    total = counts + smoothing
+    weight = np.divide(counts, total, out=np.zeros(n_codes), where=total > 0)
+    stats = np.empty((n_codes, 1 + len(quantiles)))
+    np.divide(sums + smoothing * prior[0], total, out=stats[:, 0], where=total > 0)
+    stats[total == 0, 0] = prior[0]
+    if not len(y):
+        stats[:, 1:] = prior[1:]
+        return stats
+    starts = np.cumsum(counts) - counts
+    last = np.maximum(starts + counts - 1, 0)
+    for i, q in enumerate(quantiles):
+        pos = starts + q * np.maximum(counts - 1, 0)
+        lo = np.minimum(np.floor(pos).astype(np.int64), len(y) - 1)
+        hi = np.minimum(np.minimum(lo + 1, last), len(y) - 1)
+        value = y[lo] + (y[hi] - y[lo]) * (pos - lo)
+        stats[:, i + 1] = weight * np.where(counts > 0, value, 0) + (1 - weight) * prior[i + 1]
+    return stats
+
+
+class TargetEncoder:
+    """Mean and quantiles of the target per airline, origin, destination and route.
+
+    The statistics are computed on the integer codes of a ``CategoryEncoder``
+    and kept as lookup arrays indexed by code (routes by ``origin *
+    n_airport_codes + destination``), so encoding a frame is one take per
+    key. Each statistic is shrunk towards the overall one with a prior
+    weight of ``smoothing`` rows; codes never seen in training get the
+    overall statistic.
+
+    ``fit_transform`` returns out-of-fold statistics for the training rows:
+    the rows are dealt into ``n_folds`` folds and the rows of each fold are
+    encoded with the statistics of the other folds only, so a row's own
+    target never leaks into its features. It also fits the lookup arrays on
+    all training rows, which ``transform`` uses for test rows and scoring.
+    """
+
+    def __init__(self, encoder, keys=TARGET_KEYS, quantiles=TARGET_QUANTILES,
+                 smoothing=SMOOTHING, n_folds=N_FOLDS, random_state=2, tables=None, prior=None):
+        self.encoder = encoder
+        self.keys = list(keys)
+        self.quantiles = tuple(quantiles)
+        self.smoothing = smoothing
+        self.n_folds = n_folds
+        self.random_state = random_state
+        self.tables = tables
+        self.prior = prior
+
+    @property
+    def columns(self):
+        """Names of the statistic columns, key by key."""
+        names = ['MEAN'] + ['P{:g}'.format(100 * q) for q in self.quantiles]
+        return ['{}_{}'.format(key, name) for key in self.keys for name in names]
+
+    def n_codes(self, key):
+        if key == 'ROUTE':
+            return self.n_codes('ORIGIN_AIRPORT') * self.n_codes('DESTINATION_AIRPORT')
+        return len(self.encoder.vocabulary(key)) + 1
+
+    def key_codes(self, codes):
+        """int64 codes per key from ``codes``, a mapping of column -> codes."""
+        out = {}
+        for key in self.keys:
+            if key == 'ROUTE':
+                out[key] = (np.asarray(codes['ORIGIN_AIRPORT'], dtype=np.int64)
+                            * self.n_codes('DESTINATION_AIRPORT')
+                            + np.asarray(codes['DESTINATION_AIRPORT'], dtype=np.int64))
+            else:
+                out[key] = np.asarray(codes[key], dtype=np.int64)
+        return out
+
+    def _prior(self, y):
+        return np.concatenate([[y.mean()], np.quantile(y, self.quantiles)])
+
+    def fit(self, codes, y):
+        """Fit the lookup arrays on all rows; returns ``self``."""
+        self.fit_transform(codes, y, out_of_fold=False)
+        return self
+
+    def fit_transform(self, codes, y, out_of_fold=True):
+        """Out-of-fold statistics of the rows as a float32 (rows, columns) matrix.
+
+        ``codes`` maps AIRLINE, ORIGIN_AIRPORT and DESTINATION_AIRPORT to
+        the integer codes of the rows (e.g. the columns of
+        ``CategoryEncoder.transform``) and ``y`` is their target.
+        """
+        y = np.asarray(y, dtype=np.float64)
+        if np.isnan(y).any():
+            raise ValueError('target statistics need a target without missing values')
+        if out_of_fold and self.n_folds < 2:
+            raise ValueError('n_folds must be at least 2, got {}'.format(self.n_folds))
+        n_stats = 1 + len(self.quantiles)
+        n = len(y)
+        # y is ranked once; each key then needs a single int64 sort by
+        # (code, rank), and every fold is a masked pass over the sorted rows.
+        rank = np.empty(n, dtype=np.int64)
+        rank[np.argsort(y, kind='stable')] = np.arange(n)
+        folds = None
+        if out_of_fold:
+            folds = np.empty(n, dtype=np.int8)
+            folds[np.random.default_rng(self.random_state).permutation(n)] = \
+                np.arange(n) % self.n_folds
+            priors = [self._prior(y[folds != f]) for f in range(self.n_folds)]
+        self.prior = self._prior(y)
+        self.tables = {}
+        out = np.empty((n, len(self.keys) * n_stats), dtype=np.float32) if out_of_fold else None
+        for j, (key, key_codes) in enumerate(self.key_codes(codes).items()):
+            n_codes = self.n_codes(key)
+            order = np.argsort(key_codes * n + rank)
+            sorted_codes, sorted_y = key_codes[order], y[order]
+            self.tables[key] = _group_stats(sorted_codes, sorted_y, n_codes, self.quantiles,
+                                            self.prior, self.smoothing)
+            if not out_of_fold:
+                continue
+            sorted_folds = folds[order]
+            for f in range(self.n_folds):
+                train = sorted_folds != f
+                table = _group_stats(sorted_codes[train], sorted_y[train], n_codes,
+                                     self.quantiles, priors[f], self.smoothing)
+                rows = folds == f
+                out[rows, j * n_stats:(j + 1) * n_stats] = table[key_codes[rows]]
+        return out
+
+    def transform(self, codes):
+        """Statistics of the fitted lookup arrays as a float32 (rows, columns) matrix."""
+        if self.tables is None:
+            raise ValueError('TargetEncoder is not fitted')
+        blocks = [self.tables[key][key_codes]
+                  for key, key_codes in self.key_codes(codes).items()]
+        return np.hstack(blocks).astype(np.float32)
+
+    def save(self, path):
+        """Write the lookup arrays and settings to an ``.npz`` file."""
+        settings = {'encoder': self.encoder.to_dict(), 'keys': self.keys,
+                    'quantiles': self.quantiles, 'smoothing': self.smoothing,
+                    'n_folds': self.n_folds, 'random_state': self.random_state}
+        with open(path + '.tmp', 'wb') as f:
+            np.savez(f, settings=json.dumps(settings), prior=self.prior,
+                     **{'table_' + key: table for key, table in self.tables.items()})
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            settings = json.loads(str(data['settings']))
+            tables = {key: data['table_' + key] for key in settings['keys']}
+            return cls(CategoryEncoder.from_dict(settings['encoder']), settings['keys'],
+                       settings['quantiles'], settings['smoothing'], settings['n_folds'],
+                       settings['random_state'], tables, data['prior'])
@@ -0,0 +1,252 @@
+"""Derived columns used by the EDA and the models."""
+import numpy as np
+import pandas as pd
+
+# Rows per block when scaling a feature matrix in place.
+BLOCK_ROWS = 1 << 18
+
+# HHMM clock time columns of flights.csv (In[79] feeds them to the models raw).
+TIME_COLUMNS = ('SCHEDULED_DEPARTURE', 'DEPARTURE_TIME', 'SCHEDULED_ARRIVAL', 'ARRIVAL_TIME')
+MINUTES_PER_DAY = 24 * 60
+# Half width (minutes) of the window of the congestion counts.
+CONGESTION_WINDOW = 60
+# Time features the models get with ``time_features=True`` in place of the
+# raw HHMM columns, and the raw columns each is derived from.
+# ORIGIN_CONGESTION is left out: it depends on the whole schedule at hand,
+# not on the flight alone, so a single flight could not be scored.
+TIME_FEATURE_INPUTS = dict(
+    [(col + '_MIN', (col,)) for col in TIME_COLUMNS]
+    + [(name + part, (col,)) for name, col in (('DEPARTURE', 'SCHEDULED_DEPARTURE'),
+                                               ('ARRIVAL', 'SCHEDULED_ARRIVAL'))
+       for part in ('_HOUR_SIN', '_HOUR_COS')]
+    + [('DAY_OF_YEAR_SIN', ('MONTH', 'DAY')), ('DAY_OF_YEAR_COS', ('MONTH', 'DAY')),
+       ('DAY_OF_WEEK_SIN', ('DAY_OF_WEEK',)), ('DAY_OF_WEEK_COS', ('DAY_OF_WEEK',))])
+MODEL_TIME_FEATURES = list(TIME_FEATURE_INPUTS)
+
+# Lower bounds (minutes) of the small / medium / large delay classes.
+DELAY_THRESHOLDS = (15, 30, 60)
+
+# Column the delay class of each delay column is stored in. DELAY_TYPE keeps
+# its original name (In[32]) since the delay_type models use it as target.
+DELAY_TYPE_COLUMNS = {'DEPARTURE_DELAY': 'DELAY_TYPE',
+                      'ARRIVAL_DELAY': 'ARRIVAL_DELAY_TYPE'}
+
+
+def delay_type(delays, thresholds=DELAY_THRESHOLDS):
+    """Bin delays into int8 classes 0, 1, 2, ... with ``np.digitize``.
+
+    Class ``i`` holds delays in ``[thresholds[i], thresholds[i + 1])``, the
+    last class is open ended. Delays below ``thresholds[0]`` also fall in
+    class 0, as with the original ``lambda x:((0,1)[x >= 30],2)[x >= 60]``
+    (departure delays are >= 15 after cleaning anyway). Missing delays get -1.
+    """
+    values = np.asarray(delays, dtype=np.float64)
+    codes = np.digitize(values, np.asarray(thresholds[1:], dtype=np.float64)).astype(np.int8)
+    codes[np.isnan(values)] = -1
+    if isinstance(delays, pd.Series):
+        return pd.Series(codes, index=delays.index, name='DELAY_TYPE')
+    return codes
+
+
+def delay_type_labels(thresholds=DELAY_THRESHOLDS):
+    """Legend texts of the delay classes, as used in the countplots."""
+    names = ['az gecikme', 'orta gecikme', 'büyük gecikme']
+    labels = []
+    for i, low in enumerate(thresholds):
+        name = names[i] if i < len(names) else 'gecikme {}'.format(i)
+        if i + 1 < len(thresholds):
+            op = '<' if i == 0 else '<='
+            labels.append('{} ({} {} t < {} min)'.format(name, low, op, thresholds[i + 1]))
+        else:
+            labels.append('{} (t >= {} min)'.format(name, low))
+    return labels
+
+
+def delay_type_column(df, delay_col='DEPARTURE_DELAY', thresholds=DELAY_THRESHOLDS):
+    """Return the name of the delay class column of ``delay_col``.
+
+    The column is computed on the first call and reused afterwards, so
+    plotting helpers can call this for every attribute they draw without
+    rebinning the whole frame.
+    """
+    col = DELAY_TYPE_COLUMNS.get(delay_col, delay_col + '_TYPE')
+    if col not in df.columns:
+        df[col] = delay_type(df[delay_col], thresholds)
+    return col
+
+
+def split_order(n_rows, test_size=0.3, random_state=2):
+    """Row order with the train rows first, and the number of train rows.
+
+    The rows and their order are those of ``train_test_split(X, y,
+    test_size=test_size, random_state=random_state)``, so ``X[order]``
+    splits into its ``X_train`` and ``X_test`` by slicing.
+    """
+    from sklearn.model_selection import train_test_split
+
+    train, test = train_test_split(np.arange(n_rows), test_size=test_size,
+                                   random_state=random_state)
+    return np.concatenate([train, test]), len(train)
+
+
+def feature_matrix(flights, target, columns=None, order=None, encoder=None, dtype=np.float32,
+                   out=None):
+    """Model features of ``flights`` as one C-contiguous ``dtype`` matrix.
+
+    Every feature column is written once into the matrix (``out`` if given,
+    e.g. an ``np.lib.format.open_memmap``), in the row order ``order``, and
+    columns of ``encoder`` are encoded on the way, so neither an encoded
+    copy of the frame nor a split copy is made. ``columns`` defaults to all
+    columns but ``target``. Returns ``(X, y, columns)``; ``y`` is None
+    without a ``target``.
+    """
+    columns = [c for c in flights.columns if c != target] if columns is None else list(columns)
+    n_rows = len(flights) if order is None else len(order)
+    X = np.empty((n_rows, len(columns)), dtype=dtype) if out is None else out
+    for j, col in enumerate(columns):
+        if encoder is not None and col in encoder.columns:
+            values = encoder.encode(flights[col], col)
+        else:
+            values = flights[col].to_numpy()
+        X[:, j] = values if order is None else values[order]
+    if target is None:
+        return X, None, columns
+    y = flights[target].to_numpy()
+    return X, y if order is None else y[order], columns
+
+
+def standardize(X, n_train=None, block_rows=BLOCK_ROWS):
+    """Standardize ``X`` in place with the statistics of its first ``n_train`` rows.
+
+    The scaler is fitted with ``partial_fit`` over blocks of ``block_rows``
+    rows, so its float64 temporaries stay block sized. Returns the fitted
+    ``StandardScaler``, which copies its input again like a default one.
+    """
+    from sklearn.preprocessing import StandardScaler
+
+    n_train = len(X) if n_train is None else n_train
+    scaler = StandardScaler(copy=False)
+    for start in range(0, n_train, block_rows):
+        scaler.partial_fit(X[start:min(start + block_rows, n_train)])
+    for start in range(0, len(X), block_rows):
+        scaler.transform(X[start:start + block_rows])
+    scaler.copy = True
+    return scaler
+
+
+def hhmm_to_minutes(values):
+    """Minutes since midnight of HHMM clock times: 1305 -> 785, 2400 -> 0.
+
+    Integer input gives int16, float input float32 with NaN kept.
+    """
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.integer):
+        values = values.astype(np.int32)
+        return ((values // 100 * 60 + values % 100) % MINUTES_PER_DAY).astype(np.int16)
+    values = values.astype(np.float32)
+    return (np.floor(values / 100) * 60 + np.fmod(values, 100)) % MINUTES_PER_DAY
+
+
+def cyclic(values, period):
+    """``(sin, cos)`` float32 encoding of ``values`` on a circle of ``period``."""
+    angle = np.asarray(values, dtype=np.float32) * np.float32(2 * np.pi / period)
+    return np.sin(angle), np.cos(angle)
+
+
+def flight_date(month, day, year=2015):
+    """``datetime64[D]`` dates of MONTH/DAY (and YEAR, a scalar or a column)."""
+    months = (np.asarray(year, dtype=np.int64) - 1970) * 12 + np.asarray(month, dtype=np.int64) - 1
+    return months.astype('datetime64[M]').astype('datetime64[D]') + (np.asarray(day) - 1)
+
+
+def _codes(values):
+    # Integer codes of an airport column (categorical, strings or encoded ints).
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy().astype(np.int64)
+    if np.issubdtype(values.dtype, np.integer):
+        return values.to_numpy().astype(np.int64)
+    return pd.factorize(values)[0].astype(np.int64)
+
+
+def congestion(airports, minutes, window=CONGESTION_WINDOW):
+    """Number of other flights of the same airport within ``window`` minutes.
+
+    ``airports`` are integer codes and ``minutes`` absolute times in minutes
+    (e.g. day number * 1440 + minutes since midnight), so windows cross
+    midnight. Each (airport, time) pair becomes one int64 key with airports
+    spaced wider than the window, the keys are sorted once and both window
+    ends are found with ``searchsorted`` on the sorted keys.
+    """
+    minutes = np.asarray(minutes, dtype=np.int64)
+    if not len(minutes):
+        return np.zeros(0, dtype=np.int32)
+    low = minutes.min()
+    spacing = minutes.max() - low + 2 * window + 1
+    keys = np.asarray(airports, dtype=np.int64) * spacing + (minutes - low)
+    order = np.argsort(keys)
+    keys = keys[order]
+    counts = np.empty(len(keys), dtype=np.int32)
+    counts[order] = (np.searchsorted(keys, keys + window, side='right')
+                     - np.searchsorted(keys, keys - window, side='left') - 1)
+    return counts
+
+
+def time_features(flights, year=2015, window=CONGESTION_WINDOW,
+                  origin_congestion=True):
+    """Time features of ``flights`` as a new DataFrame on the same index.
+
+    * ``<time column>_MIN``: the HHMM columns as minutes since midnight;
+    * ``DEPARTURE_HOUR_SIN/COS``, ``ARRIVAL_HOUR_SIN/COS``: the scheduled
+      times on the 24 hour circle, so 23:50 and 00:10 are neighbours;
+    * ``FLIGHT_DATE`` from MONTH/DAY (and YEAR if present, else ``year``),
+      ``DAY_OF_YEAR_SIN/COS`` and ``DAY_OF_WEEK_SIN/COS``;
+    * ``ORIGIN_CONGESTION``: other departures scheduled at the same origin
+      within +-``window`` minutes, counted over the rows of ``flights`` (use
+      the full schedule, not only the delayed flights, for traffic); only
+      with ``origin_congestion``.
+
+    Everything is vectorized; a few million rows take seconds.
+    """
+    out = {}
+    for col in TIME_COLUMNS:
+        if col in flights:
+            out[col + '_MIN'] = hhmm_to_minutes(flights[col])
+    for name, col in (('DEPARTURE', 'SCHEDULED_DEPARTURE'), ('ARRIVAL', 'SCHEDULED_ARRIVAL')):
+        if col in flights:
+            out[name + '_HOUR_SIN'], out[name + '_HOUR_COS'] = cyclic(out[col + '_MIN'],
+                                                                      MINUTES_PER_DAY)
+    date = None
+    if 'MONTH' in flights and 'DAY' in flights:
+        date = flight_date(flights['MONTH'], flights['DAY'],
+                           flights['YEAR'] if 'YEAR' in flights else year)
+        out['FLIGHT_DATE'] = date
+        first = date.astype('datetime64[Y]').astype('datetime64[D]')
+        out['DAY_OF_YEAR_SIN'], out['DAY_OF_YEAR_COS'] = cyclic(
+            (date - first).astype(np.int64), 365.25)
+    if 'DAY_OF_WEEK' in flights:
+        weekday = flights['DAY_OF_WEEK'].to_numpy().astype(np.int64) - 1
+        out['DAY_OF_WEEK_SIN'], out['DAY_OF_WEEK_COS'] = cyclic(weekday, 7)
+    if (origin_congestion and date is not None and 'ORIGIN_AIRPORT' in flights
+            and 'SCHEDULED_DEPARTURE' in flights):
+        minutes = (date.astype(np.int64) * MINUTES_PER_DAY
+                   + out['SCHEDULED_DEPARTURE_MIN'].astype(np.int64))
+        out['ORIGIN_CONGESTION'] = congestion(_codes(flights['ORIGIN_AIRPORT']), minutes, window)
+    return pd.DataFrame(out, index=flights.index)
+
+
+def with_time_features(columns):
+    """Model ``columns`` with their HHMM columns replaced by time features.
+
+    The time features (those of ``MODEL_TIME_FEATURES`` whose inputs are
+    HHMM columns of ``columns`` or calendar columns) go last.
+    """
+    columns = list(columns)
+    times = [col for col, inputs in TIME_FEATURE_INPUTS.items()
+             if not set(inputs) & set(TIME_COLUMNS) or set(inputs) <= set(columns)]
+    return [col for col in columns if col not in TIME_COLUMNS] + times
+
+
+def model_time_features(flights, year=2015):
+    """The ``MODEL_TIME_FEATURES`` ``flights`` has the columns for, as a new DataFrame."""
+    times = time_features(flights, year, origin_congestion=False)
+    return times[[col for col in MODEL_TIME_FEATURES if col in times]]
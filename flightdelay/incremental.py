@@ -0,0 +1,266 @@
+"""Out-of-core training of the linear models of the zoo.
+
+In[92] fitted Lasso, LinearRegression and Ridge with one ``fit`` on the
+whole scaled training matrix, which has to fit in memory. All three only
+depend on the training data through a few sufficient statistics, so
+``stream_fit`` reads the flights chunk by chunk and keeps just those:
+
+* ``LinearMoments`` holds n, the means and the co-moment matrix
+  ``sum((a - mean)(a - mean)^T)`` of the features and the target, updated
+  per chunk with the pairwise (Chan/Welford) formula, which does not lose
+  precision on columns with large means such as the HHMM times;
+* its diagonal gives the variances of the StandardScaler;
+* the co-moments of the standardized features are the centered normal
+  equations ``X^T X`` and ``X^T y``: LinearRegression solves them, Ridge
+  adds ``alpha`` to the diagonal and Lasso runs coordinate descent on the
+  Gram matrix (sklearn's ``precompute`` path) with sklearn's duality gap
+  stopping rule.
+
+The result are ordinary sklearn estimators, so ``ModelBundle``,
+``compile_model`` and the reports use them unchanged::
+
+    python -m flightdelay clean flights.csv clean/
+    python -m flightdelay train clean/ --models Lasso,Ridge --chunksize 1M
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from .clean import MIN_DELAY, iter_chunks
+from .encoding import CATEGORY_COLUMNS, CategoryEncoder
+from .features import DELAY_TYPE_COLUMNS, delay_type_column
+from .inference import LINEAR_MODELS
+from .models import MODEL_COLUMNS, make_models
+
+LASSO_MAX_ITER = 1000
+# Targets derived per chunk from a delay column: DELAY_TYPE, ARRIVAL_DELAY_TYPE.
+_DELAY_TYPE_SOURCES = {col: delay for delay, col in DELAY_TYPE_COLUMNS.items()}
+
+
+class LinearMoments:
+    """Running n, means and co-moments of ``[features, target]``."""
+
+    def __init__(self, n_features, n=0, mean=None, comoment=None):
+        k = n_features + 1
+        self.n_features = n_features
+        self.n = int(n)
+        self.mean = np.zeros(k) if mean is None else np.asarray(mean, dtype=np.float64)
+        self.comoment = (np.zeros((k, k)) if comoment is None
+                         else np.asarray(comoment, dtype=np.float64))
+
+    def update(self, X, y):
+        """Fold the rows of ``X``, ``y`` into the moments; returns ``self``."""
+        A = np.column_stack([X, y]).astype(np.float64, copy=False)
+        A = A[~np.isnan(A).any(axis=1)]
+        if not len(A):
+            return self
+        mean = A.mean(axis=0)
+        D = A - mean
+        return self._combine(len(A), mean, D.T @ D)
+
+    def merge(self, other):
+        """Return the moments of both data sets together."""
+        if self.n_features != other.n_features:
+            raise ValueError('cannot merge moments of {} and {} features'.format(
+                self.n_features, other.n_features))
+        out = LinearMoments(self.n_features, self.n, self.mean.copy(), self.comoment.copy())
+        return out._combine(other.n, other.mean, other.comoment)
+
+    def _combine(self, n, mean, comoment):
+        total = self.n + n
+        if not n:
+            return self
+        delta = mean - self.mean
+        self.comoment += comoment + np.outer(delta, delta) * (self.n * n / total)
+        self.mean += delta * (n / total)
+        self.n = total
+        return self
+
+    @property
+    def variance(self):
+        """Population variance of the features, as StandardScaler.var_."""
+        return np.diag(self.comoment)[:self.n_features] / self.n
+
+    def scaler(self, features=None):
+        """A fitted ``StandardScaler`` with the streamed mean and variance."""
+        from sklearn.preprocessing import StandardScaler
+
+        sc = StandardScaler()
+        var = self.variance
+        sc.mean_ = self.mean[:self.n_features].copy()
+        sc.var_ = var
+        # Constant columns keep scale 1, as in sklearn.
+        sc.scale_ = np.where(var > 0, np.sqrt(var), 1.0)
+        sc.n_samples_seen_ = self.n
+        sc.n_features_in_ = self.n_features
+        if features is not None:
+            sc.feature_names_in_ = np.asarray(features, dtype=object)
+        return sc
+
+    def normal_equations(self):
+        """``(X^T X, X^T y, y^T y)`` of the centered, standardized data."""
+        k = self.n_features
+        scale = np.sqrt(self.variance)
+        scale[scale == 0] = 1.0
+        gram = self.comoment[:k, :k] / np.outer(scale, scale)
+        xy = self.comoment[:k, k] / scale
+        return gram, xy, self.comoment[k, k]
+
+
+def _lasso_gram(gram, xy, yy, penalty, max_iter=LASSO_MAX_ITER, tol=1e-4):
+    # Cyclic coordinate descent on 0.5 w^T G w - w^T q + penalty |w|_1, the
+    # same updates and duality gap test as sklearn's enet_coordinate_descent_gram.
+    k = len(xy)
+    w = np.zeros(k)
+    h = np.zeros(k)
+    diag = np.diag(gram)
+    gap_tol = tol * yy
+    n_iter = 0
+    for n_iter in range(1, max_iter + 1):
+        w_max = d_max = 0.0
+        for j in range(k):
+            if diag[j] == 0:
+                continue
+            old = w[j]
+            rho = xy[j] - h[j] + diag[j] * old
+            new = np.sign(rho) * max(abs(rho) - penalty, 0.0) / diag[j]
+            if new != old:
+                h += gram[:, j] * (new - old)
+                w[j] = new
+            d_max = max(d_max, abs(new - old))
+            w_max = max(w_max, abs(new))
+        if w_max == 0 or d_max / w_max < tol or n_iter == max_iter:
+            q_dot_w = w @ xy
+            r_norm2 = yy + w @ h - 2 * q_dot_w
+            dual_norm = np.abs(xy - h).max()
+            const = penalty / dual_norm if dual_norm > penalty else 1.0
+            gap = (0.5 * r_norm2 * (1 + const ** 2) + penalty * np.abs(w).sum()
+                   - const * (yy - q_dot_w))
+            if gap < gap_tol:
+                break
+    return w, n_iter
+
+
+def fit_linear(moments, estimator):
+    """Fit a LinearRegression, Ridge or Lasso on streamed ``moments``; returns it."""
+    name = type(estimator).__name__
+    if name not in LINEAR_MODELS:
+        raise ValueError('{} cannot be trained from moments'.format(name))
+    gram, xy, yy = moments.normal_equations()
+    if not estimator.fit_intercept:
+        # The features are centered by the scaler; only y^T y changes.
+        yy += moments.n * moments.mean[-1] ** 2
+    if name == 'LinearRegression':
+        # Minimum norm solution like the lstsq of LinearRegression.fit.
+        coef = np.linalg.lstsq(gram, xy, rcond=None)[0]
+    elif name == 'Ridge':
+        coef = np.linalg.solve(gram + estimator.alpha * np.eye(len(xy)), xy)
+    else:
+        coef, estimator.n_iter_ = _lasso_gram(gram, xy, yy, estimator.alpha * moments.n,
+                                              estimator.max_iter, estimator.tol)
+    # The standardized features have mean zero, so the intercept is mean(y).
+    estimator.coef_ = coef
+    estimator.intercept_ = float(moments.mean[-1]) if estimator.fit_intercept else 0.0
+    estimator.n_features_in_ = moments.n_features
+    return estimator
+
+
+def holdout_mask(n_rows, part, test_size=0.3, random_state=2):
+    """Test rows of chunk number ``part``; the same rows on every pass."""
+    return np.random.default_rng([random_state, part]).random(n_rows) < test_size
+
+
+def _chunk_xy(chunk, encoder, target, min_delay=MIN_DELAY):
+    # The filter of clean_flights on the model columns; a no-op on the
+    # output of stream_clean.
+    chunk = chunk[MODEL_COLUMNS]
+    chunk = chunk[chunk.DEPARTURE_DELAY >= min_delay].dropna()
+    if target in _DELAY_TYPE_SOURCES:
+        delay_type_column(chunk, _DELAY_TYPE_SOURCES[target])
+    X = encoder.transform(chunk).drop(target, axis=1)
+    return X.to_numpy(dtype=np.float64), chunk[target].to_numpy(dtype=np.float64), list(X.columns)
+
+
+def _iter_split(source, encoder, target, chunksize, test_size, random_state):
+    # (X, y, is_test, features) of every chunk of ``source``.
+    for part, chunk in enumerate(iter_chunks(source, MODEL_COLUMNS, chunksize)):
+        X, y, features = _chunk_xy(chunk, encoder, target)
+        yield X, y, holdout_mask(len(X), part, test_size, random_state), features
+
+
+# ``estimators`` maps model names to fitted estimators on the features
+# standardized with ``scaler``; ``moments`` are those of the training rows.
+StreamedModels = namedtuple('StreamedModels', ['estimators', 'scaler', 'encoder', 'features',
+                                               'moments'])
+
+
+def stream_fit(source, names=('Lasso', 'Linear Regression', 'Ridge'), target='ARRIVAL_DELAY',
+               encoder=None, chunksize=1_000_000, test_size=0.3, random_state=2):
+    """Fit the linear models of ``names`` in one pass over ``source``.
+
+    ``source`` is anything ``iter_chunks`` reads, preferably the cleaned
+    parts of ``stream_clean``. Each chunk is split into train and test rows
+    with ``holdout_mask``, so the split is fixed for a given ``chunksize``.
+    Without ``encoder`` an extra pass over the category columns builds it.
+    The DELAY_TYPE targets are derived per chunk. Memory use is bounded by
+    ``chunksize``.
+    """
+    if target not in MODEL_COLUMNS and target not in _DELAY_TYPE_SOURCES:
+        raise ValueError('cannot stream target {}; use one of {}'.format(
+            target, ', '.join(MODEL_COLUMNS + list(_DELAY_TYPE_SOURCES))))
+    models = make_models(names)
+    for name, model in models.items():
+        if type(model).__name__ not in LINEAR_MODELS:
+            raise ValueError('{} cannot be trained out of core'.format(name))
+    if encoder is None:
+        encoder = CategoryEncoder.from_chunks(iter_chunks(source, CATEGORY_COLUMNS, chunksize))
+
+    moments = features = None
+    for X, y, is_test, features in _iter_split(source, encoder, target, chunksize, test_size,
+                                               random_state):
+        if moments is None:
+            moments = LinearMoments(len(features))
+        moments.update(X[~is_test], y[~is_test])
+    if moments is None or not moments.n:
+        raise ValueError('no training rows in {}'.format(source))
+
+    estimators = {name: fit_linear(moments, model) for name, model in models.items()}
+    return StreamedModels(estimators, moments.scaler(features), encoder, features, moments)
+
+
+def stream_report(source, streamed, target='ARRIVAL_DELAY', chunksize=1_000_000, test_size=0.3,
+                  random_state=2):
+    """``regression_report`` of the streamed models on the test rows of ``source``.
+
+    Pass the ``chunksize``, ``test_size`` and ``random_state`` of
+    ``stream_fit`` so the same rows are held out.
+    """
+    from .inference import compile_model
+
+    scorers = {name: compile_model(est, streamed.scaler, len(streamed.features))
+               for name, est in streamed.estimators.items()}
+    n = 0
+    y_moments = LinearMoments(0)
+    abs_err = dict.fromkeys(scorers, 0.0)
+    sq_err = dict.fromkeys(scorers, 0.0)
+    for X, y, is_test, _ in _iter_split(source, streamed.encoder, target, chunksize, test_size,
+                                        random_state):
+        X, y = X[is_test], y[is_test]
+        n += len(y)
+        y_moments.update(np.empty((len(y), 0)), y)
+        for name, scorer in scorers.items():
+            err = scorer.predict(X) - y
+            abs_err[name] += np.abs(err).sum()
+            sq_err[name] += err @ err
+    if not n:
+        raise ValueError('no test rows in {}'.format(source))
+
+    rows = {}
+    for name in scorers:
+        mse = sq_err[name] / n
+        rows[name] = {'Mean Absolute Error': abs_err[name] / n,
+                      'Mean Squared Error': mse,
+                      'Root Mean Squared Error': np.sqrt(mse),
+                      'R2': 1 - sq_err[name] / y_moments.comoment[0, 0]}
+    return pd.DataFrame.from_dict(rows, orient='index')
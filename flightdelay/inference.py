@@ -0,0 +1,262 @@
+"""Fast inference for the fitted models of the zoo.
+
+The notebook scaled the test features with ``sc1.transform`` and then
+called ``predict``, which allocates a scaled copy of the feature matrix on
+every call and, for the ensembles, runs one ``predict`` per member.
+``compile_model`` turns a fitted estimator plus its StandardScaler into a
+scorer that works on the raw (unscaled) features:
+
+* Lasso, LinearRegression and Ridge fold the scaler into one weight vector
+  and intercept: ``(x - m) / s @ c + b == x @ (c / s) + (b - m / s @ c)``;
+* a Bagging ensemble of linear models is their average, so it collapses to
+  one weight vector as well (each member's weights are scattered onto the
+  features it was trained on);
+* an AdaBoost ensemble of linear models predicts the weighted median of its
+  members, which is not linear; the members are stacked into one weight
+  matrix, scored with a single matrix product and the weighted median is
+  taken row-wise exactly as sklearn does;
+* a DecisionTree or RandomForest is flattened into contiguous node arrays
+  (feature, threshold, children, value); a batch walks all trees together,
+  one vectorized step per tree level, instead of paying sklearn's input
+  check and thread dispatch once per tree.
+
+Other estimators fall back to scaling and ``predict``.
+"""
+import numpy as np
+
+LINEAR_MODELS = ('LinearRegression', 'Ridge', 'Lasso')
+TREE_MODELS = ('DecisionTreeRegressor', 'ExtraTreeRegressor')
+FOREST_MODELS = ('RandomForestRegressor', 'ExtraTreesRegressor')
+# Forests walk batches of WALK_ROWS through all trees at once. Below that
+# one call per tree is cheaper than one NumPy step per level; above it the
+# trees' own compiled ``apply`` is as fast.
+WALK_ROWS = (32, 4096)
+
+
+def _scaler_params(scaler, n_features):
+    mean = getattr(scaler, 'mean_', None) if scaler is not None else None
+    scale = getattr(scaler, 'scale_', None) if scaler is not None else None
+    mean = np.zeros(n_features) if mean is None else np.asarray(mean, dtype=np.float64)
+    scale = np.ones(n_features) if scale is None else np.asarray(scale, dtype=np.float64)
+    return mean, scale
+
+
+def _is_linear(estimator):
+    return (type(estimator).__name__ in LINEAR_MODELS
+            and getattr(estimator, 'coef_', None) is not None)
+
+
+def _linear_params(estimator):
+    coef = np.asarray(estimator.coef_, dtype=np.float64).ravel()
+    return coef, float(np.ravel(estimator.intercept_)[0])
+
+
+def _fold(coef, intercept, mean, scale):
+    weights = coef / scale
+    return weights, intercept - mean @ weights
+
+
+def _members(ensemble, n_features):
+    # Weights of every member in the full feature space, before scaling.
+    features = getattr(ensemble, 'estimators_features_', None)
+    weights = np.zeros((len(ensemble.estimators_), n_features))
+    intercepts = np.empty(len(ensemble.estimators_))
+    for i, member in enumerate(ensemble.estimators_):
+        coef, intercept = _linear_params(member)
+        if features is None:
+            weights[i] = coef
+        else:
+            # Bagging members may be trained on a subset (or repeats) of features.
+            np.add.at(weights[i], np.asarray(features[i]), coef)
+        intercepts[i] = intercept
+    return weights, intercepts
+
+
+class LinearScorer:
+    """``y = X @ weights + intercept`` on raw features."""
+
+    def __init__(self, weights, intercept):
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.intercept = float(intercept)
+
+    def predict(self, X):
+        X = np.asarray(X)
+        if X.dtype == np.float64:
+            return X @ self.weights + self.intercept
+        return self.predict_columns(X.T)
+
+    def predict_columns(self, columns):
+        """Score a sequence of 1-D feature columns (e.g. float32/int16 DataFrame columns).
+
+        Accumulates in float64 with one scratch vector, so no feature matrix
+        is ever built.
+        """
+        columns = list(columns)
+        y = np.full(len(columns[0]), self.intercept)
+        scratch = np.empty_like(y)
+        for w, col in zip(self.weights, columns):
+            np.multiply(col, w, out=scratch, casting='unsafe')
+            y += scratch
+        return y
+
+
+class WeightedMedianScorer:
+    """AdaBoost of linear members: weighted median of ``X @ W + b`` per row."""
+
+    def __init__(self, weights, intercepts, estimator_weights):
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.intercepts = np.asarray(intercepts, dtype=np.float64)
+        self.estimator_weights = np.asarray(estimator_weights, dtype=np.float64)
+
+    def predict(self, X):
+        predictions = np.asarray(X, dtype=np.float64) @ self.weights.T + self.intercepts
+        # Same selection as AdaBoostRegressor._get_median_predict.
+        sorted_idx = np.argsort(predictions, axis=1)
+        weight_cdf = np.cumsum(self.estimator_weights[sorted_idx], axis=1)
+        median_or_above = weight_cdf >= 0.5 * weight_cdf[:, -1][:, np.newaxis]
+        median_idx = median_or_above.argmax(axis=1)
+        rows = np.arange(len(predictions))
+        return predictions[rows, sorted_idx[rows, median_idx]]
+
+
+class ScaledScorer:
+    """Fallback: standardize, then call the estimator's own ``predict``."""
+
+    def __init__(self, estimator, mean, scale):
+        self.estimator = estimator
+        self.mean = mean
+        self.scale = scale
+
+    def predict(self, X):
+        return self.estimator.predict((np.asarray(X, dtype=np.float64) - self.mean) / self.scale)
+
+
+def _trees(estimator):
+    name = type(estimator).__name__
+    if name in TREE_MODELS:
+        trees = [estimator.tree_]
+    elif name in FOREST_MODELS:
+        trees = [member.tree_ for member in estimator.estimators_]
+    else:
+        return None
+    return trees if all(tree.n_outputs == 1 for tree in trees) else None
+
+
+class TreeScorer:
+    """A forest of sklearn trees flattened into contiguous node arrays.
+
+    Nodes of all trees are concatenated; ``children[2 * i]`` and
+    ``children[2 * i + 1]`` are the left and right child of node ``i``, and
+    a leaf is its own child. Forest batches within ``WALK_ROWS`` walk all
+    trees together with ``leaves``; other batches, and single trees, use
+    each tree's compiled ``apply`` on the same float32 matrix.
+    Features are standardized in float64 and cast to float32 exactly like
+    ``ScaledScorer`` followed by sklearn's own input check, so either way
+    the same leaves are reached, and the leaf values are summed tree by
+    tree like ``ForestRegressor.predict``.
+    """
+
+    def __init__(self, trees, mean, scale):
+        sizes = [tree.node_count for tree in trees]
+        self.roots = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.intp)
+        offsets = np.repeat(self.roots, sizes)
+        left = np.concatenate([tree.children_left for tree in trees]).astype(np.intp)
+        right = np.concatenate([tree.children_right for tree in trees]).astype(np.intp)
+        leaf = left < 0
+        nodes = np.arange(len(left))
+        left = np.where(leaf, nodes, left + offsets)
+        right = np.where(leaf, nodes, right + offsets)
+        self.children = np.column_stack([left, right]).ravel()
+        self.feature = np.where(leaf, 0,
+                                np.concatenate([tree.feature for tree in trees])).astype(np.intp)
+        self.threshold = np.concatenate([tree.threshold for tree in trees])
+        # Where NaN goes at each split (sklearn >= 1.3); right otherwise.
+        self.missing_left = np.concatenate(
+            [getattr(tree, 'missing_go_to_left', np.zeros(tree.node_count, dtype=np.uint8))
+             for tree in trees]).astype(bool)
+        self.value = np.concatenate([tree.value[:, 0, 0] for tree in trees])
+        self.trees = trees
+        self.mean = mean
+        self.scale = scale
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def leaves(self, X):
+        """Leaf node of every (tree, row) pair, shape ``(n_trees, len(X))``.
+
+        ``X`` holds standardized float32 features. Each step moves every
+        unfinished pair one level down; pairs that reached a leaf are
+        dropped once they are a tenth of them.
+        """
+        roots = self.roots
+        n, n_features = X.shape
+        flat = np.ascontiguousarray(X).ravel()
+        has_nan = bool(np.isnan(flat).any())
+        out = np.empty(len(roots) * n, dtype=np.intp)
+        node = np.repeat(roots, n)
+        base = np.tile(np.arange(n, dtype=np.intp) * n_features, len(roots))
+        pos = np.arange(len(out), dtype=np.intp)
+        while True:
+            x = flat[base + self.feature[node]]
+            # Same rule as sklearn: x <= threshold goes left, NaN as trained.
+            right = x > self.threshold[node]
+            if has_nan:
+                right |= np.isnan(x) & ~self.missing_left[node]
+            child = self.children[2 * node + right]
+            done = child == node
+            n_done = np.count_nonzero(done)
+            if n_done == len(node):
+                out[pos] = node
+                break
+            if n_done * 10 > len(node):
+                out[pos[done]] = node[done]
+                walking = np.flatnonzero(~done)
+                node, base, pos = child[walking], base[walking], pos[walking]
+            else:
+                node = child
+        return out.reshape(self.n_trees, n)
+
+    def predict(self, X):
+        X = (np.asarray(X, dtype=np.float64) - self.mean) / self.scale
+        X = X.astype(np.float32)
+        if self.n_trees > 1 and WALK_ROWS[0] <= len(X) <= WALK_ROWS[1]:
+            leaves = self.leaves(X)
+        else:
+            leaves = (tree.apply(X) + root for tree, root in zip(self.trees, self.roots))
+        # Trees are added in order, like ForestRegressor.predict.
+        y = np.zeros(len(X))
+        for tree_leaves in leaves:
+            y += self.value[tree_leaves]
+        y /= self.n_trees
+        return y
+
+
+def compile_model(estimator, scaler=None, n_features=None):
+    """Scorer of ``estimator`` on raw features, with ``scaler`` folded in when possible."""
+    if n_features is None:
+        n_features = getattr(estimator, 'n_features_in_', None)
+        if n_features is None:
+            n_features = len(scaler.mean_)
+    mean, scale = _scaler_params(scaler, n_features)
+    name = type(estimator).__name__
+
+    if _is_linear(estimator):
+        return LinearScorer(*_fold(*_linear_params(estimator), mean, scale))
+
+    trees = _trees(estimator)
+    if trees is not None:
+        return TreeScorer(trees, mean, scale)
+
+    members = getattr(estimator, 'estimators_', None)
+    if members is not None and len(members) and all(_is_linear(m) for m in members):
+        weights, intercepts = _members(estimator, n_features)
+        weights = weights / scale
+        intercepts = intercepts - weights @ mean
+        if name == 'BaggingRegressor':
+            return LinearScorer(weights.mean(axis=0), intercepts.mean())
+        if name == 'AdaBoostRegressor':
+            return WeightedMedianScorer(weights, intercepts,
+                                        estimator.estimator_weights_[:len(members)])
+    return ScaledScorer(estimator, mean, scale)
@@ -0,0 +1,134 @@
+"""Loading of the 2015 BTS flight data sets.
+
+``flights.csv`` is ~5.8M rows. Parsing it with pandas' default dtypes takes
+most of a minute and several GB of RAM, and half of the columns are dropped
+right after loading anyway. ``load_flights`` reads only the columns the
+analysis uses, with compact dtypes declared up front, and keeps a columnar
+copy next to the source so that later runs skip the CSV parse entirely.
+"""
+import hashlib
+import os
+import warnings
+
+import pandas as pd
+
+# Columns left after the cleaning cells drop the unused ones (In[17]).
+FLIGHT_DTYPES = {
+    'MONTH': 'int8',
+    'DAY': 'int8',
+    'DAY_OF_WEEK': 'int8',
+    'AIRLINE': 'category',
+    'ORIGIN_AIRPORT': 'category',
+    'DESTINATION_AIRPORT': 'category',
+    'SCHEDULED_DEPARTURE': 'int16',
+    'DEPARTURE_TIME': 'float32',
+    'DEPARTURE_DELAY': 'float32',
+    'SCHEDULED_TIME': 'float32',
+    'ELAPSED_TIME': 'float32',
+    'DISTANCE': 'int16',
+    'SCHEDULED_ARRIVAL': 'int16',
+    'ARRIVAL_TIME': 'float32',
+    'ARRIVAL_DELAY': 'float32',
+}
+FLIGHT_COLUMNS = list(FLIGHT_DTYPES)
+
+CACHE_FORMATS = ('parquet', 'feather')
+
+
+def file_hash(path, block_size=1 << 22):
+    """Return the blake2b hex digest of the file at ``path``."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def frame_fingerprint(df, columns=None):
+    """Return a hex digest of the values (not the index) of ``df[columns]``."""
+    if columns is not None:
+        df = df[list(columns)]
+    h = hashlib.blake2b(digest_size=16)
+    h.update(','.join(map(str, df.columns)).encode())
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def _cache_key(path, columns, dtypes):
+    # The column selection is part of the key so that asking for a different
+    # subset never returns a stale cache.
+    h = hashlib.blake2b(digest_size=8)
+    h.update(file_hash(path).encode())
+    for col in columns:
+        h.update('{}:{};'.format(col, dtypes[col]).encode())
+    return h.hexdigest()
+
+
+def cache_path(path, cache_dir=None, columns=None, fmt='parquet'):
+    """Return where the columnar cache of ``path`` lives."""
+    columns = FLIGHT_COLUMNS if columns is None else list(columns)
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(path)), '.cache')
+    stem = os.path.splitext(os.path.basename(path))[0]
+    key = _cache_key(path, columns, FLIGHT_DTYPES)
+    return os.path.join(cache_dir, '{}-{}.{}'.format(stem, key, fmt))
+
+
+def read_flights_csv(path, columns=None, **kwargs):
+    """Parse ``flights.csv`` with the compact dtypes, without any caching.
+
+    Extra keyword arguments go to ``pd.read_csv`` (e.g. ``chunksize``).
+    """
+    columns = FLIGHT_COLUMNS if columns is None else list(columns)
+    dtypes = {col: FLIGHT_DTYPES[col] for col in columns}
+    # Cancelled flights have no DEPARTURE_TIME/ARRIVAL_TIME, so those stay
+    # float32 with NaN; the integer columns are never missing in the BTS data.
+    return pd.read_csv(path, usecols=columns, dtype=dtypes, **kwargs)
+
+
+def load_flights(path='flights.csv', columns=None, cache=True, cache_dir=None,
+                 fmt='parquet'):
+    """Load the flights data set with compact dtypes.
+
+    The first call parses the CSV and writes a Parquet (or Feather) copy
+    keyed on the hash of the source file; later calls read that copy
+    instead, which takes a few seconds. If the source file changes, its hash
+    changes and the cache is rebuilt.
+    """
+    if fmt not in CACHE_FORMATS:
+        raise ValueError('fmt must be one of {}, got {!r}'.format(CACHE_FORMATS, fmt))
+    columns = FLIGHT_COLUMNS if columns is None else list(columns)
+    if not cache:
+        return read_flights_csv(path, columns)
+
+    target = cache_path(path, cache_dir, columns, fmt)
+    if os.path.exists(target):
+        try:
+            if fmt == 'parquet':
+                return pd.read_parquet(target, columns=columns)
+            return pd.read_feather(target, columns=columns)
+        except ImportError:
+            warnings.warn('pyarrow is not installed, reading {} without cache'.format(path))
+            return read_flights_csv(path, columns)
+
+    flights = read_flights_csv(path, columns)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp = target + '.tmp'
+    try:
+        if fmt == 'parquet':
+            flights.to_parquet(tmp, index=False)
+        else:
+            flights.to_feather(tmp)
+    except ImportError:
+        warnings.warn('pyarrow is not installed, {} will not be cached'.format(path))
+        return flights
+    os.replace(tmp, target)
+    return flights
+
+
+def load_airlines(path='airlines.csv'):
+    return pd.read_csv(path)
+
+
+def load_airports(path='airports.csv'):
+    return pd.read_csv(path)
@@ -0,0 +1,475 @@
+"""The regression model zoo and a cache of fitted models.
+
+The notebook fitted every model of the zoo three times per target: once for
+the metrics, once for the scatter plots and once for the box-whisker data.
+``fit_zoo`` fits each (model, target, feature set) once and stores the
+fitted estimator and its test predictions with joblib in a
+``ModelRegistry``, keyed by a fingerprint of the training data, so every
+report after the first reads them back instead of refitting.
+"""
+import argparse
+import hashlib
+import os
+import tempfile
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from .profiling import PeakRSS
+
+# Order of the zoo in the reports and in the box-whisker plot.
+MODEL_NAMES = ['Lasso', 'Linear Regression', 'Ridge', 'Random forest Regressor',
+               'Decision Tree Regressor', 'Boosted Linear', 'Boosted Lasso', 'Boosted Ridge',
+               'Bagged Linear', 'Bagged Lasso', 'Bagged Ridge']
+
+# Columns kept for modelling in In[79].
+MODEL_COLUMNS = ['AIRLINE', 'ORIGIN_AIRPORT', 'DESTINATION_AIRPORT', 'SCHEDULED_DEPARTURE',
+                 'DEPARTURE_TIME', 'DEPARTURE_DELAY', 'SCHEDULED_ARRIVAL', 'ARRIVAL_TIME',
+                 'ARRIVAL_DELAY', 'SCHEDULED_TIME', 'ELAPSED_TIME']
+
+# Most expensive first, so the parallel trainer starts the long fits early.
+_COST_ORDER = ['Random forest Regressor', 'Boosted Lasso', 'Boosted Ridge', 'Boosted Linear',
+               'Bagged Lasso', 'Bagged Ridge', 'Bagged Linear', 'Decision Tree Regressor',
+               'Lasso', 'Ridge', 'Linear Regression']
+
+# peak_rss is the resident set size (bytes) reached while fitting, when known.
+ModelRun = namedtuple('ModelRun', ['name', 'estimator', 'y_pred', 'fit_seconds', 'peak_rss'],
+                      defaults=(None,))
+
+
+def make_models(names=None):
+    """Return ``{name: unfitted estimator}`` for the zoo of In[85]."""
+    from sklearn.ensemble import AdaBoostRegressor, BaggingRegressor, RandomForestRegressor
+    from sklearn.linear_model import Lasso, LinearRegression, Ridge
+    from sklearn.tree import DecisionTreeRegressor
+
+    factories = {
+        'Lasso': lambda: Lasso(),
+        'Linear Regression': lambda: LinearRegression(),
+        'Ridge': lambda: Ridge(),
+        'Random forest Regressor': lambda: RandomForestRegressor(random_state=2),
+        'Decision Tree Regressor': lambda: DecisionTreeRegressor(random_state=2),
+        'Boosted Linear': lambda: AdaBoostRegressor(LinearRegression(), random_state=2),
+        'Boosted Lasso': lambda: AdaBoostRegressor(Lasso(), random_state=2),
+        'Boosted Ridge': lambda: AdaBoostRegressor(Ridge(), random_state=2),
+        'Bagged Linear': lambda: BaggingRegressor(LinearRegression(), random_state=2),
+        'Bagged Lasso': lambda: BaggingRegressor(Lasso(), random_state=2),
+        'Bagged Ridge': lambda: BaggingRegressor(Ridge(), random_state=2),
+    }
+    names = MODEL_NAMES if names is None else names
+    return {name: factories[name]() for name in names}
+
+
+# X arrays are standardized with ``scaler``; ``encoder`` is the
+# CategoryEncoder that turned the airline/airport columns into codes and
+# ``target_encoder`` the fitted TargetEncoder of the target statistic
+# columns, if any.
+ModelData = namedtuple('ModelData', ['X_train', 'X_test', 'y_train', 'y_test', 'features',
+                                     'scaler', 'encoder', 'target_encoder'], defaults=(None,))
+
+
+def model_data(flights, target='ARRIVAL_DELAY', test_size=0.3, random_state=2, encoder=None,
+               target_stats=False, time_features=False):
+    """Encoded, split and scaled data of In[86]-In[91] as a ``ModelData``.
+
+    Pass the ``CategoryEncoder`` of the reference tables as ``encoder`` so
+    the codes do not depend on the flights at hand; without it the codes
+    are built from the values in ``flights``. The features are written once
+    into a float32 matrix in ``train_test_split`` order and scaled in
+    place; X_train/X_test and y_train/y_test are views of it. With
+    ``time_features`` the HHMM columns are replaced by the time features of
+    ``features.with_time_features`` (``flights`` then needs MONTH, DAY and
+    DAY_OF_WEEK), and with ``target_stats`` the columns of
+    ``add_target_stats`` are appended.
+    """
+    from .encoding import CategoryEncoder, TargetEncoder
+    from .features import (feature_matrix, model_time_features, split_order, standardize,
+                           with_time_features)
+
+    encoder = CategoryEncoder.from_frame(flights) if encoder is None else encoder
+    order, n_train = split_order(len(flights), test_size, random_state)
+    features = [c for c in MODEL_COLUMNS if c != target]
+    times = None
+    if time_features:
+        features = with_time_features(features)
+        times = model_time_features(flights)
+    raw = [c for c in features if times is None or c not in times]
+    target_encoder = TargetEncoder(encoder, random_state=random_state) if target_stats else None
+    extra = target_encoder.columns if target_stats else []
+    X = np.empty((len(order), len(features) + len(extra)), dtype=np.float32)
+    _, y, _ = feature_matrix(flights, target, raw, order, encoder, out=X[:, :len(raw)])
+    if times is not None:
+        feature_matrix(times, None, features[len(raw):], order, out=X[:, len(raw):len(features)])
+    del order, times
+    if target_stats:
+        add_target_stats(X, y, n_train, features, target_encoder)
+    sc = standardize(X, n_train)
+    return ModelData(X[:n_train], X[n_train:], y[:n_train], y[n_train:], features + extra, sc,
+                     encoder, target_encoder)
+
+
+def add_target_stats(X, y, n_train, features, target_encoder):
+    """Fill the last columns of ``X`` with the target statistics of its rows.
+
+    ``X`` holds the unscaled ``features`` (with the airline and airport
+    codes) in its first columns, the ``n_train`` training rows first. The
+    training rows get out-of-fold statistics and the test rows those of
+    all training rows, so no test target is used.
+    """
+    codes = {col: X[:, features.index(col)].astype(np.int64)
+             for col in ('AIRLINE', 'ORIGIN_AIRPORT', 'DESTINATION_AIRPORT')}
+    start = len(features)
+    X[:n_train, start:] = target_encoder.fit_transform(
+        {col: c[:n_train] for col, c in codes.items()}, y[:n_train])
+    X[n_train:, start:] = target_encoder.transform({col: c[n_train:] for col, c in codes.items()})
+    return target_encoder
+
+
+def data_fingerprint(*arrays):
+    """Return a hex digest of the contents, shapes and dtypes of ``arrays``."""
+    h = hashlib.blake2b(digest_size=16)
+    for a in arrays:
+        a = np.ascontiguousarray(a)
+        h.update('{}{}'.format(a.dtype.str, a.shape).encode())
+        h.update(a.data)
+    return h.hexdigest()
+
+
+def _fit_one(name, estimator, X_train, y_train, X_test):
+    with PeakRSS() as fit:
+        estimator.fit(X_train, y_train)
+    y_pred = estimator.predict(X_test)
+    return ModelRun(name, estimator, y_pred, fit.seconds, fit.peak)
+
+
+def _slug(name):
+    return ''.join(c if c.isalnum() else '_' for c in name.lower())
+
+
+class ModelRegistry:
+    """joblib-backed cache of fitted models and their test predictions.
+
+    A run is identified by the model name, its hyper-parameters, the target,
+    the feature names and a fingerprint of the train/test data; changing any
+    of them trains a new model instead of returning a stale one.
+    """
+
+    def __init__(self, cache_dir=os.path.join('.cache', 'models')):
+        self.cache_dir = cache_dir
+        self._runs = {}
+
+    def key(self, name, estimator, target, features, fingerprint):
+        h = hashlib.blake2b(digest_size=12)
+        params = sorted((k, repr(v)) for k, v in estimator.get_params().items())
+        for part in (name, repr(params), target, ','.join(map(str, features)), fingerprint):
+            h.update(part.encode())
+            h.update(b'\0')
+        return '{}-{}-{}'.format(_slug(target), _slug(name), h.hexdigest())
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key + '.joblib')
+
+    def load(self, key):
+        """Return the cached ``ModelRun`` for ``key`` or None."""
+        if key in self._runs:
+            return self._runs[key]
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+        import joblib
+        run = ModelRun(**joblib.load(path))
+        self._runs[key] = run
+        return run
+
+    def store(self, key, run):
+        import joblib
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = self.path(key) + '.tmp'
+        joblib.dump(run._asdict(), tmp)
+        os.replace(tmp, self.path(key))
+        self._runs[key] = run
+
+    def fit(self, name, estimator, X_train, y_train, X_test, target, features=(),
+            fingerprint=None):
+        """Fit ``estimator`` unless an identical run is cached; return the run."""
+        if fingerprint is None:
+            fingerprint = data_fingerprint(X_train, y_train, X_test)
+        key = self.key(name, estimator, target, features, fingerprint)
+        run = self.load(key)
+        if run is None:
+            run = _fit_one(name, estimator, X_train, y_train, X_test)
+            self.store(key, run)
+        return run
+
+
+def fit_zoo(models, X_train, y_train, X_test, target, registry=None, features=()):
+    """Fit every model of ``models`` once; return ``{name: ModelRun}``.
+
+    The data fingerprint is computed once and shared by all models.
+    """
+    registry = ModelRegistry() if registry is None else registry
+    fingerprint = data_fingerprint(X_train, y_train, X_test)
+    return {name: registry.fit(name, model, X_train, y_train, X_test, target, features,
+                               fingerprint)
+            for name, model in models.items()}
+
+
+def fit_zoo_parallel(models, X_train, y_train, X_test, target, registry=None, features=(),
+                     n_jobs=-1, temp_folder=None):
+    """Like ``fit_zoo`` but trains the models concurrently in worker processes.
+
+    The train/test arrays are written once to ``.npy`` files and opened as
+    read-only memory maps, so every worker maps the same pages instead of
+    receiving a pickled copy. Cached runs are not retrained; the others are
+    submitted most expensive first, so the wall time approaches that of the
+    slowest model. Each run records its fit time and peak RSS.
+    """
+    import joblib
+
+    registry = ModelRegistry() if registry is None else registry
+    fingerprint = data_fingerprint(X_train, y_train, X_test)
+    keys = {name: registry.key(name, model, target, features, fingerprint)
+            for name, model in models.items()}
+    runs = {name: registry.load(key) for name, key in keys.items()}
+    rank = {name: i for i, name in enumerate(_COST_ORDER)}
+    todo = sorted((name for name, run in runs.items() if run is None),
+                  key=lambda name: rank.get(name, -1))
+
+    if todo:
+        with tempfile.TemporaryDirectory(dir=temp_folder) as tmp:
+            shared = []
+            for i, a in enumerate((X_train, y_train, X_test)):
+                path = os.path.join(tmp, '{}.npy'.format(i))
+                np.save(path, np.asarray(a))
+                shared.append(np.load(path, mmap_mode='r'))
+            fitted = joblib.Parallel(n_jobs=min(n_jobs, len(todo)) if n_jobs > 0 else n_jobs,
+                                     backend='loky', max_nbytes=None)(
+                joblib.delayed(_fit_one)(name, models[name], *shared) for name in todo)
+        for run in fitted:
+            registry.store(keys[run.name], run)
+            runs[run.name] = run
+    return {name: runs[name] for name in models}
+
+
+def run_timings(runs):
+    """Fit time (s) and peak RSS (MiB) of every run, slowest first."""
+    rows = {name: {'fit_seconds': run.fit_seconds,
+                   'peak_rss_mb': None if run.peak_rss is None else run.peak_rss / 2 ** 20}
+            for name, run in runs.items()}
+    return pd.DataFrame.from_dict(rows, orient='index').sort_values('fit_seconds',
+                                                                   ascending=False)
+
+
+def regression_report(y_test, runs):
+    """MAE/MSE/RMSE/R2 of every run, one row per model."""
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+    rows = {}
+    for name, run in runs.items():
+        mse = mean_squared_error(y_test, run.y_pred)
+        rows[name] = {'Mean Absolute Error': mean_absolute_error(y_test, run.y_pred),
+                      'Mean Squared Error': mse,
+                      'Root Mean Squared Error': np.sqrt(mse),
+                      'R2': r2_score(y_test, run.y_pred)}
+    return pd.DataFrame.from_dict(rows, orient='index')
+
+
+class ModelBundle:
+    """A fitted estimator plus everything needed to score raw flights.
+
+    Holds the feature order, the ``CategoryEncoder`` and the scaler of
+    ``model_data``, so records with airline/airport codes and raw times can
+    be scored outside the notebook session. Codes missing from the encoder
+    are scored with the reserved ``UNSEEN`` code. The estimator is compiled
+    with ``inference.compile_model``, which folds the scaler into linear
+    models and their ensembles and flattens decision trees and forests.
+    With a ``target_encoder`` its statistic columns are looked up from the
+    airline/airport codes of the records.
+    """
+
+    def __init__(self, name, estimator, scaler, encoder, features, target, target_encoder=None):
+        from .inference import compile_model
+
+        self.name = name
+        self.estimator = estimator
+        self.encoder = encoder
+        self.target_encoder = target_encoder
+        self.features = list(features)
+        self.target = target
+        self.scorer = compile_model(estimator, scaler, len(self.features))
+
+    @classmethod
+    def from_run(cls, run, data, target):
+        return cls(run.name, run.estimator, data.scaler, data.encoder, data.features, target,
+                   data.target_encoder)
+
+    @property
+    def input_columns(self):
+        """Columns ``columns`` reads from a frame.
+
+        Target statistics come from the airline/airport codes and time
+        features from the HHMM and calendar columns.
+        """
+        from .encoding import CATEGORY_COLUMNS
+        from .features import TIME_FEATURE_INPUTS
+
+        columns = []
+        for col in self.features:
+            if self.target_encoder is not None and col in self.target_encoder.columns:
+                columns += CATEGORY_COLUMNS
+            else:
+                columns += TIME_FEATURE_INPUTS.get(col, (col,))
+        return list(dict.fromkeys(columns))
+
+    def _stats(self, codes):
+        # Target statistic columns by name.
+        if self.target_encoder is None:
+            return {}
+        return dict(zip(self.target_encoder.columns, self.target_encoder.transform(codes).T))
+
+    def _uses_time_features(self):
+        from .features import TIME_FEATURE_INPUTS
+        return any(col in TIME_FEATURE_INPUTS for col in self.features)
+
+    def columns(self, flights):
+        """Raw feature columns of a DataFrame, categorical ones as integer codes."""
+        from .features import model_time_features
+
+        codes = {col: self.encoder.encode(flights[col], col)
+                 for col in self.encoder.columns if col in flights}
+        derived = self._stats(codes)
+        if self._uses_time_features():
+            derived.update((col, values.to_numpy())
+                           for col, values in model_time_features(flights).items())
+        return [derived[col] if col in derived else codes[col] if col in codes
+                else flights[col].to_numpy() for col in self.features]
+
+    def encode(self, records):
+        """Feature matrix of ``records`` (a DataFrame or a list of dicts)."""
+        if isinstance(records, pd.DataFrame):
+            return np.column_stack(self.columns(records)).astype(np.float64, copy=False)
+        if not records:
+            return np.empty((0, len(self.features)))
+        if self._uses_time_features():
+            return self.encode(pd.DataFrame.from_records(records))
+        code = self.encoder.code
+        coded = [col in self.encoder.columns for col in self.features]
+        stats = self._stats({col: [code(col, record[col]) for record in records]
+                             for col in self.encoder.columns if col in records[0]})
+        if not stats:
+            rows = [[code(col, record[col]) if is_coded else record[col]
+                     for col, is_coded in zip(self.features, coded)] for record in records]
+            return np.array(rows, dtype=np.float64).reshape(len(rows), len(self.features))
+        plain = [j for j, col in enumerate(self.features) if col not in stats]
+        rows = [[code(self.features[j], record[self.features[j]]) if coded[j]
+                 else record[self.features[j]] for j in plain] for record in records]
+        X = np.empty((len(records), len(self.features)))
+        X[:, plain] = np.array(rows, dtype=np.float64).reshape(len(rows), len(plain))
+        for j, col in enumerate(self.features):
+            if col in stats:
+                X[:, j] = stats[col]
+        return X
+
+    def predict_encoded(self, X):
+        return self.scorer.predict(X)
+
+    def predict(self, records):
+        return self.predict_encoded(self.encode(records))
+
+    def save(self, path):
+        import joblib
+        tmp = path + '.tmp'
+        joblib.dump(self, tmp)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        import joblib
+        return joblib.load(path)
+
+
+def main(argv=None):
+    from .clean import clean_flights
+    from .encoding import CategoryEncoder
+    from .features import DELAY_TYPE_COLUMNS, delay_type_column
+    from .io import load_flights
+    from .store import DatasetStore
+
+    parser = argparse.ArgumentParser(description='Train the model zoo into the registry.')
+    parser.add_argument('flights', nargs='?', default='flights.csv',
+                        help='flights CSV, dataset store or (with --chunksize) cleaned parts')
+    parser.add_argument('--target', default='ARRIVAL_DELAY')
+    parser.add_argument('--models', default=','.join(MODEL_NAMES))
+    parser.add_argument('--registry', help='model registry directory, default .cache/models')
+    parser.add_argument('--jobs', type=int, help='worker processes, default all cores')
+    parser.add_argument('--airlines', help='airlines.csv to take the airline codes from')
+    parser.add_argument('--airports', help='airports.csv to take the airport codes from')
+    parser.add_argument('--bundle', help='save a ModelBundle of one model to this path')
+    parser.add_argument('--bundle-model', help='model of the bundle, default the best R2')
+    parser.add_argument('--chunksize', help='train the linear models out of core, reading '
+                                            'chunks of this many rows (e.g. 1M)')
+    parser.add_argument('--time-features', action='store_true',
+                        help='replace the HHMM columns by minutes and cyclic hour, day of '
+                             'year and weekday features')
+    parser.add_argument('--target-stats', action='store_true',
+                        help='add out-of-fold mean/quantile target features per airline, '
+                             'airport and route')
+    args = parser.parse_args(argv)
+    # The out-of-core trainer streams the raw model columns only, fits in
+    # this process and does not use the registry.
+    if args.chunksize:
+        for flag in ('time_features', 'target_stats', 'registry', 'jobs'):
+            if getattr(args, flag) not in (None, False):
+                parser.error('--{} cannot be used with --chunksize'.format(flag.replace('_', '-')))
+
+    names = [m.strip() for m in args.models.split(',') if m.strip()]
+    encoder = None
+    if args.airlines and args.airports:
+        encoder = CategoryEncoder.from_files(args.airlines, args.airports)
+    if args.chunksize:
+        _main_streamed(args, names, encoder)
+        return
+    if DatasetStore.exists(args.flights):
+        data = DatasetStore(args.flights).model_data(args.target,
+                                                     target_stats=args.target_stats,
+                                                     time_features=args.time_features)
+    else:
+        flights = clean_flights(load_flights(args.flights))
+        # DELAY_TYPE (In[32]) is derived, as DatasetStore.build does.
+        delay_cols = {col: delay for delay, col in DELAY_TYPE_COLUMNS.items()}
+        if args.target in delay_cols and args.target not in flights:
+            delay_type_column(flights, delay_cols[args.target])
+        data = model_data(flights, args.target, encoder=encoder, target_stats=args.target_stats,
+                          time_features=args.time_features)
+    registry = ModelRegistry() if args.registry is None else ModelRegistry(args.registry)
+    runs = fit_zoo_parallel(make_models(names), data.X_train, data.y_train, data.X_test,
+                            args.target, registry, data.features,
+                            -1 if args.jobs is None else args.jobs)
+    report = regression_report(data.y_test, runs)
+    print(report.join(run_timings(runs)).to_string())
+    if args.bundle:
+        name = args.bundle_model or report['R2'].idxmax()
+        ModelBundle.from_run(runs[name], data, args.target).save(args.bundle)
+        print('{} saved to {}'.format(name, args.bundle))
+
+
+def _main_streamed(args, names, encoder):
+    from .bench import parse_size
+    from .incremental import stream_fit, stream_report
+
+    if args.models == ','.join(MODEL_NAMES):
+        names = ['Lasso', 'Linear Regression', 'Ridge']
+    chunksize = parse_size(args.chunksize)
+    streamed = stream_fit(args.flights, names, args.target, encoder, chunksize)
+    report = stream_report(args.flights, streamed, args.target, chunksize)
+    print(report.to_string())
+    if args.bundle:
+        name = args.bundle_model or report['R2'].idxmax()
+        ModelBundle(name, streamed.estimators[name], streamed.scaler, streamed.encoder,
+                    streamed.features, args.target).save(args.bundle)
+        print('{} saved to {}'.format(name, args.bundle))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+"""Fast previews of the EDA distribution plots.
+
+The distribution figures of the notebook (``sns.distplot`` per numeric
+column in In[26], the 1000 bin delay histograms of In[30]/In[31] and the
+per-airline box plots of In[69]/In[70]) were drawn from every row of the
+cleaned frame, so their cost grew with the data. This module offers two
+ways around that:
+
+* ``stratified_sample`` keeps a reservoir per AIRLINE/MONTH stratum and
+  returns a proportional sample whose size follows from an error bound;
+* ``histogram`` and ``box_stats`` reduce a column to binned counts or to the
+  five numbers of a box plot once, after which drawing costs O(bins) or
+  O(groups) however many rows there are.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+SAMPLE_STRATA = ('AIRLINE', 'MONTH')
+DEFAULT_ERROR = 0.01
+DEFAULT_CONFIDENCE = 0.95
+WHISKER = 1.5
+
+
+def sample_size(error=DEFAULT_ERROR, confidence=DEFAULT_CONFIDENCE):
+    """Rows needed so the sample CDF is within ``error`` of the true one.
+
+    From the Dvoretzky-Kiefer-Wolfowitz inequality: with probability
+    ``confidence`` no quantile of the sample is off by more than ``error``
+    in rank (0.01 = one percentile). Proportional stratification only
+    lowers the variance, so the bound holds for ``stratified_sample`` too.
+    """
+    if not 0 < error < 1 or not 0 < confidence < 1:
+        raise ValueError('error and confidence must lie in (0, 1)')
+    return int(math.ceil(math.log(2 / (1 - confidence)) / (2 * error ** 2)))
+
+
+class StratifiedReservoir:
+    """Streaming stratified sample of flights.
+
+    Every row gets a uniform random key and each stratum keeps the rows with
+    the ``size`` smallest keys, which is a reservoir sample of the stratum
+    that can be fed chunk by chunk (and merged, since bottom-k of the union
+    is bottom-k of the parts). ``sample`` then shrinks each stratum to its
+    proportional share of ``size`` rows, so the sample is self-weighting:
+    pooled plots need no weights and every airline and month is present in
+    its true proportion.
+    """
+
+    def __init__(self, by=SAMPLE_STRATA, error=DEFAULT_ERROR, confidence=DEFAULT_CONFIDENCE,
+                 seed=0):
+        self.by = list(by)
+        self.size = sample_size(error, confidence)
+        self.rng = np.random.default_rng(seed)
+        self.counts = None
+        self.reservoir = None
+
+    def _bottom(self, df):
+        df = df.sort_values('_key')
+        return df[df.groupby(self.by, observed=True).cumcount() < self.size]
+
+    def update(self, df):
+        """Feed one chunk of rows; returns ``self``."""
+        counts = df.groupby(self.by, observed=True).size()
+        self.counts = counts if self.counts is None else self.counts.add(counts, fill_value=0)
+        df = df.assign(_key=self.rng.random(len(df)))
+        df = self._bottom(df)
+        if self.reservoir is not None:
+            df = self._bottom(pd.concat([self.reservoir, df]))
+        self.reservoir = df
+        return self
+
+    def sample(self):
+        """The proportional sample, in the original row order."""
+        if self.reservoir is None:
+            raise ValueError('no rows fed to the reservoir')
+        total = self.counts.sum()
+        quota = np.ceil(self.counts * (self.size / total)).astype(np.int64).rename('_quota')
+        df = self.reservoir.sort_values('_key')
+        rank = df.groupby(self.by, observed=True).cumcount()
+        limit = df[self.by].join(quota, on=self.by)['_quota']
+        return df[rank.to_numpy() < limit.to_numpy()].drop(columns='_key').sort_index()
+
+
+def stratified_sample(flights, by=SAMPLE_STRATA, error=DEFAULT_ERROR,
+                      confidence=DEFAULT_CONFIDENCE, seed=0):
+    """Proportional stratified sample of ``flights`` for the preview plots.
+
+    Frames smaller than the required sample are returned unchanged.
+    """
+    if sample_size(error, confidence) >= len(flights):
+        return flights
+    return StratifiedReservoir(by, error, confidence, seed).update(flights).sample()
+
+
+class Histogram:
+    """Counts of a column over fixed bin edges; histograms of chunks add up."""
+
+    def __init__(self, counts, edges):
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.edges = np.asarray(edges, dtype=np.float64)
+
+    def merge(self, other):
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError('cannot merge histograms with different bins')
+        return Histogram(self.counts + other.counts, self.edges)
+
+    def plot(self, ax=None, **kwargs):
+        """Draw like ``Series.hist``; the cost depends on the bins only."""
+        import matplotlib.pyplot as plt
+
+        ax = plt.gca() if ax is None else ax
+        ax.hist(self.edges[:-1], bins=self.edges, weights=self.counts, **kwargs)
+        ax.grid(True)
+        return ax
+
+
+def histogram(values, bins=30, range=None):
+    """``Histogram`` of ``values`` with ``bins`` equal bins over ``range``.
+
+    Matches ``np.histogram``: NaNs and values outside ``range`` are left
+    out, the last bin includes its right edge. Without ``range`` the data
+    min and max are used.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    if range is None:
+        range = (values.min(), values.max()) if len(values) else (0.0, 1.0)
+    lo, hi = float(range[0]), float(range[1])
+    if hi <= lo:
+        hi = lo + 1.0
+    edges = np.linspace(lo, hi, bins + 1)
+    values = values[(values >= lo) & (values <= hi)]
+    index = ((values - lo) * (bins / (hi - lo))).astype(np.int64)
+    np.minimum(index, bins - 1, out=index)
+    return Histogram(np.bincount(index, minlength=bins), edges)
+
+
+def histograms(flights, columns=None, bins=30):
+    """``{column: Histogram}`` of the numeric columns, as for ``flights.hist``."""
+    if columns is None:
+        columns = flights.select_dtypes('number').columns
+    return {col: histogram(flights[col].to_numpy(), bins) for col in columns}
+
+
+def box_stats(flights, value_col, by='AIRLINE'):
+    """Box plot summaries of ``value_col`` per ``by`` group.
+
+    Returns one dict per group in the format of ``Axes.bxp`` (quartiles,
+    median, whiskers at the most extreme values within 1.5 IQR, as seaborn
+    draws them). Delays are whole minutes, so the fliers are kept as their
+    distinct values: the picture is the same as with every outlier drawn,
+    at a fraction of the markers.
+    """
+    data = flights[[by, value_col]].dropna()
+    groups = data.groupby(by, observed=True)[value_col]
+    q = groups.quantile([0.25, 0.5, 0.75]).unstack()
+    iqr = q[0.75] - q[0.25]
+    fence = pd.DataFrame({'lo': q[0.25] - WHISKER * iqr, 'hi': q[0.75] + WHISKER * iqr})
+    bounds = fence.reindex(data[by]).to_numpy()
+    values = data[value_col].to_numpy()
+    inside = (values >= bounds[:, 0]) & (values <= bounds[:, 1])
+    whiskers = data[inside].groupby(by, observed=True)[value_col].agg(['min', 'max'])
+    outliers = data[~inside].groupby(by, observed=True)[value_col].unique()
+
+    stats = []
+    for key in q.index:
+        fliers = outliers[key] if key in outliers.index else []
+        stats.append({'label': key, 'q1': q.at[key, 0.25], 'med': q.at[key, 0.5],
+                      'q3': q.at[key, 0.75], 'whislo': whiskers.at[key, 'min'],
+                      'whishi': whiskers.at[key, 'max'], 'fliers': np.sort(fliers)})
+    return stats
+
+
+def plot_boxes(stats, ax=None, **kwargs):
+    """Draw ``box_stats`` output as horizontal boxes, like ``sns.boxplot(x=..., y=...)``."""
+    import matplotlib.pyplot as plt
+
+    ax = plt.gca() if ax is None else ax
+    kwargs.setdefault('patch_artist', True)
+    try:
+        ax.bxp(stats, orientation='horizontal', **kwargs)
+    except TypeError:
+        # matplotlib < 3.10
+        ax.bxp(stats, vert=False, **kwargs)
+    ax.invert_yaxis()
+    return ax
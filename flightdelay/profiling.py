@@ -0,0 +1,48 @@
+"""Wall time and memory measurements shared by the trainer and the benchmarks."""
+import os
+import resource
+import threading
+import time
+
+
+def current_rss():
+    """Resident set size of this process in bytes."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        # No procfs: fall back to the lifetime peak, reported in KiB on Linux.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class PeakRSS:
+    """Context manager measuring wall time and the peak RSS inside the block.
+
+    A background thread samples the RSS every ``interval`` seconds, so short
+    spikes between two samples can be missed.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.start_rss = 0
+        self.peak = 0
+        self.seconds = 0.0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def __enter__(self):
+        self.start_rss = self.peak = current_rss()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self._start
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
@@ -0,0 +1,385 @@
+"""Headless rendering of the EDA report.
+
+``flightprediction.py`` only runs inside Jupyter and draws its ~40 figures
+one after another on the main thread. This module rebuilds the report
+without a display: the aggregates behind every figure are computed once in
+the parent process (delay cube, correlation cache, histograms, box
+summaries), each figure is drawn with the Agg backend in a worker process
+from its aggregate only, and PNG/SVG files plus an ``index.html`` are
+written to the output directory. A figure whose input data and drawing code
+did not change since the last run is not drawn again::
+
+    python -m flightdelay.report flights.csv --out report --formats png,svg
+"""
+import argparse
+import hashlib
+import html
+import inspect
+import json
+import os
+import pickle
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+FIGURE_FORMATS = ('png', 'svg')
+DPI = 100
+MANIFEST = 'report.json'
+
+DAY_NAMES = ['pazartesi', 'sali', 'carsamba', 'persembe', 'cuma', 'cumartesi', 'pazar']
+MONTH_NAMES = ['ocak', 'subat', 'mart', 'nisan', 'mayıs', 'haziran', 'temmuz', 'ağustos',
+               'eylül', 'ekim', 'kasim', 'aralik']
+
+# kind is the name of a drawing function in _DRAW; data holds everything it needs.
+FigureSpec = namedtuple('FigureSpec', ['name', 'title', 'kind', 'data', 'figsize'],
+                        defaults=((10, 7),))
+
+
+def _heatmap(fig, data):
+    frame = data['frame']
+    ax = fig.add_subplot(111)
+    values = frame.to_numpy(dtype=np.float64)
+    mesh = ax.pcolormesh(np.ma.masked_invalid(values), cmap=data.get('cmap', 'Blues'),
+                         vmin=data.get('vmin'), vmax=data.get('vmax'),
+                         edgecolors='white', linewidth=data.get('linewidth', 0.5))
+    fig.colorbar(mesh, ax=ax)
+    xlabels = data.get('xticklabels', [str(c) for c in frame.columns])
+    ylabels = data.get('yticklabels', [str(i) for i in frame.index])
+    ax.set_xticks(np.arange(len(xlabels)) + 0.5)
+    ax.set_xticklabels(xlabels, rotation=data.get('xrotation', 90))
+    ax.set_yticks(np.arange(len(ylabels)) + 0.5)
+    ax.set_yticklabels(ylabels, rotation=0)
+    ax.invert_yaxis()
+    if data.get('annot'):
+        for (i, j), value in np.ndenumerate(values):
+            if not np.isnan(value):
+                ax.text(j + 0.5, i + 0.5, data.get('fmt', '{:.2f}').format(value),
+                        ha='center', va='center', fontsize=8)
+    ax.set(xlabel=data.get('xlabel', ''), ylabel=data.get('ylabel', ''))
+
+
+def _bar(fig, data):
+    series = data['series']
+    ax = fig.add_subplot(111)
+    ax.bar([str(i) for i in series.index], series.to_numpy(), color=data.get('color'))
+    ax.tick_params(axis='x', rotation=45)
+    ax.set(xlabel=data.get('xlabel', ''), ylabel=data.get('ylabel', ''))
+
+
+def _grouped_barh(fig, data):
+    # Horizontal bars of frame columns side by side per index value.
+    frame = data['frame']
+    ax = fig.add_subplot(111)
+    height = 0.8 / frame.shape[1]
+    y = np.arange(len(frame))
+    for k, col in enumerate(frame.columns):
+        ax.barh(y + k * height, frame[col].fillna(0).to_numpy(), height,
+                label=data.get('labels', {}).get(col, str(col)))
+    ax.set_yticks(y + 0.4 - height / 2)
+    ax.set_yticklabels([str(i) for i in frame.index])
+    ax.invert_yaxis()
+    ax.set(xlabel=data.get('xlabel', ''), ylabel=data.get('ylabel', ''))
+    ax.legend()
+    ax.grid(True)
+
+
+def _overlay_barh(fig, data):
+    # In[34]: mean departure delay in blue, arrival delay hatched on top.
+    frame = data['frame']
+    ax = fig.add_subplot(111)
+    y = np.arange(len(frame))
+    ax.barh(y, frame.iloc[:, 0].to_numpy(), color='lightskyblue')
+    ax.barh(y, frame.iloc[:, 1].to_numpy(), fill=False, edgecolor='r', hatch='///')
+    ax.set_yticks(y)
+    ax.set_yticklabels([str(i) for i in frame.index])
+    ax.invert_yaxis()
+    ax.set_xlabel(data.get('xlabel', ''), fontsize=14, weight='bold')
+
+
+def _histogram(fig, data):
+    ax = fig.add_subplot(111)
+    data['hist'].plot(ax=ax)
+    if data.get('xscale'):
+        ax.set_xscale(data['xscale'])
+    if data.get('ylim'):
+        ax.set_ylim(*data['ylim'])
+    ax.set(xlabel=data.get('xlabel', ''), ylabel=data.get('ylabel', ''))
+
+
+def _boxes(fig, data):
+    from .preview import plot_boxes
+
+    ax = fig.add_subplot(111)
+    plot_boxes(data['stats'], ax=ax)
+    ax.set(xlabel=data.get('xlabel', ''), ylabel=data.get('ylabel', ''))
+
+
+def _pie(fig, data):
+    import matplotlib.pyplot as plt
+
+    series = data['series']
+    ax = fig.add_subplot(111)
+    explode = [0.01, 0.02, 0.03, 0.04, 0.05, 0.06, 0.07, 0.08, 0.1, 0.15, 0.2, 0.25, 0.3, 0.35]
+    explode = (explode + [0.35] * len(series))[:len(series)]
+    colors = plt.get_cmap('Blues')(np.linspace(0, 1, len(series)))
+    ax.pie(series.to_numpy(), labels=[str(i) for i in series.index], autopct='%0.2f%%',
+           explode=explode, startangle=90, colors=colors, textprops={'fontsize': 12})
+    ax.axis('equal')
+
+
+_DRAW = {'heatmap': _heatmap, 'bar': _bar, 'grouped_barh': _grouped_barh,
+         'overlay_barh': _overlay_barh, 'histogram': _histogram, 'boxes': _boxes, 'pie': _pie}
+
+
+def figure_hash(spec, formats=FIGURE_FORMATS, dpi=DPI):
+    """Digest of everything a figure depends on: data, options and drawing code."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(pickle.dumps((spec.title, spec.kind, spec.figsize, tuple(formats), dpi),
+                          protocol=4))
+    h.update(inspect.getsource(_DRAW[spec.kind]).encode())
+    h.update(pickle.dumps(spec.data, protocol=4))
+    return h.hexdigest()
+
+
+def _render(spec, out_dir, formats, dpi):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    fig = plt.figure(figsize=spec.figsize)
+    try:
+        _DRAW[spec.kind](fig, spec.data)
+        fig.suptitle(spec.title, fontweight='bold')
+        fig.tight_layout()
+        files = []
+        for fmt in formats:
+            name = '{}.{}'.format(spec.name, fmt)
+            fig.savefig(os.path.join(out_dir, name), dpi=dpi, format=fmt)
+            files.append(name)
+    finally:
+        plt.close(fig)
+    return spec.name, files
+
+
+def write_index(specs, files, out_dir, title='Uçuş Gecikmeleri EDA Raporu'):
+    """Write ``index.html`` listing every figure, first format inline."""
+    parts = ['<!DOCTYPE html>', '<html><head><meta charset="utf-8">',
+             '<title>{}</title></head><body>'.format(html.escape(title)),
+             '<h1>{}</h1>'.format(html.escape(title))]
+    for spec in specs:
+        names = files.get(spec.name, [])
+        if not names:
+            continue
+        parts.append('<h2 id="{0}">{1}</h2>'.format(html.escape(spec.name),
+                                                    html.escape(spec.title)))
+        parts.append('<img src="{}" alt="{}" style="max-width:100%">'.format(
+            html.escape(names[0]), html.escape(spec.title)))
+        parts.append('<p>{}</p>'.format(' '.join(
+            '<a href="{0}">{1}</a>'.format(html.escape(n), n.rsplit('.', 1)[1]) for n in names)))
+    parts.append('</body></html>')
+    with open(os.path.join(out_dir, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write('\n'.join(parts))
+
+
+def render_report(specs, out_dir, formats=FIGURE_FORMATS, n_jobs=-1, dpi=DPI):
+    """Draw ``specs`` into ``out_dir`` in worker processes and write the index.
+
+    Figures whose hash matches the previous run and whose files still exist
+    are reused. Returns ``{'rendered': [...], 'reused': [...]}``.
+    """
+    import joblib
+
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    previous = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            previous = json.load(f)
+
+    hashes = {spec.name: figure_hash(spec, formats, dpi) for spec in specs}
+    files = {}
+    todo = []
+    for spec in specs:
+        old = previous.get(spec.name, {})
+        if (old.get('hash') == hashes[spec.name]
+                and all(os.path.exists(os.path.join(out_dir, n)) for n in old.get('files', []))):
+            files[spec.name] = old['files']
+        else:
+            todo.append(spec)
+
+    if todo:
+        done = joblib.Parallel(n_jobs=min(n_jobs, len(todo)) if n_jobs > 0 else n_jobs,
+                               backend='loky')(
+            joblib.delayed(_render)(spec, out_dir, formats, dpi) for spec in todo)
+        files.update(dict(done))
+
+    manifest = {spec.name: {'hash': hashes[spec.name], 'title': spec.title,
+                            'files': files[spec.name]} for spec in specs}
+    with open(manifest_path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    write_index(specs, files, out_dir)
+    rendered = {spec.name for spec in todo}
+    return {'rendered': [s.name for s in specs if s.name in rendered],
+            'reused': [s.name for s in specs if s.name not in rendered]}
+
+
+def _delay_type_frame(cube, attribute, delay_col):
+    from .features import DELAY_TYPE_COLUMNS
+
+    hue = DELAY_TYPE_COLUMNS[delay_col]
+    return cube.rollup([attribute, hue], delay_col, ('count',))['count'].unstack(hue)
+
+
+def eda_figures(flights, cube=None, correlations=None, airline_names=None):
+    """``FigureSpec`` of every EDA figure of the notebook, from cleaned flights.
+
+    The delay type columns are added to ``flights`` if missing. The cube and
+    correlation cache are built unless given.
+    """
+    from .corr import CorrelationCache
+    from .cube import DelayCube
+    from .eda import airport_airline_matrix
+    from .features import delay_type_column, delay_type_labels
+    from .preview import box_stats, histogram
+
+    for col in ('DEPARTURE_DELAY', 'ARRIVAL_DELAY'):
+        delay_type_column(flights, col)
+    cube = DelayCube.build(flights) if cube is None else cube
+    correlations = CorrelationCache.from_frame(flights) if correlations is None else correlations
+    names = airline_names or {}
+    legend = dict(enumerate(delay_type_labels()))
+
+    specs = [
+        FigureSpec('flights_month_dow', 'Her ay için haftanın günü başına uçuş sayısı', 'heatmap',
+                   {'frame': cube.pivot('MONTH', 'DAY_OF_WEEK'), 'xticklabels': DAY_NAMES,
+                    'yticklabels': MONTH_NAMES, 'xlabel': 'Haftanın günleri', 'ylabel': 'Aylar',
+                    'xrotation': 0}, (10, 8)),
+        FigureSpec('flights_month_day', 'Her ay için ayın gününe göre uçuş sayısı', 'heatmap',
+                   {'frame': cube.pivot('MONTH', 'DAY'), 'yticklabels': MONTH_NAMES,
+                    'xlabel': 'Ayın günleri', 'ylabel': 'Ay', 'xrotation': 0}, (18, 6)),
+    ]
+    for col, title in (('DEPARTURE_DELAY', 'Kalkıştaki Gecikme'),
+                       ('ARRIVAL_DELAY', 'Varıştaki Gecikme')):
+        specs.append(FigureSpec(
+            '{}_hist'.format(col.lower()), title, 'histogram',
+            {'hist': histogram(flights[col], bins=1000, range=(16, 1000)), 'xscale': 'log',
+             'ylim': (0, 50000), 'xlabel': 'Gecikme (dakika)', 'ylabel': 'Uçuş sayısı'}))
+
+    means = pd.DataFrame({col: cube.rollup('AIRLINE', col, ('mean',))['mean']
+                          for col in ('DEPARTURE_DELAY', 'ARRIVAL_DELAY')})
+    means.index = [names.get(str(i), str(i)) for i in means.index]
+    specs.append(FigureSpec('mean_delay_airline', 'Havayollarına göre ortalama gecikme',
+                            'overlay_barh',
+                            {'frame': means, 'xlabel': 'Ortalama gecikme [dakika] '
+                                                       '(kalkış: mavi, varış: çizgili)'}, (11, 6)))
+    for col in ('DEPARTURE_DELAY', 'ARRIVAL_DELAY'):
+        specs.append(FigureSpec(
+            'corr_{}'.format(col.lower()), '"{}" ile ilişkili değişkenler'.format(col), 'heatmap',
+            {'frame': correlations.target(col), 'cmap': 'BrBG', 'vmin': -1, 'vmax': 1,
+             'annot': True, 'xrotation': 0}, (8, 12)))
+
+    count_titles = {'MONTH': 'Aylara Göre Uçuşların Dağılımı',
+                    'DAY': 'Ayın Günlerine Göre Uçuşların Dağılımı',
+                    'DAY_OF_WEEK': 'Haftanın Günlerine Göre Uçuşların Dağılımı',
+                    'AIRLINE': 'Havayolu Şirketlerine Göre Uçuş Sayılarının Dağılımı'}
+    for attribute, title in count_titles.items():
+        specs.append(FigureSpec('counts_{}'.format(attribute.lower()), title, 'bar',
+                                {'series': cube.counts(attribute).sort_index()}, (14, 6)))
+        for col, word in (('DEPARTURE_DELAY', 'kalkış'), ('ARRIVAL_DELAY', 'varış')):
+            specs.append(FigureSpec(
+                'delay_types_{}_{}'.format(attribute.lower(), col.lower()),
+                '{} lara göre {} gecikmelerinin dağılımı'.format(attribute, word), 'grouped_barh',
+                {'frame': _delay_type_frame(cube, attribute, col), 'labels': legend,
+                 'xlabel': 'Uçuş Sayısı', 'ylabel': attribute}))
+    specs.append(FigureSpec('corr_month', 'Gecikmeler ve ay', 'heatmap',
+                            {'frame': correlations.corr(['ARRIVAL_DELAY', 'DEPARTURE_DELAY',
+                                                         'MONTH']),
+                             'annot': True, 'fmt': '{:.3f}', 'xrotation': 0}, (6, 5)))
+    specs.append(FigureSpec('corr_day', 'Gecikmeler ve günler', 'heatmap',
+                            {'frame': correlations.corr(['ARRIVAL_DELAY', 'DEPARTURE_DELAY',
+                                                         'DAY', 'DAY_OF_WEEK']),
+                             'annot': True, 'fmt': '{:.3f}', 'xrotation': 0}, (7, 6)))
+
+    for airport_col, col, title in (
+            ('ORIGIN_AIRPORT', 'DEPARTURE_DELAY',
+             'Kalkış gecikmesi en fazla olan ilk 10 Havalimanı'),
+            ('DESTINATION_AIRPORT', 'ARRIVAL_DELAY',
+             'Varış gecikmesi en fazla olan ilk 10 Havalimanı')):
+        top = cube.rollup(airport_col, col, ('count',))['count'].sort_values(ascending=False)[:10]
+        specs.append(FigureSpec('top10_{}'.format(airport_col.lower()), title, 'bar',
+                                {'series': top, 'xlabel': 'Havaalanı', 'ylabel': 'Sayı'}))
+
+    specs.append(FigureSpec('airline_marketshare',
+                            'Havayolu Şirketlerinin 2015 Yılı Pazar Pay Dağılımları', 'pie',
+                            {'series': cube.counts('AIRLINE')}, (10, 10)))
+    for col in ('DEPARTURE_DELAY', 'ARRIVAL_DELAY'):
+        specs.append(FigureSpec('box_{}'.format(col.lower()), '{} / AIRLINE'.format(col), 'boxes',
+                                {'stats': box_stats(flights, col, 'AIRLINE'), 'xlabel': col,
+                                 'ylabel': 'AIRLINE'}, (10, 5)))
+
+    matrix = airport_airline_matrix(flights, 'mean')
+    matrix.columns = [names.get(str(c), str(c)) for c in matrix.columns]
+    specs.append(FigureSpec('airport_airline_mean_delay',
+                            'Gecikmeler: çıkış havalimanı ve firmaların etkisi', 'heatmap',
+                            {'frame': matrix, 'cmap': 'Accent', 'vmin': 15, 'vmax': 120,
+                             'linewidth': 0.01, 'xrotation': 85},
+                            (10, max(8, len(matrix) // 10))))
+    specs.append(FigureSpec('corr_all', 'Correlation Heatmap', 'heatmap',
+                            {'frame': correlations.corr(), 'annot': True}, (20, 10)))
+    return specs
+
+
+def model_figures(runs, target='ARRIVAL_DELAY'):
+    """Box-whisker comparison of the test predictions of ``runs`` (In[95])."""
+    from .preview import box_stats
+
+    sizes = [len(r.y_pred) for r in runs.values()]
+    predictions = pd.DataFrame({'model': np.repeat(list(runs), sizes),
+                                'y_pred': np.concatenate([np.asarray(r.y_pred, dtype=np.float64)
+                                                          for r in runs.values()])})
+    predictions['model'] = pd.Categorical(predictions['model'], categories=list(runs))
+    return [FigureSpec('models_{}'.format(target.lower()), 'ML Karşılaştırma Grafiği', 'boxes',
+                       {'stats': box_stats(predictions, 'y_pred', 'model')}, (10, 15))]
+
+
+def _fit_models(flights, names, target='ARRIVAL_DELAY'):
+    from .models import ModelRegistry, fit_zoo_parallel, make_models, model_data
+
+    data = model_data(flights, target)
+    return fit_zoo_parallel(make_models(names), data.X_train, data.y_train, data.X_test, target,
+                            ModelRegistry(), data.features)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('flights', nargs='?', default='flights.csv')
+    parser.add_argument('--airlines', default=None, help='airlines.csv for full carrier names')
+    parser.add_argument('--out', default='report')
+    parser.add_argument('--formats', default=','.join(FIGURE_FORMATS))
+    parser.add_argument('--jobs', type=int, default=-1)
+    parser.add_argument('--dpi', type=int, default=DPI)
+    parser.add_argument('--models', default='',
+                        help='comma separated model names to add the model comparison')
+    args = parser.parse_args(argv)
+
+    from .clean import clean_flights
+    from .io import load_airlines, load_flights
+
+    flights = clean_flights(load_flights(args.flights))
+    names = None
+    if args.airlines:
+        names = load_airlines(args.airlines).set_index('IATA_CODE')['AIRLINE'].to_dict()
+    specs = eda_figures(flights, airline_names=names)
+    models = [m.strip() for m in args.models.split(',') if m.strip()]
+    if models:
+        specs += model_figures(_fit_models(flights, models))
+    formats = [f.strip() for f in args.formats.split(',') if f.strip()]
+    result = render_report(specs, args.out, formats, args.jobs, args.dpi)
+    print('{} figures rendered, {} reused -> {}'.format(
+        len(result['rendered']), len(result['reused']), os.path.join(args.out, 'index.html')))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""Batch scoring of whole schedules with a saved ``ModelBundle``.
+
+The notebook only ever predicted the 30% hold-out of ``train_test_split``.
+``score_schedule`` streams a schedule (CSV/Parquet file, list of files or a
+directory, tens of millions of legs) in chunks, and a pool of worker
+processes encodes, scales and scores each chunk and writes it as one
+Parquet part file::
+
+    python -m flightdelay score ridge.joblib schedule/ predictions/ --jobs 8
+
+Each worker loads the bundle once. Linear models and their bagged
+ensembles have the scaler folded into one weight vector (see
+``inference``), so a chunk is scored in one pass over its raw columns
+without building a feature matrix.
+"""
+import argparse
+import glob
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from .models import ModelBundle
+
+CHUNKSIZE = 1_000_000
+# Columns copied next to the prediction so the rows can be joined back.
+KEY_COLUMNS = ('MONTH', 'DAY', 'AIRLINE', 'ORIGIN_AIRPORT', 'DESTINATION_AIRPORT',
+               'SCHEDULED_DEPARTURE')
+
+_BUNDLES = {}
+
+
+def _load_bundle(path):
+    # Once per worker process.
+    if path not in _BUNDLES:
+        _BUNDLES[path] = ModelBundle.load(path)
+    return _BUNDLES[path]
+
+
+def predict_chunk(bundle, chunk):
+    """Predictions for the rows of ``chunk``; NaN where a feature is missing."""
+    columns = bundle.columns(chunk)
+    predict_columns = getattr(bundle.scorer, 'predict_columns', None)
+    if predict_columns is not None:
+        # Folded linear model: one pass over the raw columns, NaN propagates.
+        return predict_columns(columns)
+    X = np.column_stack(columns).astype(np.float64, copy=False)
+    valid = ~np.isnan(X).any(axis=1)
+    if valid.all():
+        return bundle.predict_encoded(X)
+    y = np.full(len(X), np.nan)
+    if valid.any():
+        y[valid] = bundle.predict_encoded(X[valid])
+    return y
+
+
+def _score_part(bundle_path, chunk, out_path, keep):
+    bundle = _load_bundle(bundle_path)
+    start = time.perf_counter()
+    y = predict_chunk(bundle, chunk)
+    # Categorical keys stay dictionary encoded in the Parquet file.
+    out = chunk[[c for c in keep if c in chunk]].copy()
+    out['PREDICTED_' + bundle.target] = y.astype(np.float32)
+    out.to_parquet(out_path + '.tmp', index=False)
+    os.replace(out_path + '.tmp', out_path)
+    return len(out), time.perf_counter() - start
+
+
+def score_schedule(bundle_path, source, out_dir, chunksize=CHUNKSIZE, n_jobs=-1,
+                   keep=KEY_COLUMNS):
+    """Score every row of ``source`` into ``out_dir/part-*.parquet``.
+
+    Chunks are read in the parent and handed to worker processes as they
+    are read, so at most a few chunks are in memory at once. Returns the
+    row count, the wall time and the throughput in rows per second.
+    """
+    import joblib
+
+    from .clean import iter_chunks
+
+    bundle = ModelBundle.load(bundle_path)
+    columns = list(dict.fromkeys(list(keep) + bundle.input_columns))
+    os.makedirs(out_dir, exist_ok=True)
+    for old in glob.glob(os.path.join(out_dir, 'part-*.parquet')):
+        os.remove(old)
+
+    start = time.perf_counter()
+    tasks = (joblib.delayed(_score_part)(
+        bundle_path, chunk, os.path.join(out_dir, 'part-{:05d}.parquet'.format(i)), keep)
+        for i, chunk in enumerate(iter_chunks(source, columns, chunksize)))
+    parts = joblib.Parallel(n_jobs=n_jobs, backend='loky', pre_dispatch='n_jobs')(tasks)
+    seconds = time.perf_counter() - start
+    rows = sum(n for n, _ in parts)
+    return {'rows': rows, 'parts': len(parts), 'seconds': seconds,
+            'rows_per_second': rows / seconds if seconds else None,
+            'scoring_seconds': sum(s for _, s in parts)}
+
+
+def read_predictions(out_dir, columns=None):
+    parts = sorted(glob.glob(os.path.join(out_dir, 'part-*.parquet')))
+    return pd.concat([pd.read_parquet(p, columns=columns) for p in parts], ignore_index=True)
+
+
+def main(argv=None):
+    from .bench import parse_size
+
+    parser = argparse.ArgumentParser(description='Score a schedule with a model bundle.')
+    parser.add_argument('bundle')
+    parser.add_argument('source', help='CSV/Parquet file or a directory of them')
+    parser.add_argument('out_dir')
+    parser.add_argument('--chunksize', default='1M')
+    parser.add_argument('--jobs', type=int, default=-1)
+    args = parser.parse_args(argv)
+
+    result = score_schedule(args.bundle, args.source, args.out_dir, parse_size(args.chunksize),
+                            args.jobs)
+    print('{rows} rows in {parts} parts, {seconds:.2f} s, {rows_per_second:,.0f} rows/s'.format(
+        **result))
+
+
+if __name__ == '__main__':
+    main()
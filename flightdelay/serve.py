@@ -0,0 +1,250 @@
+"""Local HTTP service scoring flights with a saved ``ModelBundle``.
+
+The regressors of In[92] only existed inside the notebook session. This
+module serves one of them over HTTP with asyncio and the standard library
+only::
+
+    python -m flightdelay train flights.csv --models Ridge --bundle ridge.joblib
+    python -m flightdelay serve ridge.joblib --port 8765
+
+``POST /predict`` takes one flight (a JSON object) and answers
+``{"prediction": x}``, or a list of flights and answers
+``{"predictions": [...]}``; a flight with a missing, null or non-finite
+feature answers 400. Concurrent requests are coalesced: the
+first waiting request opens a micro-batch that collects further requests
+for at most ``max_delay`` seconds or ``max_batch`` rows, and the whole batch
+is scored with one vectorized call. ``GET /stats`` reports the request and
+scoring latency percentiles.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+
+from .models import ModelBundle
+from .stats import TDigest
+
+MAX_BATCH = 512
+MAX_DELAY = 0.0005
+LATENCY_QUANTILES = (0.5, 0.99)
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            500: 'Internal Server Error'}
+
+
+class LatencyTracker:
+    """Running latency percentiles; samples are buffered and folded into a t-digest."""
+
+    def __init__(self, flush_every=1024):
+        self.digest = TDigest()
+        self.buffer = []
+        self.flush_every = flush_every
+
+    def add(self, seconds):
+        self.buffer.append(seconds)
+        if len(self.buffer) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.digest.update(np.array(self.buffer))
+            self.buffer = []
+
+    def summary(self, quantiles=LATENCY_QUANTILES):
+        self.flush()
+        out = {'count': int(self.digest.count)}
+        if self.digest.count:
+            for q, value in zip(quantiles, self.digest.quantile(quantiles)):
+                out['p{:g}_ms'.format(q * 100)] = round(float(value) * 1000, 4)
+        return out
+
+
+class PredictionService:
+    """Micro-batching front end of a ``ModelBundle``."""
+
+    def __init__(self, bundle, max_batch=MAX_BATCH, max_delay=MAX_DELAY):
+        self.bundle = bundle
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.queue = None
+        self.active = 0
+        self.batches = 0
+        self.rows = 0
+        self.request_latency = LatencyTracker()
+        self.scoring_latency = LatencyTracker()
+        self._worker = None
+
+    def start(self):
+        self.queue = asyncio.Queue()
+        self._worker = asyncio.get_running_loop().create_task(self._batcher())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+
+    async def predict(self, records):
+        """Score a list of flight dicts; waits for the micro-batch it joins.
+
+        Raises ValueError for a missing, null or non-finite feature.
+        """
+        if not records:
+            return []
+        try:
+            X = self.bundle.encode(records)
+        except KeyError as exc:
+            raise ValueError('missing feature {}'.format(exc.args[0])) from None
+        finite = np.isfinite(X).all(axis=0)
+        if not finite.all():
+            bad = [col for col, ok in zip(self.bundle.features, finite) if not ok]
+            raise ValueError('missing or non-finite values in {}'.format(', '.join(bad)))
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((X, future))
+        return await future
+
+    async def _batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self.queue.get()]
+            n = len(items[0][0])
+            deadline = loop.time() + self.max_delay
+            while n < self.max_batch:
+                try:
+                    item = self.queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    # Once every open request is in the batch nobody else can
+                    # join it; score at once instead of waiting out the delay.
+                    if timeout <= 0 or self.active <= len(items):
+                        break
+                    try:
+                        item = await asyncio.wait_for(self.queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                items.append(item)
+                n += len(item[0])
+            self._score(items)
+
+    def _score(self, items):
+        start = time.perf_counter()
+        try:
+            X = items[0][0] if len(items) == 1 else np.vstack([X for X, _ in items])
+            y = self.bundle.predict_encoded(X)
+        except Exception as exc:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        self.scoring_latency.add(time.perf_counter() - start)
+        self.batches += 1
+        self.rows += len(y)
+        offset = 0
+        for X, future in items:
+            if not future.done():
+                future.set_result(y[offset:offset + len(X)].tolist())
+            offset += len(X)
+
+    def stats(self):
+        return {'model': self.bundle.name, 'target': self.bundle.target,
+                'batches': self.batches, 'rows': self.rows,
+                'mean_batch_rows': round(self.rows / self.batches, 2) if self.batches else None,
+                'request_latency': self.request_latency.summary(),
+                'scoring_latency': self.scoring_latency.summary()}
+
+    async def handle(self, method, path, body):
+        """Return ``(status, payload)`` for one HTTP request."""
+        if path == '/predict':
+            if method != 'POST':
+                return 405, {'error': 'use POST'}
+            start = time.perf_counter()
+            self.active += 1
+            try:
+                payload = json.loads(body)
+                single = isinstance(payload, dict)
+                y = await self.predict([payload] if single else payload)
+            except (ValueError, KeyError, TypeError) as exc:
+                return 400, {'error': exc.args[0] if exc.args else repr(exc)}
+            finally:
+                self.active -= 1
+            self.request_latency.add(time.perf_counter() - start)
+            return 200, {'prediction': y[0]} if single else {'predictions': y}
+        if path == '/stats':
+            return 200, self.stats()
+        if path == '/health':
+            return 200, {'status': 'ok'}
+        return 404, {'error': 'unknown path {}'.format(path)}
+
+    async def connection(self, reader, writer):
+        """Serve HTTP/1.1 requests of one keep-alive connection."""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line.strip():
+                    break
+                method, path = line.decode('latin-1').split()[:2]
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b'\r\n', b'\n', b''):
+                        break
+                    key, _, value = header.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                try:
+                    status, payload = await self.handle(method, path.split('?')[0], body)
+                except Exception as exc:
+                    status, payload = 500, {'error': repr(exc)}
+                data = json.dumps(payload).encode()
+                writer.write('HTTP/1.1 {} {}\r\nContent-Type: application/json\r\n'
+                             'Content-Length: {}\r\n\r\n'.format(status, _REASONS[status],
+                                                                 len(data)).encode() + data)
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(bundle, host='127.0.0.1', port=8765, max_batch=MAX_BATCH, max_delay=MAX_DELAY,
+                ready=None):
+    """Run the service until cancelled; ``ready`` is an optional ``asyncio.Event``."""
+    service = PredictionService(bundle, max_batch, max_delay)
+    service.start()
+    server = await asyncio.start_server(service.connection, host, port)
+    if ready is not None:
+        ready.set()
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve a model bundle over HTTP.')
+    parser.add_argument('bundle', help='ModelBundle saved by `flightdelay train --bundle`')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH)
+    parser.add_argument('--max-delay-ms', type=float, default=MAX_DELAY * 1000)
+    args = parser.parse_args(argv)
+
+    bundle = ModelBundle.load(args.bundle)
+    print('serving {} ({}) on http://{}:{}'.format(bundle.name, bundle.target, args.host,
+                                                   args.port))
+    try:
+        asyncio.run(serve(bundle, args.host, args.port, args.max_batch,
+                          args.max_delay_ms / 1000))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
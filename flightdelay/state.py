@@ -0,0 +1,156 @@
+"""Persistent, incrementally updated EDA statistics.
+
+New BTS months arrive every few weeks. Re-running the whole analysis over
+all months for every refresh costs time proportional to the full history.
+``EDAState`` keeps mergeable aggregates on disk instead: one delay cube part
+per ingested month, per-airline moments with t-digests, and the correlation
+sums. Ingesting a month touches only that month's rows, and every statistic
+of the report (per-airline stats, airport counts, top-10 delayed airports,
+market shares, correlations) is answered from the stored aggregates.
+"""
+import argparse
+import json
+import os
+
+import pandas as pd
+
+from .corr import CorrelationCache
+from .cube import DelayCube
+from .stats import GroupedStats, TDigest
+
+
+def _stats_to_dict(stats):
+    return {'compression': stats.compression,
+            'moments': {str(k): v for k, v in stats.moments.to_dict(orient='index').items()},
+            'digests': {str(k): d.to_dict() for k, d in stats.digests.items()}}
+
+
+def _stats_from_dict(state):
+    moments = pd.DataFrame.from_dict(state['moments'], orient='index')
+    digests = {k: TDigest.from_dict(d) for k, d in state['digests'].items()}
+    return GroupedStats(moments, digests, state['compression'])
+
+
+class EDAState:
+    """Directory of mergeable EDA aggregates.
+
+    Layout of ``path``::
+
+        manifest.json       ingested batches and their row counts
+        cube/<batch>/       delay cube cells and airport margins of each batch
+        airline_stats.json  per-airline DEPARTURE_DELAY moments and digests
+        corr.npz            correlation sufficient statistics
+
+    Batches should be cleaned flights (``clean_flights``), e.g. one month.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.manifest = {'batches': {}}
+        self.airline_stats = None
+        self.correlations = None
+        self._cube = None
+        if os.path.exists(self._file('manifest.json')):
+            with open(self._file('manifest.json')) as f:
+                self.manifest = json.load(f)
+            if os.path.exists(self._file('airline_stats.json')):
+                with open(self._file('airline_stats.json')) as f:
+                    self.airline_stats = _stats_from_dict(json.load(f))
+            if os.path.exists(self._file('corr.npz')):
+                self.correlations = CorrelationCache.load(self._file('corr.npz'))
+
+    def _file(self, *parts):
+        return os.path.join(self.path, *parts)
+
+    @property
+    def batches(self):
+        return list(self.manifest['batches'])
+
+    def ingest(self, flights, batch_id):
+        """Fold one batch of cleaned flights into the stored aggregates.
+
+        ``batch_id`` (e.g. ``'2015-07'``) names the batch; ingesting the same
+        id twice raises ``ValueError`` instead of double counting it.
+        """
+        batch_id = str(batch_id)
+        if batch_id in self.manifest['batches']:
+            raise ValueError('batch {!r} is already ingested'.format(batch_id))
+        os.makedirs(self._file('cube'), exist_ok=True)
+
+        # Cells of different batches may share keys (same month of another
+        # year); the cube rollups combine duplicate cells, so each batch is
+        # simply stored as its own part.
+        DelayCube.build(flights).save(self._file('cube', batch_id))
+        self._cube = None
+
+        stats = GroupedStats.from_frame(flights, 'DEPARTURE_DELAY', 'AIRLINE')
+        stats.moments.index = stats.moments.index.astype(str)
+        stats.digests = {str(k): d for k, d in stats.digests.items()}
+        self.airline_stats = (stats if self.airline_stats is None
+                              else self.airline_stats.merge(stats))
+
+        if self.correlations is None:
+            self.correlations = CorrelationCache.from_frame(flights)
+        else:
+            self.correlations.update(flights)
+
+        self.manifest['batches'][batch_id] = {'rows': int(len(flights))}
+        self._save()
+
+    def _save(self):
+        with open(self._file('airline_stats.json.tmp'), 'w') as f:
+            json.dump(_stats_to_dict(self.airline_stats), f)
+        os.replace(self._file('airline_stats.json.tmp'), self._file('airline_stats.json'))
+        self.correlations.save(self._file('corr.npz'))
+        # The manifest goes last: a batch only counts once all of it is on disk.
+        with open(self._file('manifest.json.tmp'), 'w') as f:
+            json.dump(self.manifest, f, indent=1)
+        os.replace(self._file('manifest.json.tmp'), self._file('manifest.json'))
+
+    @property
+    def cube(self):
+        """``DelayCube`` over all ingested batches."""
+        if self._cube is None:
+            parts = [self._file('cube', b) for b in self.batches]
+            parts = [p for p in parts if os.path.exists(p)]
+            if not parts:
+                raise ValueError('no batches ingested in {}'.format(self.path))
+            self._cube = DelayCube.concat([DelayCube.load(p) for p in parts])
+        return self._cube
+
+    def airline_summary(self):
+        """min/max/count/mean/std and p50/p90/p99 of DEPARTURE_DELAY per airline."""
+        return self.airline_stats.result().sort_values('count')
+
+    def airport_counts(self, column='ORIGIN_AIRPORT'):
+        """Delayed flights per airport, most first."""
+        return self.cube.counts(column)
+
+    def top_airports(self, column='ORIGIN_AIRPORT', n=10):
+        """The ``n`` airports with most delayed flights (In[54] / In[58])."""
+        return self.airport_counts(column).head(n)
+
+    def market_share(self):
+        """Share of flights per airline in percent (``airline_marketshare``)."""
+        counts = self.cube.counts('AIRLINE')
+        return (counts * 100 / counts.sum()).rename('Pazar Payi %')
+
+
+def main(argv=None):
+    from .clean import clean_flights
+    from .io import load_flights
+
+    parser = argparse.ArgumentParser(description='Fold a batch of flights into an EDA state.')
+    parser.add_argument('state', help='state directory')
+    parser.add_argument('flights', help='raw flights CSV of the batch')
+    parser.add_argument('--batch', required=True, help='batch id, e.g. 2015-07')
+    args = parser.parse_args(argv)
+
+    state = EDAState(args.state)
+    state.ingest(clean_flights(load_flights(args.flights, cache=False)), args.batch)
+    print('{} batches in {}'.format(len(state.batches), args.state))
+    print(state.airline_summary().to_string())
+
+
+if __name__ == '__main__':
+    main()
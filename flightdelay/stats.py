@@ -0,0 +1,208 @@
+"""Grouped delay statistics with mergeable quantile sketches.
+
+``get_stats`` (In[64]) built a Python dict per group through
+``groupby(...).apply(get_stats).unstack()``. ``grouped_stats`` computes the
+same min/max/count/mean (plus std) with pandas' native aggregation kernels,
+and p50/p90/p99 from t-digests. A digest summarises a column in about a
+hundred centroids and two digests can be merged, so percentiles of a data
+set can be assembled from chunks or worker processes without keeping the
+raw values around.
+"""
+import numpy as np
+import pandas as pd
+
+DEFAULT_STATS = ('min', 'max', 'count', 'mean', 'std')
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99)
+DEFAULT_COMPRESSION = 200
+
+
+def _scale(q, compression):
+    # k1 scale function of the t-digest paper: centroids are small near the
+    # tails, which is where p99 is read from.
+    return compression / (2 * np.pi) * np.arcsin(2 * q - 1)
+
+
+def _compress(means, weights, compression, codes=None):
+    """Merge sorted centroids so that each spans at most one unit of k.
+
+    ``means`` must be sorted, within each group of ``codes`` if given.
+    Returns the merged ``(means, weights, codes)``.
+    """
+    if codes is None:
+        codes = np.zeros(len(means), dtype=np.int64)
+    if len(means) == 0:
+        return means, weights, codes
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    sizes = np.diff(np.r_[starts, len(means)])
+    cum = np.cumsum(weights)
+    # Quantile of each centroid's midpoint within its own group.
+    offset = np.repeat(cum[starts] - weights[starts], sizes)
+    total = np.repeat(np.add.reduceat(weights, starts), sizes)
+    q = (cum - offset - weights / 2) / total
+    bucket = np.floor(_scale(q, compression) - _scale(0.0, compression)).astype(np.int64)
+    edges = np.flatnonzero(np.r_[True, (bucket[1:] != bucket[:-1]) | (codes[1:] != codes[:-1])])
+    new_weights = np.add.reduceat(weights, edges)
+    new_means = np.add.reduceat(means * weights, edges) / new_weights
+    return new_means, new_weights, codes[edges]
+
+
+class TDigest:
+    """Mergeable sketch of a distribution for approximate quantiles."""
+
+    def __init__(self, compression=DEFAULT_COMPRESSION, means=None, weights=None,
+                 min=np.inf, max=-np.inf):
+        self.compression = compression
+        self.means = np.empty(0) if means is None else np.asarray(means, dtype=np.float64)
+        self.weights = np.empty(0) if weights is None else np.asarray(weights, dtype=np.float64)
+        self.min = float(min)
+        self.max = float(max)
+
+    @classmethod
+    def from_values(cls, values, compression=DEFAULT_COMPRESSION):
+        digest = cls(compression)
+        digest.update(values)
+        return digest
+
+    @property
+    def count(self):
+        return float(self.weights.sum())
+
+    def _absorb(self, means, weights, lo, hi):
+        means = np.r_[self.means, means]
+        weights = np.r_[self.weights, weights]
+        order = np.argsort(means, kind='stable')
+        self.means, self.weights, _ = _compress(means[order], weights[order], self.compression)
+        self.min = min(self.min, lo)
+        self.max = max(self.max, hi)
+
+    def update(self, values):
+        """Add raw values (NaN are ignored)."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if len(values):
+            self._absorb(values, np.ones(len(values)), values.min(), values.max())
+        return self
+
+    def merge(self, other):
+        """Return a digest of the union of both underlying samples."""
+        merged = TDigest(max(self.compression, other.compression), self.means, self.weights,
+                         self.min, self.max)
+        if other.count:
+            merged._absorb(other.means, other.weights, other.min, other.max)
+        return merged
+
+    def quantile(self, q):
+        """Approximate quantile(s) ``q`` in [0, 1]; NaN for an empty digest."""
+        q = np.asarray(q, dtype=np.float64)
+        if not len(self.means):
+            return np.full(q.shape, np.nan)[()]
+        cum = np.cumsum(self.weights)
+        total = cum[-1]
+        mids = cum - self.weights / 2
+        xp = np.r_[0.0, mids, total]
+        fp = np.r_[self.min, self.means, self.max]
+        return np.interp(q * total, xp, fp)[()]
+
+    def to_dict(self):
+        return {'compression': self.compression, 'means': self.means.tolist(),
+                'weights': self.weights.tolist(), 'min': self.min, 'max': self.max}
+
+    @classmethod
+    def from_dict(cls, state):
+        return cls(state['compression'], state['means'], state['weights'],
+                   state['min'], state['max'])
+
+
+def grouped_digests(values, keys, compression=DEFAULT_COMPRESSION):
+    """Build one ``TDigest`` per distinct key with a single sort.
+
+    Returns a dict ``{key: TDigest}``. Rows with a missing value are ignored.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    codes, uniques = pd.factorize(keys, sort=True)
+    keep = ~np.isnan(values) & (codes >= 0)
+    values, codes = values[keep], codes[keep].astype(np.int64)
+    order = np.lexsort((values, codes))
+    values, codes = values[order], codes[order]
+    means, weights, mcodes = _compress(values, np.ones(len(values)), compression, codes)
+
+    digests = {}
+    bounds = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1], True]) if len(codes) else []
+    mbounds = np.flatnonzero(np.r_[True, mcodes[1:] != mcodes[:-1], True]) if len(mcodes) else []
+    for i in range(len(bounds) - 1):
+        lo, hi = bounds[i], bounds[i + 1]
+        mlo, mhi = mbounds[i], mbounds[i + 1]
+        digests[uniques[codes[lo]]] = TDigest(compression, means[mlo:mhi], weights[mlo:mhi],
+                                              values[lo], values[hi - 1])
+    return digests
+
+
+def _quantile_name(q):
+    return 'p{:g}'.format(q * 100)
+
+
+class GroupedStats:
+    """Per-group count/sum/sum of squares/min/max plus a t-digest per group.
+
+    Partial results of separate chunks are combined with ``merge``; ``result``
+    turns the accumulated state into the final table.
+    """
+
+    def __init__(self, moments, digests, compression=DEFAULT_COMPRESSION):
+        self.moments = moments
+        self.digests = digests
+        self.compression = compression
+
+    @classmethod
+    def from_frame(cls, df, value_col, by, compression=DEFAULT_COMPRESSION, quantiles=True):
+        """Accumulate ``df[value_col]`` grouped by the single column ``by``."""
+        values = df[value_col].astype(np.float64)
+        data = pd.DataFrame({'v': values, 'sq': values * values})
+        keys = df[by]
+        moments = data.groupby(keys, observed=True).agg(
+            count=('v', 'count'), sum=('v', 'sum'), sumsq=('sq', 'sum'),
+            min=('v', 'min'), max=('v', 'max'))
+        digests = grouped_digests(values.to_numpy(), keys, compression) if quantiles else {}
+        return cls(moments, digests, compression)
+
+    def merge(self, other):
+        moments = pd.concat([self.moments, other.moments])
+        moments = moments.groupby(level=0).agg(
+            {'count': 'sum', 'sum': 'sum', 'sumsq': 'sum', 'min': 'min', 'max': 'max'})
+        digests = dict(self.digests)
+        for key, digest in other.digests.items():
+            digests[key] = digests[key].merge(digest) if key in digests else digest
+        return GroupedStats(moments, digests, self.compression)
+
+    def result(self, stats=DEFAULT_STATS, quantiles=DEFAULT_QUANTILES):
+        m = self.moments
+        out = pd.DataFrame(index=m.index)
+        for stat in stats:
+            if stat in ('count', 'sum', 'min', 'max'):
+                out[stat] = m[stat]
+            elif stat == 'mean':
+                out[stat] = m['sum'] / m['count']
+            elif stat == 'std':
+                var = (m['sumsq'] - m['sum'] ** 2 / m['count']) / (m['count'] - 1)
+                out[stat] = np.sqrt(var.clip(lower=0)).where(m['count'] > 1)
+            else:
+                raise ValueError('unknown statistic: {}'.format(stat))
+        if quantiles and self.digests:
+            table = np.array([self.digests[key].quantile(quantiles) if key in self.digests
+                              else np.full(len(quantiles), np.nan) for key in m.index])
+            for i, q in enumerate(quantiles):
+                out[_quantile_name(q)] = table[:, i]
+        return out
+
+
+def grouped_stats(df, value_col, by, stats=DEFAULT_STATS, quantiles=DEFAULT_QUANTILES,
+                  compression=DEFAULT_COMPRESSION):
+    """Statistics of ``value_col`` per ``by`` group, without ``groupby.apply``.
+
+    min/max/count/mean/std come from native ``agg`` kernels and are exact;
+    the ``quantiles`` (p50/p90/p99 by default) are t-digest estimates.
+    """
+    if not quantiles:
+        return df.groupby(by, observed=True)[value_col].agg(list(stats))
+    partial = GroupedStats.from_frame(df, value_col, by, compression)
+    return partial.result(stats, quantiles)
@@ -0,0 +1,192 @@
+"""Memory-mapped dataset store for repeated model experiments.
+
+Every run of the model cells re-read flights.csv, cleaned it and rebuilt
+``X``/``y`` (In[79]-In[91]). ``DatasetStore`` writes the cleaned, encoded
+model columns once as raw ``.npy`` arrays next to a small JSON manifest::
+
+    python -m flightdelay store flights.csv store/ --airlines airlines.csv --airports airports.csv
+    python -m flightdelay train store/ --models Lasso,Ridge
+
+Opening the store maps the arrays with ``np.load(mmap_mode='r')``, so it
+takes milliseconds whatever the size, and concurrent training processes
+share the same pages of the OS cache instead of each holding a parsed copy.
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from .encoding import CategoryEncoder
+from .models import MODEL_COLUMNS
+
+MANIFEST = 'manifest.json'
+FEATURES = 'features.npy'
+TARGETS = ('ARRIVAL_DELAY', 'DELAY_TYPE')
+# Rows gathered at a time when a split is copied out of the store.
+BLOCK_ROWS = 1 << 16
+
+
+def _save_npy(path, array):
+    np.save(path + '.tmp.npy', array)
+    os.replace(path + '.tmp.npy', path)
+
+
+class DatasetStore:
+    """Directory holding the encoded model columns of a cleaned flights frame.
+
+    Layout of ``path``::
+
+        manifest.json       row count, column names, targets and the encoder
+        features.npy        float32 (rows, columns) matrix of MODEL_COLUMNS (and time features)
+        <target>.npy        one array per target (ARRIVAL_DELAY, DELAY_TYPE)
+
+    The features are stored unscaled; ``model_data`` splits and scales a
+    copy exactly as ``models.model_data`` does on the frame.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if not self.exists(path):
+            raise FileNotFoundError('no dataset store in {}'.format(path))
+        with open(os.path.join(path, MANIFEST)) as f:
+            self.manifest = json.load(f)
+        self.encoder = CategoryEncoder.from_dict(self.manifest['encoder'])
+
+    @staticmethod
+    def exists(path):
+        return os.path.isfile(os.path.join(path, MANIFEST))
+
+    @classmethod
+    def build(cls, path, flights, encoder=None, columns=MODEL_COLUMNS, targets=TARGETS,
+              time_features=False):
+        """Write the cleaned ``flights`` to a store at ``path``; returns it.
+
+        Categorical columns are encoded with ``encoder`` (by default built
+        from ``flights``). DELAY_TYPE is derived from DEPARTURE_DELAY when
+        the frame does not have it. With ``time_features`` the time features
+        of ``features.model_time_features`` are stored as extra columns.
+        """
+        from .features import delay_type, feature_matrix, model_time_features
+
+        encoder = CategoryEncoder.from_frame(flights) if encoder is None else encoder
+        os.makedirs(path, exist_ok=True)
+        raw = list(columns)
+        times = model_time_features(flights) if time_features else None
+        columns = raw + ([] if times is None else list(times.columns))
+        features = os.path.join(path, FEATURES)
+        out = np.lib.format.open_memmap(features + '.tmp.npy', mode='w+', dtype=np.float32,
+                                        shape=(len(flights), len(columns)))
+        feature_matrix(flights, None, raw, encoder=encoder, out=out[:, :len(raw)])
+        if times is not None:
+            feature_matrix(times, None, out=out[:, len(raw):])
+            del times
+        out.flush()
+        del out
+        os.replace(features + '.tmp.npy', features)
+
+        dtypes = {}
+        for target in targets:
+            if target == 'DELAY_TYPE' and target not in flights:
+                values = delay_type(flights['DEPARTURE_DELAY'].to_numpy())
+            else:
+                values = flights[target].to_numpy()
+            _save_npy(os.path.join(path, target + '.npy'), values)
+            dtypes[target] = values.dtype.str
+
+        # The manifest goes last: a store only exists once all arrays are on disk.
+        manifest = {'rows': len(flights), 'columns': columns, 'targets': dtypes,
+                    'encoder': encoder.to_dict(),
+                    'created': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        with open(os.path.join(path, MANIFEST + '.tmp'), 'w') as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(os.path.join(path, MANIFEST + '.tmp'), os.path.join(path, MANIFEST))
+        return cls(path)
+
+    @property
+    def columns(self):
+        return list(self.manifest['columns'])
+
+    @property
+    def targets(self):
+        return list(self.manifest['targets'])
+
+    def __len__(self):
+        return self.manifest['rows']
+
+    def features(self):
+        """Read-only memory map of the feature matrix."""
+        return np.load(os.path.join(self.path, FEATURES), mmap_mode='r')
+
+    def target(self, name):
+        """Read-only memory map of one target."""
+        if name not in self.manifest['targets']:
+            raise KeyError('no target {} in {}'.format(name, self.path))
+        return np.load(os.path.join(self.path, name + '.npy'), mmap_mode='r')
+
+    def model_data(self, target='ARRIVAL_DELAY', test_size=0.3, random_state=2,
+                   target_stats=False, time_features=False):
+        """``ModelData`` of ``target`` with every other stored column as feature.
+
+        The rows are gathered from the memory map block by block in
+        ``train_test_split`` order into one float32 matrix that is scaled in
+        place, so the result equals ``models.model_data`` on the frame, also
+        with ``target_stats`` and ``time_features``. Stored time features
+        are only used with ``time_features``.
+        """
+        from .encoding import TargetEncoder
+        from .features import MODEL_TIME_FEATURES, split_order, standardize, with_time_features
+        from .models import ModelData, add_target_stats
+
+        features = [c for c in self.columns if c != target and c not in MODEL_TIME_FEATURES]
+        if time_features:
+            features = with_time_features(features)
+            missing = [c for c in features if c not in self.columns]
+            if missing:
+                raise ValueError('{} has no time features {}; build it with time_features=True'
+                                 .format(self.path, ', '.join(missing)))
+        picked = [self.columns.index(c) for c in features]
+        stored = self.features()
+        y = self.target(target)
+        order, n_train = split_order(len(self), test_size, random_state)
+        target_encoder = (TargetEncoder(self.encoder, random_state=random_state)
+                          if target_stats else None)
+        extra = target_encoder.columns if target_stats else []
+        X = np.empty((len(order), len(features) + len(extra)), dtype=np.float32)
+        for start in range(0, len(order), BLOCK_ROWS):
+            rows = order[start:start + BLOCK_ROWS]
+            X[start:start + len(rows), :len(features)] = stored[rows][:, picked]
+        y = y[order]
+        if target_stats:
+            add_target_stats(X, y, n_train, features, target_encoder)
+        sc = standardize(X, n_train)
+        return ModelData(X[:n_train], X[n_train:], y[:n_train], y[n_train:], features + extra, sc,
+                         self.encoder, target_encoder)
+
+
+def main(argv=None):
+    from .clean import clean_flights
+    from .io import load_flights
+
+    parser = argparse.ArgumentParser(description='Write cleaned flights to a dataset store.')
+    parser.add_argument('flights', help='raw flights CSV')
+    parser.add_argument('store', help='store directory')
+    parser.add_argument('--airlines', help='airlines.csv to take the airline codes from')
+    parser.add_argument('--airports', help='airports.csv to take the airport codes from')
+    parser.add_argument('--time-features', action='store_true',
+                        help='also store the time features of train --time-features')
+    args = parser.parse_args(argv)
+
+    encoder = None
+    if args.airlines and args.airports:
+        encoder = CategoryEncoder.from_files(args.airlines, args.airports)
+    start = time.perf_counter()
+    store = DatasetStore.build(args.store, clean_flights(load_flights(args.flights, cache=False)),
+                               encoder, time_features=args.time_features)
+    print('{} rows x {} columns written to {} in {:.1f} s'.format(
+        len(store), len(store.columns), args.store, time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
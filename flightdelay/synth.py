@@ -0,0 +1,263 @@
+"""Synthetic flights in the schema of the BTS ``flights.csv``.
+
+Used to stress-test the pipeline at 10x-100x the 2015 volume on machines
+without the Kaggle data or network access. The generator is fully
+vectorized and writes CSV or Parquet in chunks::
+
+    python -m flightdelay.synth flights_60M.parquet --rows 60M --airports airports.csv
+
+The data is random but shaped like the real thing: a few hub airports carry
+most of the traffic, carriers have their 2015 market shares, departure
+delays are heavy tailed and both their frequency and their size depend on
+the airline, the origin airport, the hour of day and the month. When
+``airlines.csv`` / ``airports.csv`` are given their codes are used, and
+route distances come from the airport coordinates.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# Column order of flights.csv.
+RAW_COLUMNS = ['YEAR', 'MONTH', 'DAY', 'DAY_OF_WEEK', 'AIRLINE', 'FLIGHT_NUMBER', 'TAIL_NUMBER',
+               'ORIGIN_AIRPORT', 'DESTINATION_AIRPORT', 'SCHEDULED_DEPARTURE', 'DEPARTURE_TIME',
+               'DEPARTURE_DELAY', 'TAXI_OUT', 'WHEELS_OFF', 'SCHEDULED_TIME', 'ELAPSED_TIME',
+               'AIR_TIME', 'DISTANCE', 'WHEELS_ON', 'TAXI_IN', 'SCHEDULED_ARRIVAL',
+               'ARRIVAL_TIME', 'ARRIVAL_DELAY', 'DIVERTED', 'CANCELLED', 'CANCELLATION_REASON',
+               'AIR_SYSTEM_DELAY', 'SECURITY_DELAY', 'AIRLINE_DELAY', 'LATE_AIRCRAFT_DELAY',
+               'WEATHER_DELAY']
+
+# IATA codes of the 14 carriers in airlines.csv and their approximate 2015
+# share of flights.
+AIRLINE_SHARES = {'WN': 0.217, 'DL': 0.150, 'AA': 0.125, 'OO': 0.101, 'EV': 0.098,
+                  'UA': 0.088, 'MQ': 0.050, 'B6': 0.046, 'US': 0.034, 'AS': 0.029,
+                  'NK': 0.020, 'F9': 0.016, 'HA': 0.013, 'VX': 0.013}
+AIRLINE_CODES = list(AIRLINE_SHARES)
+N_AIRPORTS = 322
+
+SPEED_MILES_PER_MINUTE = 7.5
+# Share of flights delayed by >= 15 minutes before the per-flight effects.
+BASE_DELAY_RATE = 0.17
+CANCEL_RATE = 0.015
+
+
+def airport_codes(n=N_AIRPORTS):
+    """``n`` distinct three letter codes (AAA, AAB, ...)."""
+    letters = np.array(list('ABCDEFGHIJKLMNOPQRSTUVWXYZ'))
+    i = np.arange(n)
+    return [''.join(t)
+            for t in zip(letters[i // 676 % 26], letters[i // 26 % 26], letters[i % 26])]
+
+
+def _hhmm(minutes):
+    hours, minutes = np.divmod(np.asarray(minutes, dtype=np.int32) % (24 * 60), 60)
+    return hours * 100 + minutes
+
+
+def _haversine_miles(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * 3958.8 * np.arcsin(np.sqrt(a))
+
+
+class FlightGenerator:
+    """Fixed "world" (carriers, airports, routes, delay propensities).
+
+    Everything random about the world is drawn once from ``seed``, so
+    chunks generated with different chunk seeds still describe the same
+    airlines and airports.
+    """
+
+    def __init__(self, airlines=None, airports=None, seed=0, year=2015):
+        rng = np.random.default_rng(seed)
+        self.year = year
+
+        if airlines is None:
+            codes = AIRLINE_CODES
+        else:
+            codes = list(airlines['IATA_CODE'])
+        shares = np.array([AIRLINE_SHARES.get(c, np.nan) for c in codes])
+        shares[np.isnan(shares)] = np.nanmean(shares) if np.isfinite(shares).any() else 1.0
+        self.airlines = np.array(codes, dtype=object)
+        self.airline_p = shares / shares.sum()
+
+        if airports is None:
+            self.airports = np.array(airport_codes(), dtype=object)
+            lat = rng.uniform(25, 48, len(self.airports))
+            lon = rng.uniform(-123, -70, len(self.airports))
+        else:
+            airports = airports.dropna(subset=['LATITUDE', 'LONGITUDE'])
+            self.airports = airports['IATA_CODE'].to_numpy(dtype=object)
+            lat = airports['LATITUDE'].to_numpy(np.float64)
+            lon = airports['LONGITUDE'].to_numpy(np.float64)
+        n_airports = len(self.airports)
+        # Zipf-like traffic: a handful of hubs, a long tail of small fields.
+        weight = 1.0 / np.arange(1, n_airports + 1) ** 0.7
+        self.airport_p = rng.permutation(weight / weight.sum())
+        self.distance = np.maximum(
+            _haversine_miles(lat[:, None], lon[:, None], lat[None, :], lon[None, :]), 60
+        ).round().astype(np.int32)
+
+        # Multiplicative delay propensities; busy airports are more congested.
+        self.airline_effect = rng.lognormal(0, 0.3, len(self.airlines))
+        self.airport_effect = (rng.lognormal(0, 0.3, n_airports)
+                               * (1 + 2 * self.airport_p / self.airport_p.max()) ** 0.3)
+
+        days = pd.date_range('{}-01-01'.format(year), '{}-12-31'.format(year), freq='D')
+        self.month = days.month.to_numpy(np.int8)
+        self.day = days.day.to_numpy(np.int8)
+        self.day_of_week = (days.dayofweek.to_numpy(np.int8) + 1)
+        # Summer and the December holidays are the worst months.
+        self.month_effect = np.array([1.0, 0.85, 0.95, 0.85, 0.9, 1.25, 1.25, 1.1, 0.75,
+                                      0.7, 0.8, 1.1])
+        self.tails = np.array(['N{}{}'.format(100 + i // 26, chr(65 + i % 26))
+                               for i in range(5000)], dtype=object)
+
+    def generate(self, n, seed=None):
+        """Return ``n`` flights as a DataFrame with the columns of flights.csv."""
+        rng = np.random.default_rng(seed)
+        n_airports = len(self.airports)
+
+        day = rng.integers(0, len(self.month), n)
+        month = self.month[day]
+        airline = rng.choice(len(self.airlines), n, p=self.airline_p)
+        origin = rng.choice(n_airports, n, p=self.airport_p)
+        destination = rng.choice(n_airports, n, p=self.airport_p)
+        same = destination == origin
+        shift = 1 + rng.integers(0, n_airports - 1, same.sum())
+        destination[same] = (destination[same] + shift) % n_airports
+
+        distance = self.distance[origin, destination]
+        sched_time = 30 + distance / SPEED_MILES_PER_MINUTE + rng.normal(0, 8, n)
+        sched_time = np.maximum(np.round(sched_time), 25).astype(np.int32)
+        # Departures between 05:00 and 23:59, busiest in the morning and evening.
+        hour = np.clip(rng.normal(13, 4.5, n), 5, 23.99)
+        sched_dep = (hour * 60).astype(np.int32)
+
+        # Delays build up during the day.
+        effect = (self.airline_effect[airline] * self.airport_effect[origin]
+                  * self.month_effect[month - 1] * (0.6 + 0.05 * (hour - 5)))
+        delayed = rng.random(n) < np.clip(BASE_DELAY_RATE * effect, 0, 0.9)
+        dep_delay = np.where(
+            delayed,
+            np.minimum(15 + rng.lognormal(np.log(20 * effect), 1.0), 1990),
+            np.minimum(rng.normal(-2, 5, n), 14),
+        ).round()
+        taxi_out = np.round(rng.gamma(4, 4, n) * self.airport_effect[origin]).clip(1, 120)
+        taxi_in = np.round(rng.gamma(3, 2.5, n) * self.airport_effect[destination]).clip(1, 90)
+        elapsed = np.round(sched_time + rng.normal(-4, 9, n)
+                           + (taxi_out - 16) * 0.5).clip(20, None)
+        air_time = np.maximum(elapsed - taxi_out - taxi_in, 10)
+        arr_delay = dep_delay + elapsed - sched_time
+
+        # Cancellations hit congested airports more; cancelled flights have
+        # no actual times or delays, adding ``missing`` turns those into NaN.
+        cancelled = rng.random(n) < CANCEL_RATE * self.airport_effect[origin]
+        missing = np.where(cancelled, np.nan, 0.0)
+        reason = np.full(n, None, dtype=object)
+        reason[cancelled] = rng.choice(np.array(['A', 'B', 'C', 'D'], dtype=object),
+                                       cancelled.sum(), p=[0.28, 0.54, 0.17, 0.01])
+
+        df = pd.DataFrame({
+            'YEAR': np.full(n, self.year, dtype=np.int16),
+            'MONTH': month,
+            'DAY': self.day[day],
+            'DAY_OF_WEEK': self.day_of_week[day],
+            'AIRLINE': pd.Categorical.from_codes(airline, self.airlines),
+            'FLIGHT_NUMBER': rng.integers(1, 7000, n),
+            'TAIL_NUMBER': pd.Categorical.from_codes(rng.integers(0, len(self.tails), n),
+                                                     self.tails),
+            'ORIGIN_AIRPORT': pd.Categorical.from_codes(origin, self.airports),
+            'DESTINATION_AIRPORT': pd.Categorical.from_codes(destination, self.airports),
+            'SCHEDULED_DEPARTURE': _hhmm(sched_dep),
+            'DEPARTURE_TIME': _hhmm(sched_dep + dep_delay) + missing,
+            'DEPARTURE_DELAY': dep_delay + missing,
+            'TAXI_OUT': taxi_out + missing,
+            'WHEELS_OFF': _hhmm(sched_dep + dep_delay + taxi_out) + missing,
+            'SCHEDULED_TIME': sched_time,
+            'ELAPSED_TIME': elapsed + missing,
+            'AIR_TIME': air_time + missing,
+            'DISTANCE': distance,
+            'WHEELS_ON': _hhmm(sched_dep + dep_delay + taxi_out + air_time) + missing,
+            'TAXI_IN': taxi_in + missing,
+            'SCHEDULED_ARRIVAL': _hhmm(sched_dep + sched_time),
+            'ARRIVAL_TIME': _hhmm(sched_dep + dep_delay + elapsed) + missing,
+            'ARRIVAL_DELAY': arr_delay + missing,
+            'DIVERTED': np.zeros(n, dtype=np.int8),
+            'CANCELLED': cancelled.astype(np.int8),
+            'CANCELLATION_REASON': reason,
+        })
+        # The cause breakdown is only reported for arrivals delayed >= 15 min.
+        late = np.where(arr_delay >= 15, arr_delay, np.nan) + missing
+        split = rng.random((n, 5))
+        split /= split.sum(axis=1, keepdims=True)
+        for i, col in enumerate(['AIR_SYSTEM_DELAY', 'SECURITY_DELAY', 'AIRLINE_DELAY',
+                                 'LATE_AIRCRAFT_DELAY', 'WEATHER_DELAY']):
+            df[col] = np.floor(late * split[:, i])
+        return df[RAW_COLUMNS]
+
+    def iter_chunks(self, n, chunksize=1_000_000, seed=0):
+        """Yield ``n`` flights in chunks, each from its own child seed."""
+        seeds = np.random.SeedSequence(seed).spawn(-(-n // chunksize))
+        for i, chunk_seed in enumerate(seeds):
+            yield self.generate(min(chunksize, n - i * chunksize), chunk_seed)
+
+
+def synthetic_flights(n, seed=0, year=2015, airlines=None, airports=None):
+    """Return ``n`` random flights with the columns and value ranges of flights.csv."""
+    return FlightGenerator(airlines, airports, seed, year).generate(n, seed)
+
+
+def write_synthetic(path, n, chunksize=1_000_000, seed=0, airlines=None, airports=None):
+    """Stream ``n`` synthetic flights to ``path`` (``.csv`` or ``.parquet``).
+
+    Only one chunk is in memory at a time. Returns the rows per second.
+    """
+    gen = FlightGenerator(airlines, airports, seed)
+    start = time.perf_counter()
+    if path.endswith('.parquet'):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        writer = None
+        try:
+            for chunk in gen.iter_chunks(n, chunksize, seed):
+                # The code columns share the generator's fixed categories, so
+                # every chunk has the same dictionary schema.
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+    else:
+        for i, chunk in enumerate(gen.iter_chunks(n, chunksize, seed)):
+            chunk.to_csv(path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+    return n / (time.perf_counter() - start)
+
+
+def main(argv=None):
+    from .bench import parse_size
+
+    parser = argparse.ArgumentParser(description='Write synthetic BTS-schema flights.')
+    parser.add_argument('path', help='output file, .csv or .parquet')
+    parser.add_argument('--rows', default='5.8M', help='number of flights, e.g. 58M')
+    parser.add_argument('--chunksize', default='1M')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--airlines', help='airlines.csv to take the carrier codes from')
+    parser.add_argument('--airports', help='airports.csv to take the airport codes from')
+    args = parser.parse_args(argv)
+
+    airlines = pd.read_csv(args.airlines) if args.airlines else None
+    airports = pd.read_csv(args.airports) if args.airports else None
+    n = parse_size(args.rows)
+    rate = write_synthetic(args.path, n, parse_size(args.chunksize), args.seed, airlines, airports)
+    print('{} rows written to {} ({:,.0f} rows/s, {:.1f} MB)'.format(
+        n, args.path, rate, os.path.getsize(args.path) / 2 ** 20))
+
+
+if __name__ == '__main__':
+    main()
@@ -44,9 +44,12 @@ from scipy.stats import skew
 
 
 #veri setlerinin yüklenmesi
-airlines = pd.read_csv('airlines.csv')
-airports = pd.read_csv('airports.csv')
-flights = pd.read_csv('flights.csv', low_memory=False) #veri seti çok büyük olduğu için Jupyter Notebook'un verdiği uyarı üzerine low_memory özelliği eklenmiştir. 
+from flightdelay.io import load_airlines, load_airports, load_flights
+airlines = load_airlines('airlines.csv')
+airports = load_airports('airports.csv')
+# veri seti çok büyük olduğu için yalnızca kullanılan sütunlar küçük veri türleriyle okunur,
+# ilk okumadan sonra .cache klasöründeki parquet kopyası kullanılır
+flights = load_flights('flights.csv')
 
 
 # __________________________________________________________
@@ -155,7 +158,7 @@ kaldırılacak_sutunlar = ['TAXI_OUT', 'TAXI_IN', 'WHEELS_ON', 'WHEELS_OFF', 'YE
                         'AIR_SYSTEM_DELAY', 'SECURITY_DELAY', 'AIRLINE_DELAY', 'LATE_AIRCRAFT_DELAY',
                        'WEATHER_DELAY', 'DIVERTED', 'CANCELLED', 'CANCELLATION_REASON',
                        'FLIGHT_NUMBER', 'TAIL_NUMBER', 'AIR_TIME']
-flights.drop(kaldırılacak_sutunlar, axis = 1, inplace = True)
+flights.drop(kaldırılacak_sutunlar, axis = 1, inplace = True, errors = 'ignore')
 
 
 # In[18]:
@@ -230,14 +233,21 @@ flights.describe().round() #Temel İstatistik Bilgilerin İncelenmesi
 # In[26]:
 
 
-df_num=flights.select_dtypes(["float64","int64"])
+from flightdelay.preview import box_stats, histogram, plot_boxes, stratified_sample
+
+# Önizleme modu: dağılım grafikleri havayolu/ay katmanlı örneklemden çizilir
+# (yüzdelik hatası en fazla %1, %95 güvenle). Tüm veri için False yapın.
+ONIZLEME = True
+ornek = stratified_sample(flights, error=0.01) if ONIZLEME else flights
+
+df_num=flights.select_dtypes("number")
 for col in df_num:
     print(col)
     print(f"Skewness: {skew(df_num[col])}")
     mwidth=df_num[col].mean()
     dwidth=df_num[col].median()
     plt.figure()
-    sns.distplot(df_num[col])
+    sns.distplot(ornek[col])
     plt.axvline(mwidth,color="red")
     plt.axvline(dwidth,color="yellow")
     plt.grid(True)
@@ -252,8 +262,11 @@ plt.grid(True)
 gunler =['pazartesi','sali','carsamba','persembe','cuma','cumartesi','pazar']
 aylar = ['ocak', 'subat', 'mart', 'nisan', 'mayıs', 'haziran', 'temmuz', 'ağustos', 'eylül', 'ekim', 'kasim', 'aralik']
 
-pddf=pd.DataFrame({'count' : flights.groupby( ['MONTH', 'DAY_OF_WEEK'] ).size()}).reset_index()
-pddf = pddf.pivot("MONTH", "DAY_OF_WEEK", "count")
+# tüm EDA grafikleri, veri üzerinden tek geçişte oluşturulan gecikme küpünden üretilir
+from flightdelay.cube import DelayCube
+cube = DelayCube.build(flights)
+
+pddf = cube.pivot("MONTH", "DAY_OF_WEEK")
 fig, ax=plt.subplots(figsize=(10,8))
 ax = sns.heatmap(pddf, ax=ax,  
                   linewidths=.5,
@@ -272,10 +285,8 @@ plt.show()
 # In[28]:
 
 
-pddf=pd.DataFrame({'count' : flights.groupby(['MONTH','DAY']).size()}).reset_index()
-
 # use a heatmap to better visualize the data
-pddf = pddf.pivot("MONTH", "DAY", "count")
+pddf = cube.pivot("MONTH", "DAY")
 f, ax = plt.subplots(figsize=(18, 6))
 sns.heatmap(pddf,
             cmap='Blues')
@@ -298,9 +309,13 @@ plt.show()
 # In[29]:
 
 
+# korelasyon matrisi bir kez hesaplanır, sonraki tüm ısı haritaları bu önbellekten okunur
+from flightdelay.corr import CorrelationCache
+korelasyon = CorrelationCache.from_frame(flights)
+
 plt.figure(figsize=(10,8))
 plt.title('Uçuş Verileri Arasındaki Korelasyon', fontsize=20)
-sns.heatmap(flights.corr(), cbar=True, annot =False, square=True, fmt='.2f',annot_kws={'size':15}, linewidth=3, cmap='Blues')
+sns.heatmap(korelasyon.corr(), cbar=True, annot =False, square=True, fmt='.2f',annot_kws={'size':15}, linewidth=3, cmap='Blues')
 plt.show()
 
 
@@ -312,7 +327,7 @@ plt.show()
 
 
 fig, ax = plt.subplots()
-flights.DEPARTURE_DELAY.hist(ax=ax, bins=1000, range=(16, 1000))
+histogram(flights['DEPARTURE_DELAY'], bins=1000, range=(16, 1000)).plot(ax=ax)
 ax.set_xscale('log')
 plt.ylim(0, 50000)
 plt.title('Kalkıştaki Gecikme')
@@ -325,7 +340,7 @@ plt.show()
 
 
 fig, ax = plt.subplots()
-flights.ARRIVAL_DELAY.hist(ax=ax, bins=1000, range=(16, 1000))
+histogram(flights['ARRIVAL_DELAY'], bins=1000, range=(16, 1000)).plot(ax=ax)
 ax.set_xscale('log')
 plt.ylim(0, 50000)
 plt.title('Varıştaki Gecikme')
@@ -337,8 +352,9 @@ plt.show()
 # In[32]:
 
 
-delay_type = lambda x:((0,1)[x >= 30],2)[x >= 60]
-flights['DELAY_TYPE'] = flights['DEPARTURE_DELAY'].apply(delay_type)
+from flightdelay.features import delay_type_column, delay_type_labels
+delay_type_column(flights, 'DEPARTURE_DELAY')
+delay_type_column(flights, 'ARRIVAL_DELAY')
 # 1 = 15 dakikadan fazla ve 30 dakikadan az gecikme
 # 2 = 30 dakikadan fazla ve 1 saatten az gecikme
 # 3 = 1 saatten fazla gecikme   
@@ -381,7 +397,7 @@ plt.show()
 
 #"DEPARTURE_DELAY" ile ilişkili değişkenlerin belirlenmesi
 plt.figure(figsize=(8, 12))
-heatmap = sns.heatmap(flights.corr()[['DEPARTURE_DELAY']].sort_values(by='DEPARTURE_DELAY', ascending=False), vmin=-1, vmax=1, annot=True, cmap='BrBG')
+heatmap = sns.heatmap(korelasyon.target('DEPARTURE_DELAY'), vmin=-1, vmax=1, annot=True, cmap='BrBG')
 heatmap.set_title('"DEPARTURE_DELAY" ile ilişkili değişkenler', fontdict={'fontsize':18}, pad=16);
 plt.show()
 # plt.savefig('kalkışgecikmesi.png', dpi=300, bbox_inches='tight')
@@ -392,7 +408,7 @@ plt.show()
 
 #"ARRIVAL_DELAY" ile ilişkili değişkenlerin belirlenmesi
 plt.figure(figsize=(8, 12))
-heatmap = sns.heatmap(flights.corr()[['ARRIVAL_DELAY']].sort_values(by='ARRIVAL_DELAY', ascending=False), vmin=-1, vmax=1, annot=True, cmap='BrBG')
+heatmap = sns.heatmap(korelasyon.target('ARRIVAL_DELAY'), vmin=-1, vmax=1, annot=True, cmap='BrBG')
 heatmap.set_title('"ARRIVAL_DELAY" ile ilişkili değişkenler', fontdict={'fontsize':18}, pad=16);
 plt.show()
 # plt.savefig('varışgecikmesi.png', dpi=300, bbox_inches='tight')
@@ -419,20 +435,19 @@ def plot_bar(group, title):
 
 
 def delay_by_attribute_departure(attribute, df=flights, figsize=(10, 7)):
-    delay_type = lambda x:((0,1)[x >= 30],2)[x >= 60]
-    flights['DELAY_TYPE'] = flights['DEPARTURE_DELAY'].apply(delay_type)
+    hue = delay_type_column(flights, 'DEPARTURE_DELAY')
    
     fig = plt.figure(1, figsize=(10,7))
-    ax = sns.countplot(y=attribute, hue='DELAY_TYPE', data=flights)
+    counts = cube.rollup([attribute, hue], 'DEPARTURE_DELAY', ('count',)).reset_index()
+    ax = sns.barplot(y=attribute, x='count', hue=hue, data=counts, orient='h')
     
     plt.xlabel('Uçuş Sayısı', fontsize=16, weight='bold')
     plt.ylabel(attribute, fontsize=16, weight='bold')
     plt.title(f'{attribute} lara göre kalkış gecikmelerinin dağılımı', weight='bold')
     L = plt.legend()
     
-    L.get_texts()[0].set_text('az gecikme (15 < t < 30 min)')
-    L.get_texts()[1].set_text('orta gecikme (30 <= t < 60 min)')
-    L.get_texts()[2].set_text('büyük gecikme (t >= 60 min)')
+    for text, label in zip(L.get_texts(), delay_type_labels()):
+        text.set_text(label)
 
     plt.grid(True)
     plt.show()
@@ -442,20 +457,19 @@ def delay_by_attribute_departure(attribute, df=flights, figsize=(10, 7)):
 
 
 def delay_by_attribute_arrival(attribute, df=flights, figsize=(10, 7)):
-    delay_type = lambda x:((0,1)[x >= 30],2)[x >= 60]
-    flights['DELAY_TYPE'] = flights['ARRIVAL_DELAY'].apply(delay_type)
+    hue = delay_type_column(flights, 'ARRIVAL_DELAY')
     
     fig = plt.figure(1, figsize=(10,7))
-    ax = sns.countplot(y=attribute, hue='DELAY_TYPE', data=flights)
+    counts = cube.rollup([attribute, hue], 'ARRIVAL_DELAY', ('count',)).reset_index()
+    ax = sns.barplot(y=attribute, x='count', hue=hue, data=counts, orient='h')
     
     plt.xlabel('Uçuş Sayısı', fontsize=16, weight='bold')
     plt.ylabel(attribute, fontsize=16, weight='bold')
     plt.title(f'{attribute} lara göre varış gecikmelerinin dağılımı', weight='bold')
     L = plt.legend()
     
-    L.get_texts()[0].set_text('az gecikme (15 < t < 30 min)')
-    L.get_texts()[1].set_text('orta gecikme (30 <= t < 60 min)')
-    L.get_texts()[2].set_text('büyük gecikme (t >= 60 min)')
+    for text, label in zip(L.get_texts(), delay_type_labels()):
+        text.set_text(label)
 
     plt.grid(True)
     plt.show()
@@ -468,7 +482,7 @@ def delay_by_attribute_arrival(attribute, df=flights, figsize=(10, 7)):
 # In[40]:
 
 
-plot_bar(flights.value_counts('MONTH'), 'Aylara Göre Uçuşların Dağılımı')
+plot_bar(cube.counts('MONTH'), 'Aylara Göre Uçuşların Dağılımı')
 
 
 # In[41]:
@@ -486,7 +500,7 @@ delay_by_attribute_arrival('MONTH')
 # In[43]:
 
 
-sns.heatmap(flights[['ARRIVAL_DELAY','DEPARTURE_DELAY', 'MONTH']].corr(), annot=True, fmt='.3f')
+sns.heatmap(korelasyon.corr(['ARRIVAL_DELAY','DEPARTURE_DELAY', 'MONTH']), annot=True, fmt='.3f')
 plt.show()
 
 
@@ -501,7 +515,7 @@ plt.show()
 # In[44]:
 
 
-plot_bar(flights.value_counts('DAY'), 'Ayın Günlerine Göre Uçuşların Dağılımı')
+plot_bar(cube.counts('DAY'), 'Ayın Günlerine Göre Uçuşların Dağılımı')
 
 
 # In[45]:
@@ -519,7 +533,7 @@ delay_by_attribute_arrival('DAY')
 # In[47]:
 
 
-plot_bar(flights.value_counts('DAY_OF_WEEK'), 'Haftanın Günlerine Göre Uçuşların Dağılımı')
+plot_bar(cube.counts('DAY_OF_WEEK'), 'Haftanın Günlerine Göre Uçuşların Dağılımı')
 
 
 # In[48]:
@@ -537,7 +551,7 @@ delay_by_attribute_arrival('DAY_OF_WEEK')
 # In[50]:
 
 
-sns.heatmap(flights[['ARRIVAL_DELAY','DEPARTURE_DELAY', 'DAY', 'DAY_OF_WEEK']].corr(), annot=True, fmt='.3f');
+sns.heatmap(korelasyon.corr(['ARRIVAL_DELAY','DEPARTURE_DELAY', 'DAY', 'DAY_OF_WEEK']), annot=True, fmt='.3f');
 plt.show()
 
 
@@ -558,7 +572,7 @@ plt.show()
 # In[51]:
 
 
-#plot_bar(flights.value_counts('ORIGIN_AIRPORT'), 'Kalkış Havaalanlarındaki Uçuş Yoğunluğunun Dağılımı')
+#plot_bar(cube.counts('ORIGIN_AIRPORT'), 'Kalkış Havaalanlarındaki Uçuş Yoğunluğunun Dağılımı')
 
 
 # In[52]:
@@ -571,17 +585,14 @@ plt.show()
 
 
 #kalkış havaalanlarında gerçekleşen uçuş sayısı
-flights.groupby(['ORIGIN_AIRPORT'])['ORIGIN_AIRPORT'].count().sort_values(ascending=False)
+cube.counts('ORIGIN_AIRPORT')
 
 
 # In[54]:
 
 
-yogun_kalkis_hv = flights[flights['DEPARTURE_DELAY'].notnull()]
-yogun_kalkis_hv = yogun_kalkis_hv[yogun_kalkis_hv['ORIGIN_AIRPORT'].notnull()]
-yogun_kalkis_hv = yogun_kalkis_hv[['DEPARTURE_DELAY','ORIGIN_AIRPORT']]
-yogun_kalkis_hv = yogun_kalkis_hv['ORIGIN_AIRPORT']
-yogun_kalkis_hv.value_counts()[:10].plot.bar(xlabel="Havaalanı", ylabel="Sayı",title = 'Kalkış gecikmesi en fazla olan ilk 10 Havalimanı')
+yogun_kalkis_hv = cube.rollup('ORIGIN_AIRPORT', 'DEPARTURE_DELAY', ('count',))['count']
+yogun_kalkis_hv.sort_values(ascending=False)[:10].plot.bar(xlabel="Havaalanı", ylabel="Sayı",title = 'Kalkış gecikmesi en fazla olan ilk 10 Havalimanı')
 plt.show()
 
 
@@ -592,7 +603,7 @@ plt.show()
 # In[55]:
 
 
-#plot_bar(flights.value_counts('DESTINATION_AIRPORT'), 'Varış Havaalanlarındaki Uçuş Yoğunluğunun Dağılımı')
+#plot_bar(cube.counts('DESTINATION_AIRPORT'), 'Varış Havaalanlarındaki Uçuş Yoğunluğunun Dağılımı')
 
 
 # In[56]:
@@ -605,16 +616,14 @@ plt.show()
 
 
 #amount of flights for each airline:
-flights.groupby(['DESTINATION_AIRPORT'])['DESTINATION_AIRPORT'].count().sort_values(ascending=False).head(10),
+cube.counts('DESTINATION_AIRPORT').head(10),
 
 
 # In[58]:
 
 
-yogun_varis_hv = flights[flights['ARRIVAL_DELAY'].notnull()]
-yogun_varis_hv = yogun_varis_hv[['ARRIVAL_DELAY','DESTINATION_AIRPORT']]
-yogun_varis_hv = yogun_varis_hv['DESTINATION_AIRPORT']
-yogun_varis_hv.value_counts()[:10].plot.bar(xlabel="Havaalanı", ylabel="Sayı",title = 'Varış gecikmesi en fazla olan ilk 10 Havalimanı')
+yogun_varis_hv = cube.rollup('DESTINATION_AIRPORT', 'ARRIVAL_DELAY', ('count',))['count']
+yogun_varis_hv.sort_values(ascending=False)[:10].plot.bar(xlabel="Havaalanı", ylabel="Sayı",title = 'Varış gecikmesi en fazla olan ilk 10 Havalimanı')
 plt.show()
 
 
@@ -625,7 +634,7 @@ plt.show()
 # In[59]:
 
 
-plot_bar(flights.value_counts('AIRLINE'), 'Havayolu Şirketlerine Göre Uçuş Sayılarının Dağılımı')
+plot_bar(cube.counts('AIRLINE'), 'Havayolu Şirketlerine Göre Uçuş Sayılarının Dağılımı')
 
 
 # In[60]:
@@ -684,22 +693,21 @@ airline_marketshare()
 
 
 #her havayoluna ait uçuş sayısı
-flights.groupby(['AIRLINE'])['AIRLINE'].count().sort_values(ascending=False)
+cube.counts('AIRLINE')
 
 
 # In[64]:
 
 
-def get_stats(group):
-    return {'min': group.min(), 'max': group.max(),
-            'count': group.count(), 'mean': group.mean()}
+# get_stats yerine pandas'ın hazır toplama fonksiyonları ve yüzdelikler için t-digest kullanılır
+from flightdelay.stats import grouped_stats
 
 
 # In[65]:
 
 
 # Her havayoluna ilişkin istatistiksel bilgiler içeren bir veri çerçevesinin oluşturulması
-global_stats = flights['DEPARTURE_DELAY'].groupby(flights['AIRLINE']).apply(get_stats).unstack()
+global_stats = grouped_stats(flights, 'DEPARTURE_DELAY', 'AIRLINE')
 global_stats = global_stats.sort_values('count')
 global_stats
 
@@ -799,7 +807,9 @@ delay_by_attribute_arrival('AIRLINE')
 
 plt.figure(figsize=(10,5),dpi=100  )
 sns.set_style("whitegrid") 
-sns.boxplot(x = 'DEPARTURE_DELAY', y = 'AIRLINE', data = flights) 
+plot_boxes(box_stats(flights, 'DEPARTURE_DELAY', 'AIRLINE'))
+plt.xlabel('DEPARTURE_DELAY')
+plt.ylabel('AIRLINE')
 plt.show()
 
 
@@ -809,7 +819,9 @@ plt.show()
 #boxplot for arrival delay
 plt.figure(figsize=(10,5),dpi=100  )
 sns.set_style("whitegrid") 
-sns.boxplot(x = 'ARRIVAL_DELAY', y = 'AIRLINE', data = flights) 
+plot_boxes(box_stats(flights, 'ARRIVAL_DELAY', 'AIRLINE'))
+plt.xlabel('ARRIVAL_DELAY')
+plt.ylabel('AIRLINE')
 plt.show()
 
 
@@ -827,13 +839,11 @@ identify_airport = airports.set_index('IATA_CODE')['CITY'].to_dict()
 # In[72]:
 
 
-airport_mean_delays = pd.DataFrame(pd.Series(flights['ORIGIN_AIRPORT'].unique()))
-airport_mean_delays.set_index(0, drop = True, inplace = True)
-
-for carrier in abbr_companies.keys():
-    df1 = flights[flights['AIRLINE'] == carrier]
-    test = df1['ARRIVAL_DELAY'].groupby(flights['ORIGIN_AIRPORT']).apply(get_stats).unstack()
-    airport_mean_delays[carrier] = test.loc[:, 'mean'] 
+# her havalimanı-havayolu çifti için ortalama varış gecikmesi tek bir groupby ile hesaplanır
+from flightdelay.eda import airport_airline_matrix
+airport_mean_delays = airport_airline_matrix(flights, 'mean',
+                                             airports=flights['ORIGIN_AIRPORT'].unique(),
+                                             airlines=abbr_companies.keys())
 
 
 # Havalimanlarının sayısı oldukça fazla olduğundan, tüm bilgileri bir kerede gösteren bir grafik, yaklaşık 4400 değeri temsil edeceğinden (yani 312 hava alanı × 14 hava yolu) zor olacaktır. Bu nedenle, verilerin bir alt kümesi temsili oalrak gösterilecektir:
@@ -895,7 +905,7 @@ flights.info()
 # In[77]:
 
 
-flights.corr()
+korelasyon.corr()
 
 
 # In[78]:
@@ -903,7 +913,7 @@ flights.corr()
 
 plt.figure(figsize=( 20, 10))
 
-heatmap = sns.heatmap(flights.corr(), annot=True, cmap='Blues')
+heatmap = sns.heatmap(korelasyon.corr(), annot=True, cmap='Blues')
 heatmap.set_title('Correlation Heatmap', fontdict={'fontsize':18}, pad=12);
 
 # save heatmap as .png file
@@ -920,10 +930,20 @@ plt.show()
 #                        'WEATHER_DELAY', 'DIVERTED', 'CANCELLED', 'CANCELLATION_REASON',
 #                        'FLIGHT_NUMBER', 'TAIL_NUMBER', 'AIR_TIME']
 #flights.drop(variables_to_remove, axis = 1, inplace = True)
-flights = flights[['AIRLINE', 'ORIGIN_AIRPORT', 'DESTINATION_AIRPORT',
+model_columns = ['AIRLINE', 'ORIGIN_AIRPORT', 'DESTINATION_AIRPORT',
         'SCHEDULED_DEPARTURE', 'DEPARTURE_TIME', 'DEPARTURE_DELAY',
         'SCHEDULED_ARRIVAL', 'ARRIVAL_TIME', 'ARRIVAL_DELAY',
-        'SCHEDULED_TIME', 'ELAPSED_TIME']]
+        'SCHEDULED_TIME', 'ELAPSED_TIME']
+# HHMM saatleri yerine gece yarısından dakika ve saat, yılın günü, haftanın günü için
+# sin/cos özellikleri için True yapın (train --time-features ile aynı); varsayılan ham HHMM
+TIME_FEATURES = False
+if TIME_FEATURES:
+    from flightdelay.features import MODEL_TIME_FEATURES, model_time_features, with_time_features
+    times = model_time_features(flights)
+    flights = flights[[c for c in with_time_features(model_columns)
+                       if c not in MODEL_TIME_FEATURES]].join(times)
+else:
+    flights = flights[model_columns]
 
 
 # In[80]:
@@ -962,27 +982,17 @@ plt.show()
 
 from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder
-from sklearn.linear_model import Lasso,LinearRegression,Ridge
-from sklearn.tree import DecisionTreeRegressor
-from sklearn.ensemble import RandomForestRegressor,AdaBoostRegressor,BaggingRegressor
 from sklearn.metrics import mean_absolute_error,mean_squared_error,r2_score
 
 
 # In[85]:
 
 
-Las = Lasso()
-LinR = LinearRegression()
-Rid = Ridge()
-Rfc = RandomForestRegressor(random_state=2)
-Dtc = DecisionTreeRegressor(random_state = 2)
-Boost_Lin = AdaBoostRegressor(base_estimator=LinR,random_state=2)
-Boost_las = AdaBoostRegressor(base_estimator=Las,random_state=2)
-Boost_rid = AdaBoostRegressor(base_estimator=Rid,random_state=2)
-Bg_Lin = BaggingRegressor(base_estimator=LinR,random_state=2)
-Bg_las = BaggingRegressor(base_estimator=Las,random_state=2)
-Bg_rid = BaggingRegressor(base_estimator=Rid,random_state=2)
+# Lasso, LinearRegression, Ridge, RandomForest, DecisionTree ile AdaBoost ve Bagging türevleri.
+# Her model (model, hedef, veri) için bir kez eğitilir; eğitilen model ve test tahminleri
+# .cache/models altında saklanır ve sonraki tüm raporlar buradan okur.
+from flightdelay.models import ModelRegistry, fit_zoo_parallel, make_models
+registry = ModelRegistry()
 
 
 # #### Kaynakça : https://scikit-learn.org/stable/user_guide.html
@@ -1002,45 +1012,48 @@ Bg_rid = BaggingRegressor(base_estimator=Rid,random_state=2)
 # In[86]:
 
 
-le = LabelEncoder()
+# havayolu ve havalimanı kodları bir kez airlines.csv/airports.csv tablolarından sözlüğe alınır;
+# tabloda olmayan kodlar (ör. Ekim ayındaki sayısal havalimanı kodları) ayrılmış 0 kodunu alır
+from flightdelay.encoding import CategoryEncoder
+encoder = CategoryEncoder.from_reference(airlines, airports)
 
 
 # In[87]:
 
 
-# Kategorik değişkenleri sayısal olana dönüştürmek için etiket kodlama 
-flights['AIRLINE']= le.fit_transform(flights['AIRLINE'])
-flights['ORIGIN_AIRPORT'] = le.fit_transform(flights['ORIGIN_AIRPORT'])
-flights['DESTINATION_AIRPORT'] = le.fit_transform(flights['DESTINATION_AIRPORT'])
+# Kategorik değişkenleri sayısal olana dönüştürmek için etiket kodlama (int8/int16 kodlar)
+flights = encoder.transform(flights)
 
 
 # In[88]:
 
 
-X = flights.drop('ARRIVAL_DELAY',axis = 1)
+# özellikler bir kez, train_test_split sırasıyla tek bir float32 matrise yazılır
+from flightdelay.features import feature_matrix, split_order, standardize
+order, n_train = split_order(len(flights), test_size=0.3, random_state=2)
+X, y, features = feature_matrix(flights, 'ARRIVAL_DELAY', order=order)
 X.shape
 
 
 # In[89]:
 
 
-y = flights['ARRIVAL_DELAY']
-y.head()
+y[:5]
 
 
 # In[90]:
 
 
-# training ve test veri setlerini ayırma
-X_train,X_test,y_train,y_test = train_test_split(X,y,test_size=0.3,random_state = 2)
+# training ve test veri setlerini ayırma: aynı matrisin kopyasız görünümleri
+X_train,X_test,y_train,y_test = X[:n_train],X[n_train:],y[:n_train],y[n_train:]
 
 
 # In[91]:
 
 
-sc1=StandardScaler()
-X_train_sc=sc1.fit_transform(X_train)
-X_test_sc=sc1.transform(X_test)
+# ölçekleme yerinde yapılır; X_train/X_test artık ölçeklenmiş değerlerdir
+sc1 = standardize(X, n_train)
+X_train_sc, X_test_sc = X_train, X_test
 
 
 # ### Model fitting ve sonuçlar
@@ -1048,11 +1061,9 @@ X_test_sc=sc1.transform(X_test)
 # In[92]:
 
 
-for model, name in zip([Las,LinR,Rid,Dtc,Rfc,Boost_Lin,Boost_las,Boost_rid,Bg_Lin,Bg_las,Bg_rid], 
-     ['Lasso','Linear Regression','Ridge','Random forest Regressor','Decision Tree Regressor','Boosted Linear',
-      'Boosted Lasso','Boosted Ridge','Bagged Linear','Bagged Lasso','Bagged Ridge']):
-    model1 = model.fit(X_train_sc,y_train)
-    Y_predict=model1.predict(X_test_sc)
+runs = fit_zoo_parallel(make_models(), X_train_sc, y_train, X_test_sc, 'ARRIVAL_DELAY', registry, features)
+for name, run in runs.items():
+    Y_predict = run.y_pred
     print(name)
     print('Mean Absolute Error:', mean_absolute_error(y_test, Y_predict))  
     print('Mean Squared Error:', mean_squared_error(y_test, Y_predict))  
@@ -1066,13 +1077,9 @@ for model, name in zip([Las,LinR,Rid,Dtc,Rfc,Boost_Lin,Boost_las,Boost_rid,Bg_Li
 # In[93]:
 
 
-for model, name in zip([Las,LinR,Rid,Dtc,Rfc,Boost_Lin,Boost_las,Boost_rid,Bg_Lin,Bg_las,Bg_rid], 
-     ['Lasso','Linear Regression','Ridge','Random forest Regressor','Decision Tree Regressor','Boosted Linear',
-      'Boosted Lasso','Boosted Ridge','Bagged Linear','Bagged Lasso','Bagged Ridge']):
-    model1 = model.fit(X_train_sc,y_train)
-    Y_predict=model1.predict(X_test_sc)
+for name, run in runs.items():
     print(name)
-    plt.scatter(y_test, Y_predict)
+    plt.scatter(y_test, run.y_pred)
     plt.title("Model Analysis")
     plt.xlabel("Truth")
     plt.ylabel("Prediction")
@@ -1082,15 +1089,8 @@ for model, name in zip([Las,LinR,Rid,Dtc,Rfc,Boost_Lin,Boost_las,Boost_rid,Bg_Li
 # In[94]:
 
 
-data = [] 
-for model, name in zip([Las,LinR,Rid,Dtc,Rfc,Boost_Lin,Boost_las,Boost_rid,Bg_Lin,Bg_las,Bg_rid], 
-     ['Lasso','Linear Regression','Ridge','Random forest Regressor','Decision Tree Regressor','Boosted Linear',
-      'Boosted Lasso','Boosted Ridge','Bagged Linear','Bagged Lasso','Bagged Ridge']):
-    model1 = model.fit(X_train_sc,y_train)
-    Y_predict=model1.predict(X_test_sc),
-    data.extend(Y_predict)
-    print(name)
-    print(data)
+data = [run.y_pred for run in runs.values()]
+print(data)
 
 
 # In[95]:
@@ -1126,8 +1126,7 @@ for flier in bp['fliers']:
               color ='#e7298a',
               alpha = 0.5)
      
-ax.set_yticklabels(['Lasso','Linear Regression','Ridge','Random forest Regressor','Decision Tree Regressor','Boosted Linear',
-      'Boosted Lasso','Boosted Ridge','Bagged Linear','Bagged Lasso','Bagged Ridge'])
+ax.set_yticklabels(list(runs))
  
 plt.title("ML Karşılaştırma Grafiği")
  
@@ -1143,17 +1142,14 @@ plt.show()
 # In[96]:
 
 
-le = LabelEncoder()
+# kategorik sütunlar In[87]'de kodlandı; DELAY_TYPE zaten 0/1/2 tamsayı kodlarıdır,
+# yeniden kodlamaya gerek yoktur
 
 
 # In[97]:
 
 
-# Kategorik değişkenleri sayısal olana dönüştürmek için etiket kodlama 
-flights['AIRLINE']= le.fit_transform(flights['AIRLINE'])
-flights['ORIGIN_AIRPORT'] = le.fit_transform(flights['ORIGIN_AIRPORT'])
-flights['DESTINATION_AIRPORT'] = le.fit_transform(flights['DESTINATION_AIRPORT'])
-flights['DELAY_TYPE'] = le.fit_transform(flights['DELAY_TYPE'])
+flights.dtypes  # AIRLINE int8, havalimanları int16, DELAY_TYPE int8
 
 
 # In[ ]:
@@ -1188,11 +1184,9 @@ X_test_sc=sc2.transform(X_test)
 # In[ ]:
 
 
-for model, name in zip([Las,LinR,Rid,Dtc,Rfc,Boost_Lin,Boost_las,Boost_rid,Bg_Lin,Bg_las,Bg_rid], 
-     ['Lasso','Linear Regression','Ridge','Random forest Regressor','Decision Tree Regressor','Boosted Linear',
-      'Boosted Lasso','Boosted Ridge','Bagged Linear','Bagged Lasso','Bagged Ridge']):
-    model1 = model.fit(X_train_sc,y_train)
-    Y_predict=model1.predict(X_test_sc)
+runs = fit_zoo_parallel(make_models(), X_train_sc, y_train, X_test_sc, 'DELAY_TYPE', registry, X.columns)
+for name, run in runs.items():
+    Y_predict = run.y_pred
     print(name)
     print('Mean Absolute Error:', mean_absolute_error(y_test, Y_predict))  
     print('Mean Squared Error:', mean_squared_error(y_test, Y_predict))  
@@ -1204,13 +1198,9 @@ for model, name in zip([Las,LinR,Rid,Dtc,Rfc,Boost_Lin,Boost_las,Boost_rid,Bg_Li
 # In[ ]:
 
 
-for model, name in zip([Las,LinR,Rid,Dtc,Rfc,Boost_Lin,Boost_las,Boost_rid,Bg_Lin,Bg_las,Bg_rid], 
-     ['Lasso','Linear Regression','Ridge','Random forest Regressor','Decision Tree Regressor','Boosted Linear',
-      'Boosted Lasso','Boosted Ridge','Bagged Linear','Bagged Lasso','Bagged Ridge']):
-    model1 = model.fit(X_train_sc,y_train)
-    Y_predict=model1.predict(X_test_sc)
+for name, run in runs.items():
     print(name)
-    plt.scatter(y_test, Y_predict)
+    plt.scatter(y_test, run.y_pred)
     plt.title("Model Analysis")
     plt.xlabel("Truth")
     plt.ylabel("Prediction")
@@ -1220,15 +1210,8 @@ for model, name in zip([Las,LinR,Rid,Dtc,Rfc,Boost_Lin,Boost_las,Boost_rid,Bg_Li
 # In[ ]:
 
 
-data1 = [] 
-for model, name in zip([Las,LinR,Rid,Dtc,Rfc,Boost_Lin,Boost_las,Boost_rid,Bg_Lin,Bg_las,Bg_rid], 
-     ['Lasso','Linear Regression','Ridge','Random forest Regressor','Decision Tree Regressor','Boosted Linear',
-      'Boosted Lasso','Boosted Ridge','Bagged Linear','Bagged Lasso','Bagged Ridge']):
-    model1 = model.fit(X_train_sc,y_train)
-    Y_predict=model1.predict(X_test_sc),
-    data.extend(Y_predict)
-    print(name)
-    print(data1)
+data1 = [run.y_pred for run in runs.values()]
+print(data1)
 
 
 # In[ ]:
@@ -1264,8 +1247,7 @@ for flier in bp['fliers']:
               color ='#e7298a',
               alpha = 0.5)
      
-ax.set_yticklabels(['Lasso','Linear Regression','Ridge','Random forest Regressor','Decision Tree Regressor','Boosted Linear',
-      'Boosted Lasso','Boosted Ridge','Bagged Linear','Bagged Lasso','Bagged Ridge'])
+ax.set_yticklabels(list(runs))
  
 plt.title("ML Karşılaştırma Grafiği")
  
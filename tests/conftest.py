@@ -0,0 +1,14 @@
+import pytest
+
+from flightdelay.clean import clean_flights
+from flightdelay.synth import synthetic_flights
+
+
+@pytest.fixture(scope='session')
+def raw_flights():
+    return synthetic_flights(20000, seed=1)
+
+
+@pytest.fixture(scope='session')
+def flights(raw_flights):
+    return clean_flights(raw_flights)
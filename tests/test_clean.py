@@ -0,0 +1,24 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from flightdelay.clean import clean_flights, read_clean, stream_clean
+from flightdelay.io import read_flights_csv
+
+
+@pytest.mark.parametrize('chunksize', [3001, 50000])
+def test_stream_clean_matches_clean_flights(tmp_path, raw_flights, chunksize):
+    # ELAPSED_TIME is mostly missing in the first chunk but not over the whole
+    # file, so it must be kept everywhere.
+    raw = raw_flights.copy()
+    raw.loc[raw.index[:2000], 'ELAPSED_TIME'] = np.nan
+    source = str(tmp_path / 'flights.csv')
+    raw.to_csv(source, index=False)
+    expected = clean_flights(read_flights_csv(source)).reset_index(drop=True)
+    assert 'ELAPSED_TIME' in expected.columns
+
+    out_dir = str(tmp_path / 'clean')
+    result = stream_clean(source, out_dir, chunksize=chunksize)
+    assert result['parts'] == -(-len(raw) // chunksize)
+    assert result['rows_out'] == len(expected)
+    pd.testing.assert_frame_equal(read_clean(out_dir), expected, check_categorical=False)
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+
+from flightdelay import corr
+from flightdelay.corr import CorrelationCache
+
+
+def test_matches_pandas(monkeypatch, flights):
+    monkeypatch.setattr(corr, 'BLOCK_ROWS', 500)
+    numeric = flights.select_dtypes('number')
+    cache = CorrelationCache.from_frame(numeric)
+    expected = numeric.astype(np.float64).corr()
+    np.testing.assert_allclose(cache.corr().to_numpy(), expected.to_numpy(), atol=1e-5)
+    columns = ['ARRIVAL_DELAY', 'DEPARTURE_DELAY', 'DISTANCE']
+    np.testing.assert_allclose(cache.corr(columns).to_numpy(),
+                               expected.loc[columns, columns].to_numpy(), atol=1e-5)
+
+
+def test_merge_and_missing_rows(monkeypatch, flights):
+    monkeypatch.setattr(corr, 'BLOCK_ROWS', 300)
+    numeric = flights.select_dtypes('number').astype(np.float64).reset_index(drop=True)
+    holes = numeric.copy()
+    holes.iloc[::7, 2] = np.nan
+    half = len(holes) // 2
+    merged = (CorrelationCache.from_frame(holes.iloc[:half])
+              .merge(CorrelationCache.from_frame(holes.iloc[half:])))
+    assert merged.n == holes.notna().all(axis=1).sum()
+    np.testing.assert_allclose(merged.corr().to_numpy(), holes.dropna().corr().to_numpy(),
+                               atol=1e-5)
+
+
+def test_save_load(tmp_path, flights):
+    cache = CorrelationCache.from_frame(flights.select_dtypes('number'))
+    path = str(tmp_path / 'corr.npz')
+    cache.save(path)
+    pd.testing.assert_frame_equal(CorrelationCache.load(path).corr(), cache.corr())
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from flightdelay.cube import DelayCube
+from flightdelay.features import delay_type_column
+
+
+@pytest.fixture(scope='module')
+def typed(flights):
+    typed = flights.copy()
+    for col in ('DEPARTURE_DELAY', 'ARRIVAL_DELAY'):
+        delay_type_column(typed, col)
+    return typed
+
+
+def _assert_matches(cube, flights, by, measure):
+    got = cube.rollup(by, measure, ('count', 'sum', 'mean', 'std', 'min', 'max'))
+    expected = (flights.groupby(by, observed=True)[measure]
+                .agg(['count', 'sum', 'mean', 'std', 'min', 'max']))
+    got = got.sort_index()
+    np.testing.assert_array_equal(got.index.to_numpy(), expected.index.to_numpy())
+    np.testing.assert_allclose(got.to_numpy(dtype=np.float64),
+                               expected.to_numpy(dtype=np.float64), rtol=1e-7)
+
+
+def test_build_leaves_flights_untouched(flights):
+    columns = list(flights.columns)
+    cube = DelayCube.build(flights)
+    assert list(flights.columns) == columns
+    assert {'DELAY_TYPE', 'ARRIVAL_DELAY_TYPE'} <= set(cube.cells.columns)
+
+
+@pytest.mark.parametrize('by', [['MONTH'], ['DAY_OF_WEEK'], ['AIRLINE'],
+                                ['MONTH', 'DAY'], ['AIRLINE', 'DELAY_TYPE'],
+                                ['ORIGIN_AIRPORT'], ['DESTINATION_AIRPORT']])
+def test_rollup_matches_groupby(flights, typed, by):
+    cube = DelayCube.build(flights)
+    for measure in ('DEPARTURE_DELAY', 'ARRIVAL_DELAY'):
+        _assert_matches(cube, typed, by, measure)
+    counts = cube.counts(by[0]).sort_index()
+    expected = typed.groupby(by[0], observed=True).size()
+    np.testing.assert_array_equal(counts.to_numpy(), expected.to_numpy())
+
+
+def test_cells_are_coarser_than_flights(flights):
+    cube = DelayCube.build(flights)
+    assert 'ORIGIN_AIRPORT' not in cube.cells.columns
+    assert len(cube.cells) < len(flights)
+    with pytest.raises(KeyError):
+        cube.rollup(['MONTH', 'ORIGIN_AIRPORT'])
+
+
+def test_merge_and_save_load(tmp_path, flights, typed):
+    half = len(flights) // 2
+    merged = DelayCube.build(flights.iloc[:half]).merge(DelayCube.build(flights.iloc[half:]))
+    path = str(tmp_path / 'cube')
+    merged.save(path)
+    loaded = DelayCube.load(path)
+    for by in (['MONTH', 'AIRLINE'], ['ORIGIN_AIRPORT']):
+        _assert_matches(loaded, typed, by, 'ARRIVAL_DELAY')
+    pd.testing.assert_frame_equal(loaded.pivot('MONTH', 'DAY_OF_WEEK'),
+                                  DelayCube.build(flights).pivot('MONTH', 'DAY_OF_WEEK'),
+                                  check_dtype=False)
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from flightdelay.encoding import UNSEEN, CATEGORY_COLUMNS, CategoryEncoder, TargetEncoder
+
+
+@pytest.fixture(scope='module')
+def encoded(flights):
+    encoder = CategoryEncoder.from_frame(flights)
+    codes = {col: encoder.encode(flights[col], col) for col in CATEGORY_COLUMNS}
+    return encoder, codes, flights['ARRIVAL_DELAY'].to_numpy(dtype=np.float64)
+
+
+def test_category_encoder_round_trip(tmp_path, flights):
+    encoder = CategoryEncoder.from_frame(flights)
+    codes = encoder.encode(flights['AIRLINE'], 'AIRLINE')
+    assert codes.dtype == np.int8 and (codes != UNSEEN).all()
+    np.testing.assert_array_equal(encoder.decode(codes, 'AIRLINE'),
+                                  flights['AIRLINE'].astype(str).to_numpy())
+    assert encoder.code('AIRLINE', 'no such airline') == UNSEEN
+    encoder.save(str(tmp_path / 'encoder.json'))
+    loaded = CategoryEncoder.load(str(tmp_path / 'encoder.json'))
+    np.testing.assert_array_equal(loaded.encode(flights['ORIGIN_AIRPORT'], 'ORIGIN_AIRPORT'),
+                                  encoder.encode(flights['ORIGIN_AIRPORT'], 'ORIGIN_AIRPORT'))
+
+
+def test_tables_match_pandas(encoded):
+    encoder, codes, y = encoded
+    target_encoder = TargetEncoder(encoder, smoothing=0).fit(codes, y)
+    keys = target_encoder.key_codes(codes)
+    for key in target_encoder.keys:
+        groups = pd.Series(y).groupby(keys[key])
+        expected = pd.concat([groups.mean(), groups.quantile(0.5), groups.quantile(0.9)], axis=1)
+        np.testing.assert_allclose(target_encoder.tables[key][expected.index],
+                                   expected.to_numpy(), rtol=1e-9)
+
+
+def test_out_of_fold_has_no_leakage(encoded):
+    encoder, codes, y = encoded
+    stats = TargetEncoder(encoder, n_folds=4, random_state=7).fit_transform(codes, y)
+    folds = np.empty(len(y), dtype=np.int8)
+    folds[np.random.default_rng(7).permutation(len(y))] = np.arange(len(y)) % 4
+    holdout = folds == 0
+
+    # The rows of a fold are encoded with the statistics of the other folds.
+    fitted = TargetEncoder(encoder).fit({col: c[~holdout] for col, c in codes.items()},
+                                        y[~holdout])
+    np.testing.assert_allclose(stats[holdout],
+                               fitted.transform({col: c[holdout] for col, c in codes.items()}),
+                               rtol=1e-6)
+
+    # So changing the targets of a fold leaves its own features alone.
+    changed = np.where(holdout, y + 1000, y)
+    again = TargetEncoder(encoder, n_folds=4, random_state=7).fit_transform(codes, changed)
+    np.testing.assert_array_equal(again[holdout], stats[holdout])
+    assert not np.allclose(again[~holdout], stats[~holdout])
+
+
+def test_unseen_codes_get_the_prior(encoded):
+    encoder, codes, y = encoded
+    target_encoder = TargetEncoder(encoder).fit(codes, y)
+    unseen = target_encoder.transform({col: np.array([UNSEEN]) for col in CATEGORY_COLUMNS})
+    n_stats = 1 + len(target_encoder.quantiles)
+    np.testing.assert_allclose(unseen.reshape(-1, n_stats),
+                               np.tile(target_encoder.prior, (4, 1)), rtol=1e-6)
+
+
+def test_save_load(tmp_path, encoded):
+    encoder, codes, y = encoded
+    target_encoder = TargetEncoder(encoder).fit(codes, y)
+    path = str(tmp_path / 'target.npz')
+    target_encoder.save(path)
+    loaded = TargetEncoder.load(path)
+    assert loaded.columns == target_encoder.columns
+    np.testing.assert_array_equal(loaded.transform(codes), target_encoder.transform(codes))
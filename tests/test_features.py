@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from flightdelay.features import (MODEL_TIME_FEATURES, congestion, cyclic, hhmm_to_minutes,
+                                  model_time_features, standardize, time_features,
+                                  with_time_features)
+from flightdelay.models import MODEL_COLUMNS, model_data
+from flightdelay.store import DatasetStore
+
+
+def test_hhmm_to_minutes():
+    np.testing.assert_array_equal(hhmm_to_minutes(np.array([0, 5, 1305, 2359, 2400])),
+                                  [0, 5, 785, 1439, 0])
+    minutes = hhmm_to_minutes(np.array([1305.0, np.nan]))
+    assert minutes[0] == 785 and np.isnan(minutes[1])
+
+
+def test_cyclic_wraps_midnight():
+    sin, cos = cyclic(np.array([10, 1430]), 1440)
+    assert np.hypot(sin[0] - sin[1], cos[0] - cos[1]) < 0.1
+
+
+@pytest.mark.parametrize('window', [0, 5, 60])
+def test_congestion_matches_brute_force(window):
+    rng = np.random.default_rng(0)
+    airports = rng.integers(0, 4, 600)
+    minutes = rng.integers(0, 3 * 1440, 600)
+    same = airports[:, None] == airports[None, :]
+    near = np.abs(minutes[:, None] - minutes[None, :]) <= window
+    np.testing.assert_array_equal(congestion(airports, minutes, window),
+                                  (same & near).sum(axis=1) - 1)
+
+
+def test_time_features(flights):
+    times = time_features(flights)
+    assert (times['ORIGIN_CONGESTION'] >= 0).all()
+    assert 'ORIGIN_CONGESTION' not in model_time_features(flights)
+    assert list(model_time_features(flights)) == MODEL_TIME_FEATURES
+    departure = times['SCHEDULED_DEPARTURE_MIN'].to_numpy()
+    np.testing.assert_allclose(times['DEPARTURE_HOUR_SIN'],
+                               np.sin(2 * np.pi * departure / 1440), atol=1e-5)
+
+
+def test_model_data_time_features(tmp_path, flights):
+    data = model_data(flights, time_features=True)
+    assert data.features == with_time_features([c for c in MODEL_COLUMNS
+                                                if c != 'ARRIVAL_DELAY'])
+    assert 'SCHEDULED_DEPARTURE' not in data.features
+    assert np.isfinite(data.X_train).all()
+    store = DatasetStore.build(str(tmp_path / 'store'), flights, data.encoder,
+                               time_features=True)
+    stored = store.model_data(time_features=True)
+    np.testing.assert_array_equal(stored.X_train, data.X_train)
+    np.testing.assert_array_equal(stored.X_test, data.X_test)
+    # Without time_features the stored extra columns are ignored.
+    assert store.model_data().features == model_data(flights).features
+    with pytest.raises(ValueError):
+        DatasetStore.build(str(tmp_path / 'plain'), flights).model_data(time_features=True)
+
+
+def test_standardize_in_place():
+    X = np.random.default_rng(0).normal(5, 3, (1000, 4)).astype(np.float32)
+    raw = X.copy()
+    scaler = standardize(X, 700, block_rows=128)
+    np.testing.assert_allclose(scaler.mean_, raw[:700].mean(axis=0), rtol=1e-5)
+    np.testing.assert_allclose(X, (raw - scaler.mean_) / scaler.scale_, atol=1e-5)
+    # The returned scaler leaves its input alone.
+    again = raw.copy()
+    scaler.transform(again)
+    np.testing.assert_array_equal(again, raw)
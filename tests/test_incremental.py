@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+from sklearn.linear_model import Lasso, LinearRegression, Ridge
+from sklearn.preprocessing import StandardScaler
+
+from flightdelay.incremental import (LinearMoments, fit_linear, holdout_mask, stream_fit,
+                                     stream_report)
+
+
+@pytest.fixture(scope='module')
+def xy():
+    rng = np.random.default_rng(0)
+    # Large means and mixed scales, like the HHMM time columns.
+    X = rng.normal([1400, 60, 0.5, 900], [400, 30, 0.2, 5], (3000, 4))
+    y = X @ [0.02, 1.1, -8.0, 0.3] + rng.normal(0, 5, len(X))
+    return X, y
+
+
+def _moments(X, y, parts=5):
+    moments = LinearMoments(X.shape[1])
+    for rows in np.array_split(np.arange(len(X)), parts):
+        moments.update(X[rows], y[rows])
+    return moments
+
+
+def test_moments_match_numpy(xy):
+    X, y = xy
+    moments = _moments(X, y)
+    A = np.column_stack([X, y])
+    assert moments.n == len(X)
+    np.testing.assert_allclose(moments.mean, A.mean(axis=0), rtol=1e-12)
+    np.testing.assert_allclose(moments.comoment / len(A), np.cov(A.T, bias=True), rtol=1e-9)
+    halves = _moments(X[:1000], y[:1000]).merge(_moments(X[1000:], y[1000:]))
+    np.testing.assert_allclose(halves.comoment, moments.comoment, rtol=1e-9)
+    scaler = StandardScaler().fit(X)
+    np.testing.assert_allclose(moments.scaler().scale_, scaler.scale_, rtol=1e-12)
+
+
+def test_missing_rows_are_skipped(xy):
+    X, y = xy
+    holes = X.copy()
+    holes[::10, 1] = np.nan
+    keep = ~np.isnan(holes).any(axis=1)
+    np.testing.assert_allclose(_moments(holes, y).comoment, _moments(X[keep], y[keep]).comoment,
+                               rtol=1e-9)
+
+
+@pytest.mark.parametrize('estimator', [LinearRegression(), Ridge(alpha=3.0), Lasso(alpha=0.5),
+                                       Lasso(alpha=5.0, tol=1e-8)],
+                         ids=['linear', 'ridge', 'lasso', 'lasso_sparse'])
+def test_fit_matches_sklearn(xy, estimator):
+    X, y = xy
+    scaled = StandardScaler().fit_transform(X)
+    expected = type(estimator)(**estimator.get_params()).fit(scaled, y)
+    fitted = fit_linear(_moments(X, y), estimator)
+    tol = 1e-3 if isinstance(estimator, Lasso) and estimator.tol > 1e-6 else 1e-8
+    np.testing.assert_allclose(fitted.coef_, expected.coef_, rtol=tol, atol=tol)
+    np.testing.assert_allclose(fitted.intercept_, expected.intercept_, rtol=1e-10)
+    np.testing.assert_allclose(fitted.predict(scaled), expected.predict(scaled), rtol=1e-3)
+
+
+def test_holdout_mask_is_fixed():
+    mask = holdout_mask(10_000, 3)
+    np.testing.assert_array_equal(mask, holdout_mask(10_000, 3))
+    assert not np.array_equal(mask, holdout_mask(10_000, 4))
+    assert abs(mask.mean() - 0.3) < 0.02
+
+
+def test_stream_fit(tmp_path, flights):
+    flights.to_parquet(tmp_path / 'part.parquet')
+    streamed = stream_fit(str(tmp_path / 'part.parquet'), ['Ridge'], chunksize=1000)
+    assert streamed.moments.n == pytest.approx(0.7 * len(flights), rel=0.05)
+    assert len(streamed.estimators['Ridge'].coef_) == len(streamed.features)
+
+
+def test_stream_fit_delay_type(tmp_path, flights):
+    flights.to_parquet(tmp_path / 'part.parquet')
+    source = str(tmp_path / 'part.parquet')
+    streamed = stream_fit(source, ['Ridge'], 'DELAY_TYPE', chunksize=1000)
+    assert 'DELAY_TYPE' not in streamed.features
+    assert 0 <= streamed.moments.mean[-1] <= 2
+    report = stream_report(source, streamed, 'DELAY_TYPE', chunksize=1000)
+    assert list(report.index) == ['Ridge']
+
+
+def test_stream_fit_unknown_target(tmp_path, flights):
+    flights.to_parquet(tmp_path / 'part.parquet')
+    with pytest.raises(ValueError, match='cannot stream target'):
+        stream_fit(str(tmp_path / 'part.parquet'), ['Ridge'], 'DISTANCE')
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import (AdaBoostRegressor, BaggingRegressor, ExtraTreesRegressor,
+                              RandomForestRegressor)
+from sklearn.linear_model import Lasso, LinearRegression, Ridge
+from sklearn.tree import DecisionTreeRegressor
+
+from flightdelay.encoding import CategoryEncoder
+from flightdelay.features import feature_matrix, standardize
+from flightdelay.inference import (LinearScorer, TreeScorer, WALK_ROWS, WeightedMedianScorer,
+                                   compile_model)
+from flightdelay.models import MODEL_COLUMNS
+
+
+@pytest.fixture(scope='module')
+def raw(flights):
+    columns = [c for c in MODEL_COLUMNS if c != 'ARRIVAL_DELAY']
+    X, y, _ = feature_matrix(flights.reset_index(drop=True), 'ARRIVAL_DELAY', columns,
+                             encoder=CategoryEncoder.from_frame(flights), dtype=np.float64)
+    return X, y
+
+
+def _fit(estimator, raw):
+    X, y = raw
+    scaled = X.copy()
+    scaler = standardize(scaled)
+    return estimator.fit(scaled, y), scaler
+
+
+LINEAR = [LinearRegression(), Ridge(), Lasso(),
+          BaggingRegressor(Ridge(), n_estimators=5, max_features=0.7, random_state=2),
+          AdaBoostRegressor(LinearRegression(), n_estimators=5, random_state=2)]
+TREES = [DecisionTreeRegressor(random_state=2, max_depth=12),
+         RandomForestRegressor(n_estimators=8, max_depth=10, random_state=2),
+         ExtraTreesRegressor(n_estimators=8, max_depth=10, random_state=2)]
+
+
+@pytest.mark.parametrize('estimator', LINEAR, ids=lambda e: type(e).__name__)
+def test_linear_matches_sklearn(raw, estimator):
+    estimator, scaler = _fit(estimator, raw)
+    X = raw[0]
+    scorer = compile_model(estimator, scaler, X.shape[1])
+    assert isinstance(scorer, (LinearScorer, WeightedMedianScorer))
+    expected = estimator.predict(scaler.transform(X))
+    np.testing.assert_allclose(scorer.predict(X), expected, rtol=1e-7, atol=1e-6)
+    if isinstance(scorer, LinearScorer):
+        columns = [X[:, j].astype(np.float32) for j in range(X.shape[1])]
+        np.testing.assert_allclose(scorer.predict_columns(columns),
+                                   estimator.predict(scaler.transform(np.column_stack(columns))),
+                                   rtol=1e-6, atol=1e-4)
+
+
+@pytest.mark.parametrize('estimator', TREES, ids=lambda e: type(e).__name__)
+def test_trees_match_sklearn_exactly(raw, estimator):
+    estimator, scaler = _fit(estimator, raw)
+    X = raw[0]
+    scorer = compile_model(estimator, scaler, X.shape[1])
+    assert isinstance(scorer, TreeScorer)
+    # Batch sizes below, inside and above the level walk range.
+    for n in (1, WALK_ROWS[0], 500, WALK_ROWS[1] + 1):
+        batch = X[:n]
+        expected = estimator.predict(scaler.transform(batch).astype(np.float32))
+        np.testing.assert_array_equal(scorer.predict(batch), expected)
+
+
+def test_trees_missing_values(raw):
+    X, y = raw
+    holes = X.copy()
+    holes[::5, 3] = np.nan
+    scaled = holes.copy()
+    scaler = standardize(scaled)
+    forest = RandomForestRegressor(n_estimators=5, max_depth=8, random_state=2).fit(scaled, y)
+    scorer = compile_model(forest, scaler, X.shape[1])
+    batch = holes[:200]
+    np.testing.assert_array_equal(scorer.predict(batch),
+                                  forest.predict(scaler.transform(batch).astype(np.float32)))
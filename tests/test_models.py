@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from flightdelay import models
+from flightdelay.features import delay_type
+
+
+@pytest.mark.parametrize('target', ['ARRIVAL_DELAY', 'DELAY_TYPE'])
+def test_train_csv(tmp_path, monkeypatch, capsys, raw_flights, target):
+    monkeypatch.chdir(tmp_path)
+    raw_flights.to_csv('flights.csv', index=False)
+    models.main(['flights.csv', '--target', target, '--models', 'Ridge',
+                 '--registry', 'registry', '--jobs', '1'])
+    assert 'Ridge' in capsys.readouterr().out
+
+
+def test_delay_type_target(flights):
+    frame = flights.assign(DELAY_TYPE=delay_type(flights['DEPARTURE_DELAY']))
+    data = models.model_data(frame, 'DELAY_TYPE')
+    assert 'DELAY_TYPE' not in data.features
+    assert set(np.unique(data.y_train)) <= {0, 1, 2}
+
+
+@pytest.mark.parametrize('flag', ['--time-features', '--target-stats', '--registry=models',
+                                  '--jobs=2'])
+def test_train_chunksize_rejects_unsupported_flags(tmp_path, capsys, flag):
+    with pytest.raises(SystemExit) as exc:
+        models.main([str(tmp_path), '--chunksize', '10k', flag])
+    assert exc.value.code == 2
+    assert flag.split('=')[0] in capsys.readouterr().err
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+from sklearn.linear_model import Ridge
+
+from flightdelay.models import ModelBundle, model_data
+from flightdelay.scoring import read_predictions, score_schedule
+
+
+@pytest.mark.parametrize('time_features', [False, True])
+def test_score_target_stats_bundle(tmp_path, raw_flights, flights, time_features):
+    data = model_data(flights, target_stats=True, time_features=time_features)
+    estimator = Ridge().fit(data.X_train, data.y_train)
+    bundle = ModelBundle('Ridge', estimator, data.scaler, data.encoder, data.features,
+                         'ARRIVAL_DELAY', data.target_encoder)
+    assert 'ROUTE_P90' in bundle.features
+    assert 'ROUTE_P90' not in bundle.input_columns
+    bundle.save(str(tmp_path / 'bundle.joblib'))
+
+    schedule = raw_flights.head(2000)
+    schedule.to_csv(tmp_path / 'schedule.csv', index=False)
+    result = score_schedule(str(tmp_path / 'bundle.joblib'), str(tmp_path / 'schedule.csv'),
+                            str(tmp_path / 'out'), chunksize=700, n_jobs=1)
+    assert result['rows'] == len(schedule)
+
+    scored = read_predictions(str(tmp_path / 'out'))['PREDICTED_ARRIVAL_DELAY'].to_numpy()
+    complete = schedule[bundle.input_columns].notna().all(axis=1).to_numpy()
+    assert np.isnan(scored[~complete]).all()
+    expected = bundle.predict(schedule[complete])
+    np.testing.assert_allclose(scored[complete], expected, rtol=1e-5, atol=1e-3)
+
@@ -0,0 +1,59 @@
+import asyncio
+import json
+
+import pytest
+from sklearn.linear_model import Ridge
+
+from flightdelay.models import ModelBundle, model_data
+from flightdelay.serve import PredictionService
+
+
+@pytest.fixture(scope='module', params=[False, True], ids=['plain', 'target_stats'])
+def bundle(request, flights):
+    data = model_data(flights, target_stats=request.param)
+    return ModelBundle('Ridge', Ridge().fit(data.X_train, data.y_train), data.scaler,
+                       data.encoder, data.features, 'ARRIVAL_DELAY', data.target_encoder)
+
+
+def _handle(bundle, payload):
+    async def run():
+        service = PredictionService(bundle)
+        service.start()
+        try:
+            return await service.handle('POST', '/predict', json.dumps(payload).encode())
+        finally:
+            await service.stop()
+    return asyncio.run(run())
+
+
+def _record(flights, i=0):
+    row = flights.iloc[i]
+    return {col: row[col].item() if hasattr(row[col], 'item') else str(row[col])
+            for col in flights.columns}
+
+
+def test_predict_one_and_many(bundle, flights):
+    records = [_record(flights, i) for i in range(3)]
+    status, payload = _handle(bundle, records[0])
+    assert status == 200
+    assert payload['prediction'] == pytest.approx(bundle.predict(records[:1])[0])
+    status, payload = _handle(bundle, records)
+    assert status == 200
+    assert payload['predictions'] == pytest.approx(list(bundle.predict(records)))
+
+
+def test_empty_list(bundle):
+    assert _handle(bundle, []) == (200, {'predictions': []})
+
+
+@pytest.mark.parametrize('value', [None, 'drop'])
+def test_missing_feature_is_rejected(bundle, flights, value):
+    record = _record(flights)
+    if value == 'drop':
+        del record['DEPARTURE_TIME']
+    else:
+        record['DEPARTURE_TIME'] = value
+    status, payload = _handle(bundle, record)
+    assert status == 400
+    assert 'DEPARTURE_TIME' in payload['error']
+    json.dumps(payload, allow_nan=False)
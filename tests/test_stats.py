@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from flightdelay.stats import GroupedStats, TDigest, grouped_digests, grouped_stats
+
+QUANTILES = [0.01, 0.1, 0.5, 0.9, 0.99]
+
+
+def _rank_error(values, estimates, quantiles):
+    # Distance between the requested quantile and the rank of the estimate.
+    ranks = np.searchsorted(np.sort(values), estimates) / len(values)
+    return np.abs(ranks - np.asarray(quantiles)).max()
+
+
+@pytest.fixture(scope='module')
+def delays():
+    return np.random.default_rng(0).lognormal(3, 1, 50_000)
+
+
+def test_quantile_accuracy(delays):
+    digest = TDigest.from_values(delays)
+    assert len(digest.means) < 1000
+    assert digest.count == len(delays)
+    assert _rank_error(delays, digest.quantile(QUANTILES), QUANTILES) < 0.005
+    assert digest.quantile(0) == delays.min() and digest.quantile(1) == delays.max()
+
+
+def test_merge_of_chunks(delays):
+    merged = TDigest()
+    for chunk in np.array_split(delays, 7):
+        merged = merged.merge(TDigest.from_values(chunk))
+    assert merged.count == len(delays)
+    assert _rank_error(delays, merged.quantile(QUANTILES), QUANTILES) < 0.005
+    np.testing.assert_allclose(merged.quantile(QUANTILES),
+                               TDigest.from_values(delays).quantile(QUANTILES), rtol=0.02)
+
+
+def test_empty_and_nan():
+    assert np.isnan(TDigest().quantile(0.5))
+    digest = TDigest.from_values([1.0, np.nan, 3.0])
+    assert digest.count == 2
+    assert TDigest.from_dict(digest.to_dict()).quantile(0.5) == digest.quantile(0.5)
+
+
+def test_grouped_digests_match_single(delays):
+    keys = np.random.default_rng(1).integers(0, 5, len(delays))
+    digests = grouped_digests(delays, keys)
+    assert sorted(digests) == list(range(5))
+    for key, digest in digests.items():
+        assert _rank_error(delays[keys == key], digest.quantile(QUANTILES), QUANTILES) < 0.01
+
+
+def test_grouped_stats(flights):
+    stats = grouped_stats(flights, 'DEPARTURE_DELAY', 'AIRLINE')
+    expected = flights.groupby('AIRLINE', observed=True)['DEPARTURE_DELAY'].agg(
+        ['min', 'max', 'count', 'mean', 'std'])
+    np.testing.assert_allclose(stats[expected.columns].to_numpy(dtype=np.float64),
+                               expected.to_numpy(dtype=np.float64), rtol=1e-6)
+    half = len(flights) // 2
+    merged = (GroupedStats.from_frame(flights.iloc[:half], 'DEPARTURE_DELAY', 'AIRLINE')
+              .merge(GroupedStats.from_frame(flights.iloc[half:], 'DEPARTURE_DELAY', 'AIRLINE'))
+              .result())
+    pd.testing.assert_frame_equal(merged[['count', 'min', 'max']], stats[['count', 'min', 'max']],
+                                  check_dtype=False, check_names=False)
+    np.testing.assert_allclose(merged['mean'], stats['mean'], rtol=1e-9)